@@ -1,19 +1,210 @@
-from typing import Coroutine
+import time
+from typing import Coroutine, Dict, Iterable, List, Optional, Tuple, Union
 
 from aiowialon.client import Session
+from aiowialon.exceptions import APIError
+from aiowialon.flags import Resources, join
+from aiowialon.utils import chunks, gather_limited
 
 MINIMAL_ACCOUNT_INFO = 1
+FULL_ACCOUNT_INFO = 2
 
+ACCOUNT_CONCURRENCY = 8
+ACCOUNT_CACHE_TTL = 300
 
-def get_account_data(session: Session) -> Coroutine:
+
+def get_account_data(
+    session: Session, account_id: Optional[int] = None, detail_type: int = MINIMAL_ACCOUNT_INFO
+) -> Coroutine:
     """Get Wialon account detail
 
     Arguments:
         session {Session} -- active session
 
+    Keyword Arguments:
+        account_id {Optional[int]} -- account identifier, if None the session
+            user account is used (default: {None})
+        detail_type {int} -- account data detail level (default: {MINIMAL_ACCOUNT_INFO})
+
     Returns:
         Coroutine -- coroutine returning account info dictionary
     """
-    return session.call(
-        "account/get_account_data", {"itemId": session.account_id, "type": MINIMAL_ACCOUNT_INFO},
+    if account_id is None:
+        account_id = session.account_id
+    return session.call("account/get_account_data", {"itemId": account_id, "type": detail_type})
+
+
+async def search_accounts(session: Session, flags: Optional[Iterable] = None) -> List[dict]:
+    """Search all the accounts available to the session user
+
+    Arguments:
+        session {Session} -- active session
+
+    Keyword Arguments:
+        flags {Optional[Iterable]} -- resource data flags
+            (default: {Resources.BASE, Resources.BILLING_PROPERTIES})
+
+    Returns:
+        List[dict] -- account resources
+    """
+    if flags is None:
+        flags = {Resources.BASE, Resources.BILLING_PROPERTIES}
+    response = await session.call(
+        "core/search_items",
+        {
+            "spec": {
+                "itemsType": "avl_resource",
+                "propName": "rel_is_account",
+                "propValueMask": "1",
+                "propType": "property",
+                "sortType": "sys_name",
+            },
+            "force": 1,
+            "flags": join(set(flags)),
+            "from": 0,
+            "to": 0,
+        },
     )
+    return response["items"]
+
+
+class AccountDataCache:
+    """ In-process account data and account list cache with the limited lifetime """
+
+    def __init__(self, ttl: float = ACCOUNT_CACHE_TTL):
+        """
+        Keyword Arguments:
+            ttl {float} -- cached data lifetime, seconds (default: {300})
+        """
+        self.ttl = ttl
+        self.items = {}  # type: Dict[Tuple[int, int], Tuple[float, dict]]
+        self.account_lists = {}  # type: Dict[int, Tuple[float, List[int]]]
+
+    def get(self, account_id: int, detail_type: int) -> Optional[dict]:
+        """Get the cached account data
+
+        Arguments:
+            account_id {int} -- account identifier
+            detail_type {int} -- account data detail level
+
+        Returns:
+            Optional[dict] -- account data or None if it isn't cached or expired
+        """
+        stored, data = self.items.get((account_id, detail_type), (0, None))
+        if time.time() - stored > self.ttl:
+            return None
+        return data
+
+    def set(self, account_id: int, detail_type: int, data: dict):
+        """Cache the account data
+
+        Arguments:
+            account_id {int} -- account identifier
+            detail_type {int} -- account data detail level
+            data {dict} -- account data
+        """
+        self.items[(account_id, detail_type)] = (time.time(), data)
+
+    def get_account_ids(self, user_id: int) -> Optional[List[int]]:
+        """Get the cached identifiers of the accounts available to the user
+
+        Arguments:
+            user_id {int} -- session user identifier
+
+        Returns:
+            Optional[List[int]] -- account identifiers or None if they aren't cached or expired
+        """
+        stored, account_ids = self.account_lists.get(user_id, (0, None))
+        if time.time() - stored > self.ttl:
+            return None
+        return account_ids
+
+    def set_account_ids(self, user_id: int, account_ids: List[int]):
+        """Cache the identifiers of the accounts available to the user
+
+        Arguments:
+            user_id {int} -- session user identifier
+            account_ids {List[int]} -- account identifiers
+        """
+        self.account_lists[user_id] = (time.time(), account_ids)
+
+    def clear(self):
+        """ Remove all the cached data """
+        self.items.clear()
+        self.account_lists.clear()
+
+
+async def load_accounts_data(  # pylint: disable=too-many-arguments
+    session: Session,
+    account_ids: Optional[Iterable[int]] = None,
+    detail_type: int = MINIMAL_ACCOUNT_INFO,
+    concurrency: int = ACCOUNT_CONCURRENCY,
+    batch_size: Optional[int] = None,
+    cache: Optional[AccountDataCache] = None,
+    raise_errors: bool = True,
+) -> Dict[int, Union[dict, APIError]]:
+    """Load the data of several accounts
+
+    Arguments:
+        session {Session} -- active session
+
+    Keyword Arguments:
+        account_ids {Optional[Iterable[int]]} -- account identifiers, if None all
+            the available accounts are crawled, the account list is cached too (default: {None})
+        detail_type {int} -- account data detail level (default: {MINIMAL_ACCOUNT_INFO})
+        concurrency {int} -- maximum number of concurrent requests (default: {8})
+        batch_size {Optional[int]} -- pack the requests to core/batch calls of the size,
+            if None every account is requested separately (default: {None})
+        cache {Optional[AccountDataCache]} -- the cached accounts aren't requested
+            and the loaded ones are cached (default: {None})
+        raise_errors {bool} -- raise the first account error, if False the error
+            is returned as APIError instance in place of the account data (default: {True})
+
+    Returns:
+        Dict[int, Union[dict, APIError]] -- key value pairs account_id -> account data
+    """
+    if account_ids is None:
+        account_ids = cache.get_account_ids(session.user_id) if cache is not None else None
+    if account_ids is None:
+        account_ids = [item["id"] for item in await search_accounts(session)]
+        if cache is not None:
+            cache.set_account_ids(session.user_id, account_ids)
+    account_ids = list(dict.fromkeys(account_ids))
+    result = {}
+    missing = []
+    for account_id in account_ids:
+        data = cache.get(account_id, detail_type) if cache is not None else None
+        if data is None:
+            missing.append(account_id)
+        else:
+            result[account_id] = data
+
+    async def load_single(account_id_list: List[int]) -> list:
+        try:
+            return [await get_account_data(session, account_id_list[0], detail_type)]
+        except APIError as error:
+            if raise_errors:
+                raise
+            return [error]
+
+    async def load_batch(account_id_list: List[int]) -> list:
+        return await session.batch(
+            [
+                ("account/get_account_data", {"itemId": account_id, "type": detail_type})
+                for account_id in account_id_list
+            ],
+            raise_errors=raise_errors,
+        )
+
+    if batch_size is None:
+        groups = [[account_id] for account_id in missing]
+        responses = await gather_limited(map(load_single, groups), concurrency)
+    else:
+        groups = list(chunks(missing, batch_size))
+        responses = await gather_limited(map(load_batch, groups), concurrency)
+    for group, response in zip(groups, responses):
+        for account_id, data in zip(group, response):
+            result[account_id] = data
+            if cache is not None and not isinstance(data, APIError):
+                cache.set(account_id, detail_type, data)
+    return {account_id: result[account_id] for account_id in account_ids}
@@ -0,0 +1,558 @@
+""" Incremental time-bucketed aggregation of the unit messages.
+
+    The messages are consumed chunk by chunk and accumulated to the buckets
+    of the fixed interval (one hour by default): the number of the messages,
+    the mileage, the maximum and the average speed and the engine hours.
+    The buckets are mergeable, so the larger intervals (days, weeks) are the
+    rollups of the stored buckets and never require the raw messages again.
+
+    The last processed message of every unit is kept with the buckets, so the
+    aggregation is continued from the same point. Several messages can have
+    the same time, so the number of the processed messages of the last second
+    is kept too: update_aggregates(...) reloads the last second and skips its
+    processed messages by their index. The mileage is the sum of the distances
+    between the consecutive positions calculated with the utils.distance(...)
+    formula, the engine hours are the time between the consecutive messages
+    (with or without the position) after the ignition is on. Both are
+    accounted to the bucket of the later message.
+
+    Usage:
+
+        with AggregateStore("aggregates.sqlite") as store:
+            aggregator = Aggregator(store=store, ignition=ignition_input(1))
+            await update_aggregates(session, aggregator, unit_ids, begin_time=month_ago)
+            daily = aggregator.buckets(unit_id, begin, end, interval=DAY)
+"""
+import sqlite3
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Union
+import numpy as np
+from aiowialon.client import Session
+from aiowialon.messages import MESSAGES_CHUNK_SIZE, iterate_messages, timestamp
+from aiowialon.trips import haversine
+from aiowialon.utils import aclosing
+
+HOUR = 3600
+DAY = 86400
+DEFAULT_MAX_GAP = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    unit INTEGER NOT NULL,
+    interval INTEGER NOT NULL,
+    begin INTEGER NOT NULL,
+    messages INTEGER NOT NULL,
+    positions INTEGER NOT NULL,
+    distance REAL NOT NULL,
+    max_speed REAL NOT NULL,
+    speed_sum REAL NOT NULL,
+    engine_time REAL NOT NULL,
+    PRIMARY KEY (unit, interval, begin)
+);
+CREATE TABLE IF NOT EXISTS states (
+    unit INTEGER NOT NULL,
+    interval INTEGER NOT NULL,
+    time INTEGER NOT NULL,
+    position_time INTEGER,
+    latitude REAL,
+    longitude REAL,
+    ignition INTEGER NOT NULL,
+    time_count INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (unit, interval)
+);
+"""
+
+MERGE_BUCKET = """
+INSERT INTO buckets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (unit, interval, begin) DO UPDATE SET
+    messages = messages + excluded.messages,
+    positions = positions + excluded.positions,
+    distance = distance + excluded.distance,
+    max_speed = MAX(max_speed, excluded.max_speed),
+    speed_sum = speed_sum + excluded.speed_sum,
+    engine_time = engine_time + excluded.engine_time
+"""
+
+
+class Bucket:
+    """ Mergeable aggregate of the unit messages received during the interval """
+
+    __slots__ = (
+        "begin",
+        "messages",
+        "positions",
+        "distance",
+        "max_speed",
+        "speed_sum",
+        "engine_time",
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        begin: int,
+        messages: int = 0,
+        positions: int = 0,
+        distance: float = 0.0,
+        max_speed: float = 0.0,
+        speed_sum: float = 0.0,
+        engine_time: float = 0.0,
+    ):
+        """
+        Arguments:
+            begin {int} -- interval beginning timestamp
+
+        Keyword Arguments:
+            messages {int} -- the number of the messages (default: {0})
+            positions {int} -- the number of the messages with the position (default: {0})
+            distance {float} -- mileage, meters (default: {0.0})
+            max_speed {float} -- maximum speed, km/h (default: {0.0})
+            speed_sum {float} -- the sum of the message speeds, km/h (default: {0.0})
+            engine_time {float} -- engine hours, seconds (default: {0.0})
+        """
+        self.begin = begin
+        self.messages = messages
+        self.positions = positions
+        self.distance = distance
+        self.max_speed = max_speed
+        self.speed_sum = speed_sum
+        self.engine_time = engine_time
+
+    def __repr__(self):
+        return f"Bucket({self.as_dict()!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Bucket):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    def avg_speed(self) -> float:
+        """ Get the average speed of the messages with the position, km/h """
+        return self.speed_sum / self.positions if self.positions else 0.0
+
+    def merge(self, other: "Bucket") -> "Bucket":
+        """Add the other bucket aggregates to the bucket
+
+        Arguments:
+            other {Bucket} -- bucket to add
+
+        Returns:
+            Bucket -- the bucket itself
+        """
+        self.messages += other.messages
+        self.positions += other.positions
+        self.distance += other.distance
+        self.max_speed = max(self.max_speed, other.max_speed)
+        self.speed_sum += other.speed_sum
+        self.engine_time += other.engine_time
+        return self
+
+    def as_dict(self) -> dict:
+        """ Get the bucket aggregates as the dictionary """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class UnitState(NamedTuple):
+    """ The last processed message of the unit """
+
+    time: int
+    position_time: Optional[int]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    ignition: bool
+    time_count: int = 1  # the number of the processed messages with the last time
+
+
+def ignition_input(number: int) -> Callable[[dict], bool]:
+    """Get the ignition detector using the unit digital input
+
+    Arguments:
+        number {int} -- input number starting from 1
+
+    Returns:
+        Callable[[dict], bool] -- function returning the ignition state of the message
+    """
+    mask = 1 << (number - 1)
+
+    def ignition(message: dict) -> bool:
+        return bool((message.get("i") or 0) & mask)
+
+    return ignition
+
+
+def rollup(buckets: Iterable[Bucket], interval: int, offset: int = 0) -> List[Bucket]:
+    """Merge the buckets to the buckets of the larger interval
+
+    Arguments:
+        buckets {Iterable[Bucket]} -- source buckets
+        interval {int} -- result interval, seconds
+
+    Keyword Arguments:
+        offset {int} -- UTC offset of the interval boundaries, seconds (default: {0})
+
+    Returns:
+        List[Bucket] -- buckets ordered by time
+    """
+    result = {}
+    for bucket in buckets:
+        begin = (bucket.begin + offset) // interval * interval - offset
+        if begin not in result:
+            result[begin] = Bucket(begin)
+        result[begin].merge(bucket)
+    return [result[begin] for begin in sorted(result)]
+
+
+class AggregateStore:
+    """ SQLite based bucket storage """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(states)")]
+        if "time_count" not in columns:
+            # The store created before the messages of the same second were counted
+            self.connection.execute(
+                "ALTER TABLE states ADD COLUMN time_count INTEGER NOT NULL DEFAULT 1"
+            )
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """ Close the storage database """
+        self.connection.close()
+
+    def state(self, unit_id: int, interval: int) -> Optional[UnitState]:
+        """Get the last processed message of the unit
+
+        Arguments:
+            unit_id {int} -- unit identifier
+            interval {int} -- bucket interval
+
+        Returns:
+            Optional[UnitState] -- the last message state or None if there are no messages
+        """
+        row = self.connection.execute(
+            "SELECT time, position_time, latitude, longitude, ignition, time_count "
+            "FROM states WHERE unit = ? AND interval = ?",
+            (unit_id, interval),
+        ).fetchone()
+        if row is None:
+            return None
+        return UnitState(*row[:4], bool(row[4]), row[5])
+
+    def merge(self, unit_id: int, interval: int, buckets: Iterable[Bucket], state: UnitState):
+        """Add the bucket aggregates and update the unit state in the single transaction
+
+        Arguments:
+            unit_id {int} -- unit identifier
+            interval {int} -- bucket interval
+            buckets {Iterable[Bucket]} -- new buckets
+            state {UnitState} -- the last processed message state
+        """
+        with self.connection:
+            self.connection.executemany(
+                MERGE_BUCKET,
+                (
+                    (
+                        unit_id,
+                        interval,
+                        bucket.begin,
+                        bucket.messages,
+                        bucket.positions,
+                        bucket.distance,
+                        bucket.max_speed,
+                        bucket.speed_sum,
+                        bucket.engine_time,
+                    )
+                    for bucket in buckets
+                ),
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO states VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (unit_id, interval, *state),
+            )
+
+    def buckets(self, unit_id: int, interval: int, begin: int, end: int) -> List[Bucket]:
+        """Get the stored buckets
+
+        Arguments:
+            unit_id {int} -- unit identifier
+            interval {int} -- bucket interval
+            begin {int} -- the earliest bucket beginning
+            end {int} -- the latest bucket beginning
+
+        Returns:
+            List[Bucket] -- buckets ordered by time
+        """
+        rows = self.connection.execute(
+            "SELECT begin, messages, positions, distance, max_speed, speed_sum, engine_time "
+            "FROM buckets WHERE unit = ? AND interval = ? AND begin BETWEEN ? AND ? ORDER BY begin",
+            (unit_id, interval, begin, end),
+        )
+        return [Bucket(*row) for row in rows]
+
+
+class Aggregator:
+    """ Incremental message aggregator """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        interval: int = HOUR,
+        offset: int = 0,
+        ignition: Optional[Callable[[dict], bool]] = None,
+        max_gap: int = DEFAULT_MAX_GAP,
+        store: Optional[AggregateStore] = None,
+    ):
+        """
+        Keyword Arguments:
+            interval {int} -- bucket interval, seconds (default: {3600})
+            offset {int} -- UTC offset of the bucket boundaries, seconds (default: {0})
+            ignition {Optional[Callable[[dict], bool]]} -- function returning the ignition
+                state of the message, if None the engine hours aren't calculated (default: {None})
+            max_gap {int} -- the time between the messages is accounted to the engine hours
+                only if it doesn't exceed the gap, seconds (default: {600})
+            store {Optional[AggregateStore]} -- persistent bucket storage (default: {None})
+        """
+        self.interval = interval
+        self.offset = offset
+        self.ignition = ignition
+        self.max_gap = max_gap
+        self.store = store
+        self.pending = {}  # type: Dict[int, Dict[int, Bucket]]
+        self.states = {}  # type: Dict[int, Optional[UnitState]]
+
+    def state(self, unit_id: int) -> Optional[UnitState]:
+        """Get the last processed message of the unit
+
+        Arguments:
+            unit_id {int} -- unit identifier
+
+        Returns:
+            Optional[UnitState] -- the last message state or None if there are no messages
+        """
+        if unit_id not in self.states:
+            self.states[unit_id] = (
+                self.store.state(unit_id, self.interval) if self.store is not None else None
+            )
+        return self.states[unit_id]
+
+    def _begin(self, times: np.ndarray) -> np.ndarray:
+        return (times + self.offset) // self.interval * self.interval - self.offset
+
+    def feed(self, unit_id: int, messages: List[dict]):
+        """Add the next message chunk of the unit
+
+        The chunk continues the processed messages, the messages of the last
+        processed second in the beginning of the chunk are the next ones. The chunk
+        overlapping the processed messages has to begin earlier than the last
+        processed second: the messages earlier than it are ignored and so are
+        the already processed messages of the second.
+
+        Arguments:
+            unit_id {int} -- unit identifier
+            messages {List[dict]} -- messages ordered by time
+        """
+        state = self.state(unit_id)
+        if state is not None:
+            times = [message["t"] for message in messages]
+            first = bisect_left(times, state.time)
+            known = 0
+            if first > 0:
+                known = min(state.time_count, bisect_right(times, state.time) - first)
+            messages = messages[first + known :]
+        if not messages:
+            return
+        buckets = self.pending.setdefault(unit_id, {})
+        times = np.array([message["t"] for message in messages], dtype=np.int64)
+        ignition = (
+            np.array([bool(self.ignition(message)) for message in messages], dtype=bool)
+            if self.ignition is not None
+            else np.zeros(len(messages), dtype=bool)
+        )
+        self._feed_messages(buckets, state, times, ignition)
+
+        located = [message for message in messages if message.get("pos")]
+        if located:
+            self._feed_positions(buckets, state, located)
+            position = located[-1]["pos"]
+            last_position = (int(located[-1]["t"]), position["y"], position["x"])
+        elif state is not None:
+            last_position = (state.position_time, state.latitude, state.longitude)
+        else:
+            last_position = (None, None, None)
+        last_time = int(times[-1])
+        time_count = int(np.count_nonzero(times == last_time))
+        if state is not None and state.time == last_time:
+            time_count += state.time_count
+        self.states[unit_id] = UnitState(last_time, *last_position, bool(ignition[-1]), time_count)
+
+    def _feed_messages(
+        self,
+        buckets: Dict[int, Bucket],
+        state: Optional[UnitState],
+        times: np.ndarray,
+        ignition: np.ndarray,
+    ):
+        # The time between the consecutive messages including the previous chunk one
+        if state is not None:
+            previous_time = np.concatenate(([state.time], times[:-1]))
+            previous_ignition = np.concatenate(([state.ignition], ignition[:-1]))
+        else:
+            previous_time = np.concatenate(([times[0]], times[:-1]))
+            previous_ignition = np.concatenate(([False], ignition[:-1]))
+        elapsed = times - previous_time
+        engine = np.where(previous_ignition & (elapsed <= self.max_gap), elapsed, 0)
+
+        begins, index = np.unique(self._begin(times), return_inverse=True)
+        messages = np.bincount(index, minlength=len(begins))
+        engine_time = np.bincount(index, weights=engine, minlength=len(begins))
+        for position, begin in enumerate(begins.tolist()):
+            buckets.setdefault(begin, Bucket(begin)).merge(
+                Bucket(
+                    begin,
+                    messages=int(messages[position]),
+                    engine_time=float(engine_time[position]),
+                )
+            )
+
+    def _feed_positions(  # pylint: disable=too-many-locals
+        self, buckets: Dict[int, Bucket], state: Optional[UnitState], located: List[dict],
+    ):
+        times = np.array([message["t"] for message in located], dtype=np.int64)
+        latitude = np.array([message["pos"]["y"] for message in located], dtype=float)
+        longitude = np.array([message["pos"]["x"] for message in located], dtype=float)
+        speed = np.array([message["pos"].get("s", 0) for message in located], dtype=float)
+
+        # The segments between the consecutive positions including the previous chunk one
+        if state is not None and state.latitude is not None:
+            previous = (
+                np.concatenate(([state.latitude], latitude[:-1])),
+                np.concatenate(([state.longitude], longitude[:-1])),
+            )
+            valid = np.ones(len(times), dtype=bool)
+        else:
+            previous = (
+                np.concatenate(([latitude[0]], latitude[:-1])),
+                np.concatenate(([longitude[0]], longitude[:-1])),
+            )
+            valid = np.arange(len(times)) > 0
+        segment = np.where(valid, haversine(previous[0], previous[1], latitude, longitude), 0)
+
+        begins, index = np.unique(self._begin(times), return_inverse=True)
+        positions = np.bincount(index, minlength=len(begins))
+        distance = np.bincount(index, weights=segment, minlength=len(begins))
+        speed_sum = np.bincount(index, weights=speed, minlength=len(begins))
+        max_speed = np.zeros(len(begins))
+        np.maximum.at(max_speed, index, speed)
+        for position, begin in enumerate(begins.tolist()):
+            buckets[begin].merge(
+                Bucket(
+                    begin,
+                    positions=int(positions[position]),
+                    distance=float(distance[position]),
+                    max_speed=float(max_speed[position]),
+                    speed_sum=float(speed_sum[position]),
+                )
+            )
+
+    def flush(self):
+        """ Store the pending buckets and the unit states """
+        if self.store is None:
+            return
+        for unit_id, buckets in self.pending.items():
+            self.store.merge(unit_id, self.interval, buckets.values(), self.states[unit_id])
+        self.pending.clear()
+
+    def buckets(
+        self,
+        unit_id: int,
+        begin_time: Union[datetime, int, float],
+        end_time: Union[datetime, int, float],
+        interval: Optional[int] = None,
+    ) -> List[Bucket]:
+        """Get the unit buckets of the time interval
+
+        Arguments:
+            unit_id {int} -- unit identifier
+            begin_time {Union[datetime, int, float]} -- interval beginning
+            end_time {Union[datetime, int, float]} -- interval end
+
+        Keyword Arguments:
+            interval {Optional[int]} -- result bucket interval, the multiple of the aggregator
+                interval, if None the aggregator interval is used (default: {None})
+
+        Returns:
+            List[Bucket] -- buckets ordered by time
+        """
+        interval = interval or self.interval
+        if interval % self.interval:
+            raise ValueError(f"Interval {interval} isn't a multiple of {self.interval}")
+        begin = int((timestamp(begin_time) + self.offset) // interval * interval - self.offset)
+        end = timestamp(end_time)
+        stored = (
+            self.store.buckets(unit_id, self.interval, begin, end)
+            if self.store is not None
+            else []
+        )
+        pending = [
+            bucket
+            for bucket in self.pending.get(unit_id, {}).values()
+            if begin <= bucket.begin <= end
+        ]
+        return rollup(stored + pending, interval, self.offset)
+
+
+async def update_aggregates(  # pylint: disable=too-many-arguments
+    session: Session,
+    aggregator: Aggregator,
+    unit_ids: Iterable[int],
+    begin_time: Union[datetime, int, float],
+    end_time: Union[datetime, int, float, None] = None,
+    chunk_size: int = MESSAGES_CHUNK_SIZE,
+):
+    """Aggregate the new unit messages
+
+    Every unit messages are loaded from the second of the last aggregated
+    message or from the `begin_time` if there are no aggregated messages yet,
+    the already aggregated messages of the second are the first ones loaded
+    and they're skipped. The unit is skipped if its last aggregated message
+    is at the `end_time`.
+    The aggregates are flushed to the store after every unit.
+
+    Arguments:
+        session {Session} -- Wialon API session
+        aggregator {Aggregator} -- message aggregator
+        unit_ids {Iterable[int]} -- unit identifiers
+        begin_time {Union[datetime, int, float]} -- the beginning of the first aggregation
+
+    Keyword Arguments:
+        end_time {Union[datetime, int, float, None]} -- the end of the interval,
+            if None the current time is used (default: {None})
+        chunk_size {int} -- the number of messages per page (default: {10000})
+    """
+    end = timestamp(end_time) if end_time is not None else int(datetime.now().timestamp())
+    for unit_id in unit_ids:
+        state = aggregator.state(unit_id)
+        begin = state.time if state is not None else timestamp(begin_time)
+        if begin > end or (state is not None and begin == end):
+            continue
+        chunks = iterate_messages(session, unit_id, begin, end, chunk_size=chunk_size)
+        known = state.time_count if state is not None else 0
+        async with aclosing(chunks):
+            async for messages in chunks:
+                # The aggregated messages of the last second are the first ones loaded
+                repeated = 0
+                if known:
+                    times = [message["t"] for message in messages]
+                    repeated = min(known, bisect_right(times, begin))
+                    known = known - repeated if repeated == len(messages) else 0
+                aggregator.feed(unit_id, messages[repeated:])
+        aggregator.flush()
@@ -0,0 +1,218 @@
+""" Persistent local geofence library synchronized incrementally
+    with the Wialon resources zone libraries.
+"""
+import json
+import sqlite3
+from logging import getLogger
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+from aiowialon.client import Session
+from aiowialon.flags import join
+from aiowialon.resources import (
+    DETAIL_CHUNK_SIZE,
+    DETAIL_CONCURRENCY,
+    Area,
+    AreaFlags,
+    build_area,
+    get_resource_areas_detail_raw,
+    load_areas_raw,
+)
+
+LOGGER = getLogger(__name__)
+
+AreaKey = Tuple[int, int]  # (resource_id, area_id)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS areas (
+    rid INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    marker TEXT NOT NULL,
+    flags INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    PRIMARY KEY (rid, id)
+)
+"""
+
+
+class SyncResult(NamedTuple):
+    """ Area store synchronization summary """
+
+    added: List[AreaKey]
+    updated: List[AreaKey]
+    removed: List[AreaKey]
+
+
+def area_marker(item: dict) -> str:
+    """Get the area modification marker from the area list item
+
+    The modification time is used if it's available, otherwise
+    the marker is built from the whole list item content.
+
+    Arguments:
+        item {dict} -- area list item returned by load_areas_raw(...)
+
+    Returns:
+        str -- modification marker
+    """
+    if "mt" in item:
+        return str(item["mt"])
+    return json.dumps(item, sort_keys=True)
+
+
+class AreaStore:
+    """ SQLite based local area storage """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(SCHEMA)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(areas)")]
+        if "flags" not in columns:
+            # The store created before the flags were saved, the areas are refetched once
+            self.connection.execute("ALTER TABLE areas ADD COLUMN flags INTEGER NOT NULL DEFAULT 0")
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM areas").fetchone()[0]
+
+    def close(self):
+        """ Close the storage database """
+        self.connection.close()
+
+    def markers(self) -> Dict[AreaKey, str]:
+        """Get the modification markers of the stored areas
+
+        Returns:
+            Dict[AreaKey, str] -- key value pairs (resource_id, area_id) -> marker
+        """
+        return {
+            (rid, area_id): marker
+            for rid, area_id, marker in self.connection.execute("SELECT rid, id, marker FROM areas")
+        }
+
+    def flags(self) -> Dict[AreaKey, int]:
+        """Get the detail data flags the stored areas were requested with
+
+        Returns:
+            Dict[AreaKey, int] -- key value pairs (resource_id, area_id) -> flags
+        """
+        return {
+            (rid, area_id): flags
+            for rid, area_id, flags in self.connection.execute("SELECT rid, id, flags FROM areas")
+        }
+
+    def update(self, items: Iterable[Tuple[str, dict]], flags: int = 0):
+        """Insert or replace the areas
+
+        Arguments:
+            items {Iterable[Tuple[str, dict]]} -- pairs (marker, area_data)
+
+        Keyword Arguments:
+            flags {int} -- detail data flags the areas were requested with (default: {0})
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO areas (rid, id, marker, flags, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (data["rid"], data["id"], marker, flags, json.dumps(data))
+                    for marker, data in items
+                ),
+            )
+
+    def remove(self, keys: Iterable[AreaKey]):
+        """Remove the areas
+
+        Arguments:
+            keys {Iterable[AreaKey]} -- (resource_id, area_id) pairs
+        """
+        with self.connection:
+            self.connection.executemany("DELETE FROM areas WHERE rid = ? AND id = ?", keys)
+
+    def areas_raw(self) -> List[dict]:
+        """Get the stored areas raw data
+
+        Returns:
+            List[dict] -- area info list
+        """
+        return [json.loads(data) for (data,) in self.connection.execute("SELECT data FROM areas")]
+
+    def areas(self, keep_data: bool = True) -> List[Area]:
+        """Get the stored areas
+
+        Keyword Arguments:
+            keep_data {bool} -- keep the raw area data in the area instances (default: {True})
+
+        Returns:
+            List[Area] -- Area instance list
+        """
+        return [build_area(data, keep_data=keep_data) for data in self.areas_raw()]
+
+
+async def sync_areas(  # pylint: disable=too-many-locals
+    session: Session,
+    store: AreaStore,
+    flags: List[AreaFlags] = None,
+    concurrency: int = DETAIL_CONCURRENCY,
+    chunk_size: int = DETAIL_CHUNK_SIZE,
+) -> SyncResult:
+    """Synchronize the local area store with the available zone libraries
+
+    Only the light area list is requested on every call, the detail info
+    is loaded for the new and modified areas only and for the areas stored
+    with the other detail flags. The areas which are not available anymore
+    are removed from the store.
+
+    Arguments:
+        session {Session} -- active user session
+        store {AreaStore} -- local area store
+
+    Keyword Arguments:
+        flags {List[AreaFlags]} -- detail data flags (default: [AreaFlags.BASE])
+        concurrency {int} -- maximum number of concurrent detail requests (default: {8})
+        chunk_size {int} -- maximum number of areas per detail request (default: {500})
+
+    Returns:
+        SyncResult -- added, updated and removed area keys
+    """
+    flags = flags or [AreaFlags.BASE]
+    requested = join(set(flags))
+    stored = store.markers()
+    stored_flags = store.flags()
+    current = {
+        (item["rid"], item["id"]): area_marker(item) for item in await load_areas_raw(session)
+    }
+
+    added = [key for key in current if key not in stored]
+    updated = [
+        key
+        for key in current
+        if key in stored and (stored[key] != current[key] or stored_flags[key] != requested)
+    ]
+    removed = [key for key in stored if key not in current]
+
+    resource_areas = {}
+    for rid, area_id in added + updated:
+        resource_areas.setdefault(rid, []).append(area_id)
+    if resource_areas:
+        detail = await get_resource_areas_detail_raw(
+            session, resource_areas, flags=flags, concurrency=concurrency, chunk_size=chunk_size
+        )
+        store.update(
+            ((current[(data["rid"], data["id"])], data) for data in detail), flags=requested
+        )
+    store.remove(removed)
+
+    LOGGER.debug(
+        "Area store %s synchronized: %s added, %s updated, %s removed",
+        store.path,
+        len(added),
+        len(updated),
+        len(removed),
+    )
+    return SyncResult(added=added, updated=updated, removed=removed)
@@ -1,12 +1,18 @@
 import asyncio
 import argparse
+import json
 import logging
 import os
 import pprint
-import yaml
-from aiowialon import connect
+import sys
+import time
+from aiowialon import connect, APIError
+from aiowialon.client import DEFAULT_API_HOST
+from aiowialon.sid_store import FileSidStore, SidStore
+from aiowialon.utils import chunks
 
 ACCESS_TOKEN_VAR = "WIALON_ACCESS_TOKEN"
+SID_STORE_VAR = "WIALON_SID_STORE"
 
 
 # pylint: disable=missing-function-docstring
@@ -27,12 +33,40 @@ def get_access_token():
     return os.environ[ACCESS_TOKEN_VAR]
 
 
-async def main_task(filepath: str, verbose: bool):
+class InvalidRequest(ValueError):
+    """ Malformed batch mode request """
+
+
+async def main_task(  # pylint: disable=too-many-arguments
+    filepath,
+    verbose: bool,
+    batch: bool,
+    concurrency: int,
+    core_batch: int,
+    output,
+    sid_store,
+    api_host: str,
+):
     configure_logger(verbose)
+    store = FileSidStore(sid_store) if sid_store else None
+    if batch:
+        await batch_task(
+            filepath,
+            concurrency=concurrency,
+            core_batch=core_batch,
+            output=output,
+            store=store,
+            api_host=api_host,
+        )
+        return
+    import yaml  # pylint: disable=import-outside-toplevel
+
     config = yaml.safe_load(filepath)
     print("\n*** REQUEST ***\n")
     pprint.pprint(config)
-    result = await request(access_token=get_access_token(), **config)
+    result = await request(
+        access_token=get_access_token(), store=store, api_host=api_host, **config
+    )
     print("\n*** RESULT ***\n")
     pprint.pprint(result)
 
@@ -41,16 +75,162 @@ def parse_args() -> dict:
     parser = argparse.ArgumentParser(description="Send Wialon Remote API Request")
     parser.add_argument("filepath", type=argparse.FileType("r"), help="Config YAML file path")
     parser.add_argument("-v", "--verbose", action="store_true", help="Verbose output")
+    parser.add_argument(
+        "-b",
+        "--batch",
+        action="store_true",
+        help="Run the request list from YAML or JSONL file and print the results as JSONL",
+    )
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=4, help="Concurrent requests in the batch mode"
+    )
+    parser.add_argument(
+        "--core-batch",
+        type=int,
+        default=0,
+        metavar="SIZE",
+        help="Pack the requests to core/batch calls of SIZE requests in the batch mode",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="Batch mode results JSONL file path (default: stdout)",
+    )
+    parser.add_argument(
+        "--sid-store",
+        default=os.getenv(SID_STORE_VAR),
+        metavar="PATH",
+        help=f"Directory to share the session between the runs (default: ${SID_STORE_VAR})",
+    )
+    parser.add_argument(
+        "--api-host",
+        default=DEFAULT_API_HOST,
+        metavar="URL",
+        help=f"Remote API host (default: {DEFAULT_API_HOST})",
+    )
     args = parser.parse_args()
     return vars(args)
 
 
-async def request(access_token: str, svc: str, params: dict = None):
+async def request(  # pylint: disable=too-many-arguments
+    access_token: str,
+    svc: str,
+    params: dict = None,
+    store: SidStore = None,
+    api_host: str = DEFAULT_API_HOST,
+):
     params = params or {}
-    async with connect(access_token) as session:
+    async with connect(
+        access_token, api_host=api_host, sid_store=store, share_sid=store is not None
+    ) as session:
         return await session.call(svc, params)
 
 
+def load_requests(infile) -> list:
+    """Load the request list from the YAML list or JSONL file
+
+    The malformed JSONL lines are returned as InvalidRequest instances
+    to report them in place of the results.
+    """
+    if infile.name.endswith(".jsonl"):
+        items = []
+        for number, line in enumerate(infile, start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as exp:
+                items.append(InvalidRequest(f"Invalid JSON at line {number}: {exp}"))
+        return items
+    import yaml  # pylint: disable=import-outside-toplevel
+
+    return yaml.safe_load(infile)
+
+
+def check_request(item) -> dict:
+    """ Get the request item or raise InvalidRequest if it's malformed """
+    if isinstance(item, InvalidRequest):
+        raise item
+    if not isinstance(item, dict) or not isinstance(item.get("svc"), str):
+        raise InvalidRequest(f"The request has no svc: {item!r}")
+    if not isinstance(item.get("params") or {}, dict):
+        raise InvalidRequest(f"The request params aren't a mapping: {item['params']!r}")
+    return item
+
+
+def write_result(output, item: dict, started: float, result=None, error: Exception = None):
+    line = {key: value for key, value in item.items() if key not in ("params", "request")}
+    line["elapsed"] = round(time.monotonic() - started, 6)
+    if error is None:
+        line["result"] = result
+    elif isinstance(error, APIError):
+        line["error"] = {"code": error.code, "reason": error.reason}
+    else:
+        line["error"] = {"code": None, "reason": f"{type(error).__name__}: {error}"}
+    output.write(json.dumps(line) + "\n")
+    output.flush()
+
+
+async def batch_task(  # pylint: disable=too-many-arguments
+    infile,
+    concurrency: int,
+    core_batch: int,
+    output,
+    store: SidStore = None,
+    api_host: str = DEFAULT_API_HOST,
+):
+    """Run the request list and write the result (or the error) of every request
+
+    The failure of the request doesn't stop the others: the malformed requests,
+    the API errors and the other exceptions are written as the error records.
+    """
+    items = []
+    for index, raw in enumerate(load_requests(infile)):
+        started = time.monotonic()
+        try:
+            items.append({"index": index, **check_request(raw)})
+        except InvalidRequest as error:
+            write_result(output, {"index": index}, started, error=error)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async with connect(
+        get_access_token(), api_host=api_host, sid_store=store, share_sid=store is not None
+    ) as session:
+
+        async def run_single(item):
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    result = await session.call(item["svc"], item.get("params") or {})
+                except Exception as error:  # pylint: disable=broad-except
+                    write_result(output, item, started, error=error)
+                else:
+                    write_result(output, item, started, result=result)
+
+        async def run_batch(batch_items):
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    results = await session.batch(
+                        [(item["svc"], item.get("params") or {}) for item in batch_items],
+                        raise_errors=False,
+                    )
+                except Exception as error:  # pylint: disable=broad-except
+                    results = [error] * len(batch_items)
+                for item, result in zip(batch_items, results):
+                    if isinstance(result, Exception):
+                        write_result(output, item, started, error=result)
+                    else:
+                        write_result(output, item, started, result=result)
+
+        if core_batch > 0:
+            await asyncio.gather(*(run_batch(batch) for batch in chunks(items, core_batch)))
+        else:
+            await asyncio.gather(*(run_single(item) for item in items))
+
+
 def main():
     asyncio.run(main_task(**parse_args()))
 
@@ -4,8 +4,9 @@ import json
 import os
 from datetime import datetime
 from logging import getLogger
-from aiohttp import ClientSession
+from typing import TYPE_CHECKING, List, Tuple
 from aiowialon.exceptions import APIError, get_error
+from aiowialon.sid_store import SidStore, session_key
 
 DEFAULT_API_HOST = "http://hst-api.wialon.com"
 DEFAULT_API_PATH = "/wialon/ajax.html"
@@ -14,14 +15,27 @@ DEBUG_STORE_RESPONSES_CONTENT = os.getenv("STORE_WIALON_RESPONSES", None)
 
 LOGGER = getLogger(__name__)
 
+if TYPE_CHECKING:  # pragma: no cover
+    from aiohttp import ClientSession
+    from aiowialon.hedging import Hedging
+    from aiowialon.scheduler import Scheduler
+
 
 class Session:
     """ Wialon Remote API connection async context manager. """
 
     # pylint: disable=bad-continuation,too-many-instance-attributes
 
-    def __init__(
-        self, token: str, host: str = DEFAULT_API_HOST, path: str = DEFAULT_API_PATH, timeout=None,
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        token: str,
+        host: str = DEFAULT_API_HOST,
+        path: str = DEFAULT_API_PATH,
+        timeout=None,
+        sid_store: SidStore = None,
+        share_sid: bool = False,
+        scheduler: "Scheduler" = None,
+        hedging: "Hedging" = None,
     ):
         self.token = token
         self.host = host
@@ -33,8 +47,17 @@ class Session:
         self.client_session = None  # type: ClientSession
         self.timeout = timeout
         self.session_info = {}
+        self.sid_store = sid_store
+        self.share_sid = share_sid
+        self.restored = False  # the session is restored from the store
+        self.relogin_lock = None  # created on the first expired session in the running loop
+        self.scheduler = scheduler
+        self.hedging = hedging
 
     async def __aenter__(self):
+        # aiohttp is imported on the first connection to keep the package import fast
+        from aiohttp import ClientSession  # pylint: disable=import-outside-toplevel
+
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
         self.client_session = ClientSession(headers=headers)
         try:
@@ -46,28 +69,40 @@ class Session:
     async def __aexit__(self, exc_type, exc_value, traceback):
         await self.logout()
 
-    async def call(self, method: str, params: dict = None):
+    async def call(self, method: str, params: dict = None, priority: int = None, tag: str = None):
         """Execute Wialon RemoteAPI method
 
         Arguments:
             method {str} -- method name
             params {dict} == method parameters (default: {})
 
+        Keyword Arguments:
+            priority {int} -- scheduler priority class, if None the one set by
+                request_priority(...) is used (default: {None})
+            tag {str} -- scheduler caller tag, if None the one set by
+                request_priority(...) is used (default: {None})
+
         Returns:
             dict -- method response content
         """
         params = params or {}
         full_param_set = dict(svc=method, params=json.dumps(params))
-        if self.sid is not None:
-            full_param_set["sid"] = self.sid
-        url = self.host + self.path
+        sent_sid = self.sid
+        if sent_sid is not None:
+            full_param_set["sid"] = sent_sid
 
         # Execute method call
         LOGGER.debug("Call API method %s (sid %s)", method, self.sid)
-        async with self.client_session.post(
-            url, timeout=self.timeout, params=full_param_set
-        ) as resp:
-            content = await resp.json()
+        if self.scheduler is not None:
+            priority, tag = self.scheduler.context(priority, tag)
+
+        def request():
+            return self._request(full_param_set, priority, tag)
+
+        if self.hedging is not None:
+            content = await self.hedging.run(method, request)
+        else:
+            content = await request()
 
         if DEBUG_STORE_RESPONSES_CONTENT:
             # Store request/response data to the JSON file to debug
@@ -94,15 +129,100 @@ class Session:
 
         if "error" in content and content["error"] > 0:
             code = content["error"]
+            if code == 1 and method != "token/login" and self._expired(sent_sid):
+                await self._relogin(sent_sid)
+                return await self.call(method, params, priority=priority, tag=tag)
             reason = content.get("reason", None)
             raise get_error(code)(self.sid, code, reason)
 
         return content
 
+    def _expired(self, sent_sid: str) -> bool:
+        """ Check if the invalid session error of the call has to be fixed by the relogin """
+        return (
+            self.restored
+            or sent_sid != self.sid
+            or (self.relogin_lock is not None and self.relogin_lock.locked())
+        )
+
+    async def _relogin(self, sent_sid: str):
+        """Replace the expired stored session with the new one
+
+        The concurrent calls failed with the same session wait for the single
+        relogin, the calls sent with the replaced session are just repeated.
+        """
+        if self.relogin_lock is None:
+            # asyncio is imported here to keep the package import fast
+            from asyncio import Lock  # pylint: disable=import-outside-toplevel
+
+            self.relogin_lock = Lock()
+        async with self.relogin_lock:
+            if self.sid != sent_sid or not self.restored:
+                return  # the session is already replaced
+            LOGGER.debug("Stored session %s is expired", self.sid)
+            self.restored = False
+            self.sid = None
+            self.sid_store.delete(self._session_key())
+            await self.login()
+
+    async def _request(self, full_param_set: dict, priority: int, tag: str) -> dict:
+        if self.scheduler is not None:
+            await self.scheduler.acquire(priority, tag)
+        try:
+            async with self.client_session.post(
+                self.host + self.path, timeout=self.timeout, params=full_param_set
+            ) as resp:
+                return await resp.json()
+        finally:
+            if self.scheduler is not None:
+                self.scheduler.release(priority)
+
+    async def batch(self, calls: List[Tuple[str, dict]], raise_errors: bool = True) -> list:
+        """Execute several Wialon RemoteAPI methods with the single core/batch request
+
+        Arguments:
+            calls {List[Tuple[str, dict]]} -- (method, params) pairs
+
+        Keyword Arguments:
+            raise_errors {bool} -- raise the first method error, if False the error
+                is returned as APIError instance in place of the method response (default: {True})
+
+        Returns:
+            list -- method responses in the same order as the calls
+        """
+        if not calls:
+            return []
+        response = await self.call(
+            "core/batch",
+            {"params": [{"svc": method, "params": params or {}} for method, params in calls]},
+        )
+        result = []
+        for content in response:
+            if isinstance(content, dict) and content.get("error", 0) > 0:
+                code = content["error"]
+                error = get_error(code)(self.sid, code, content.get("reason", None))
+                if raise_errors:
+                    raise error
+                content = error
+            result.append(content)
+        return result
+
     async def login(self):
-        """ Login to the Wialon Remote API """
+        """Login to the Wialon Remote API
+
+        The session stored by the other process is reused if the session store
+        is set. The new session is stored only if it's shared (`share_sid`),
+        the other sessions are closed on exit and can't be reused.
+        """
         if self.sid is not None:
             return self
+        if self.sid_store is not None:
+            session_info = self.sid_store.get(self._session_key())
+            if session_info is not None:
+                LOGGER.debug("Reuse stored session (sid %s)", session_info["eid"])
+                self._set_session_info(session_info)
+                self.restored = True
+                return self
         session_info = await self.call("token/login", {"token": self.token})
         LOGGER.debug(
             "User %s logged in to %s (sid %s)",
@@ -110,17 +230,36 @@ class Session:
             session_info["host"],
             session_info["eid"],
         )
+        self._set_session_info(session_info)
+        if self.sid_store is not None and self.share_sid:
+            self.sid_store.set(self._session_key(), session_info)
+        return self
+
+    def _set_session_info(self, session_info: dict):
         self.sid = session_info["eid"]
         self.username = session_info["user"]["nm"]
         self.user_id = session_info["user"]["id"]
         self.account_id = session_info["user"]["bact"]
         self.session_info = session_info
-        return self
+
+    def _session_key(self) -> str:
+        return session_key(self.host + self.path, self.token)
 
     async def logout(self):
-        """ Logout Remote Wialon API session """
+        """Logout Remote Wialon API session
+
+        If the session is shared through the session store it's kept
+        alive and stored again to refresh its expiration time. The session
+        restored from the store isn't closed either, the other processes
+        can still use it.
+        """
         try:
-            if self.sid is not None:
+            if self.sid is not None and self.share_sid and self.sid_store is not None:
+                self.sid_store.set(self._session_key(), self.session_info)
+                LOGGER.debug("Session %s is kept for reuse", self.sid)
+            elif self.sid is not None and self.restored:
+                LOGGER.debug("Restored session %s is kept for the other users", self.sid)
+            elif self.sid is not None:
                 await self.call("core/logout")
                 LOGGER.debug("User %s logged out (sid %s)", self.username, self.sid)
         except APIError as exp:
@@ -129,6 +268,7 @@ class Session:
         finally:
             await self.client_session.close()
             self.sid = None
+            self.restored = False
             self.client_session = None
 
 
@@ -137,6 +277,10 @@ def connect(
     api_host: str = DEFAULT_API_HOST,
     api_path: str = DEFAULT_API_PATH,
     timeout: int = None,
+    sid_store: SidStore = None,
+    share_sid: bool = False,
+    scheduler: "Scheduler" = None,
+    hedging: "Hedging" = None,
 ) -> Session:
     """Create Wialon Remote API connection
 
@@ -147,8 +291,21 @@ def connect(
         api_host {str} -- Remote API host (default: {DEFAULT_API_HOST})
         api_path {str} -- Remote AIP query path (default: {DEFAULT_API_PATH})
         timeout {int} -- client session timeout
+        sid_store {SidStore} -- store to reuse the sessions between the processes (default: None)
+        share_sid {bool} -- keep the session alive on exit to reuse it (default: False)
+        scheduler {Scheduler} -- request priority scheduler (default: None)
+        hedging {Hedging} -- hedged request policy of the idempotent methods (default: None)
 
     Returns:
         Session -- Remote API connection context manager
     """
-    return Session(token, host=api_host, path=api_path, timeout=timeout)
+    return Session(
+        token,
+        host=api_host,
+        path=api_path,
+        timeout=timeout,
+        sid_store=sid_store,
+        share_sid=share_sid,
+        scheduler=scheduler,
+        hedging=hedging,
+    )
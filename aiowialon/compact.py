@@ -0,0 +1,97 @@
+""" Compact storage of the message parameters.
+
+    The messages of the unit usually have the same parameter names, so the
+    sets of the names (layouts) are interned by the schema shared by all the
+    unit messages. Every message keeps the reference to the layout and the
+    tuple of the values instead of the dictionary. The compact parameters are
+    read-only mappings, use dict(...) to get the regular dictionary.
+"""
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+COMPACT_FIELDS = ("p", "sensors_data")
+
+
+class Layout:
+    """ Interned parameter name set """
+
+    __slots__ = ("keys", "index")
+
+    def __init__(self, keys: Tuple[str, ...]):
+        self.keys = keys
+        self.index = {key: position for position, key in enumerate(keys)}
+
+
+class CompactParameters(Mapping):
+    """ Read-only mapping of the message parameters """
+
+    __slots__ = ("layout", "values")
+
+    def __init__(self, layout: Layout, values: tuple):
+        self.layout = layout
+        self.values = values
+
+    def __getitem__(self, key: str):
+        return self.values[self.layout.index[key]]
+
+    def __contains__(self, key) -> bool:
+        return key in self.layout.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.layout.keys)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __repr__(self) -> str:
+        return f"CompactParameters({dict(self)!r})"
+
+    def __reduce__(self):
+        return CompactParameters, (self.layout, self.values)
+
+
+class ParameterSchema:
+    """ Per-unit table of the parameter layouts """
+
+    def __init__(self):
+        self.layouts = {}  # type: Dict[Tuple[str, ...], Layout]
+
+    def keys(self) -> Iterable[str]:
+        """Get all the parameter names seen by the schema
+
+        Returns:
+            Iterable[str] -- parameter names
+        """
+        return dict.fromkeys(key for layout in self.layouts.values() for key in layout.keys)
+
+    def compact(self, params: Optional[dict]) -> Optional[CompactParameters]:
+        """Convert the parameter dictionary to the compact form
+
+        Arguments:
+            params {Optional[dict]} -- message parameters
+
+        Returns:
+            Optional[CompactParameters] -- compact parameters, None is returned as is
+        """
+        if params is None or isinstance(params, CompactParameters):
+            return params
+        keys = tuple(params)
+        layout = self.layouts.get(keys)
+        if layout is None:
+            layout = self.layouts[keys] = Layout(keys)
+        return CompactParameters(layout, tuple(params.values()))
+
+    def compact_messages(self, messages: Iterable[dict], fields: Iterable[str] = COMPACT_FIELDS):
+        """Replace the message parameters with the compact ones in place
+
+        Arguments:
+            messages {Iterable[dict]} -- messages
+
+        Keyword Arguments:
+            fields {Iterable[str]} -- message fields to compact (default: {("p", "sensors_data")})
+        """
+        fields = tuple(fields)
+        for message in messages:
+            for field in fields:
+                if isinstance(message.get(field), dict):
+                    message[field] = self.compact(message[field])
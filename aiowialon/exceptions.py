@@ -64,6 +64,10 @@ class InvalidInput(APIError):
     """ Invalid API input error """
 
 
+class ReportError(APIError):
+    """ Report execution error """
+
+
 CODE_TO_EXCEPTION_MAP = {
     1: AuthError,
     4: InvalidInput,
@@ -0,0 +1,277 @@
+""" Streaming message export to the columnar files.
+
+    The messages are written chunk by chunk as they are loaded from the API.
+    Apache Arrow IPC and Parquet formats are used if pyarrow is installed,
+    the memory mappable binary format is always available.
+
+    Binary format layout (all the numbers are little-endian):
+
+        8 bytes    magic b"AIOWMSG1"
+        4 bytes    uint32 header length H
+        H bytes    UTF-8 JSON header {"columns": [[name, numpy_dtype], ...]}
+                   padded with spaces to make the data offset a multiple of 8
+        N records  packed structured records, one per message, with the fields
+                   described by the header columns
+
+    The standard columns are unit, time, flags, inputs, outputs (int64) and
+    latitude, longitude, altitude, speed, course, satellites (float64).
+    The selected message parameters are stored as float64 columns named
+    `p_<parameter>`. The missing values are stored as NaN (-1 for the integers).
+"""
+import json
+import struct
+from datetime import datetime
+from importlib.util import find_spec
+from typing import Dict, Iterable, List, Optional, Union
+import numpy as np
+from aiowialon.client import Session
+from aiowialon.messages import MESSAGES_CHUNK_SIZE, iterate_messages, timestamp
+from aiowialon.utils import aclosing
+
+ARROW = "arrow"
+PARQUET = "parquet"
+BINARY = "binary"
+
+BINARY_MAGIC = b"AIOWMSG1"
+ARROW_MAGIC = b"ARROW1"
+PARQUET_MAGIC = b"PAR1"
+
+INTEGER_COLUMNS = ("unit", "time", "flags", "inputs", "outputs")
+POSITION_COLUMNS = {
+    "latitude": "y",
+    "longitude": "x",
+    "altitude": "z",
+    "speed": "s",
+    "course": "c",
+    "satellites": "sc",
+}
+
+
+def has_pyarrow() -> bool:
+    """ Check if pyarrow is installed without importing it """
+    return find_spec("pyarrow") is not None
+
+
+def _pyarrow():
+    """ Import pyarrow on the first use, it takes longer than the whole package import """
+    try:
+        # pylint: disable=import-outside-toplevel
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as exp:  # pragma: no cover
+        raise ImportError("pyarrow is required to read and write Arrow and Parquet files") from exp
+    return pyarrow
+
+
+def record_dtype(parameters: Iterable[str] = ()) -> np.dtype:
+    """Get the message record type
+
+    Keyword Arguments:
+        parameters {Iterable[str]} -- message parameters stored as columns (default: {()})
+
+    Returns:
+        np.dtype -- structured record type
+    """
+    return np.dtype(
+        [(name, "<i8") for name in INTEGER_COLUMNS]
+        + [(name, "<f8") for name in POSITION_COLUMNS]
+        + [(f"p_{name}", "<f8") for name in parameters]
+    )
+
+
+def to_records(unit_id: int, messages: List[dict], dtype: np.dtype) -> np.ndarray:
+    """Convert the messages to the structured records
+
+    Arguments:
+        unit_id {int} -- message unit identifier
+        messages {List[dict]} -- messages returned by load_messages(...)
+        dtype {np.dtype} -- record type
+
+    Returns:
+        np.ndarray -- message records
+    """
+    records = np.zeros(len(messages), dtype=dtype)
+    records["unit"] = unit_id
+    records["time"] = [message["t"] for message in messages]
+    for name, key in (("flags", "f"), ("inputs", "i"), ("outputs", "o")):
+        records[name] = [
+            -1 if message.get(key) is None else message[key] for message in messages
+        ]
+    for name, key in POSITION_COLUMNS.items():
+        records[name] = [(message.get("pos") or {}).get(key, np.nan) for message in messages]
+    for name in dtype.names[len(INTEGER_COLUMNS) + len(POSITION_COLUMNS) :]:
+        parameter = name[len("p_") :]
+        values = ((message.get("p") or {}).get(parameter) for message in messages)
+        records[name] = [
+            value if isinstance(value, (int, float)) else np.nan for value in values
+        ]
+    return records
+
+
+class MessageWriter:
+    """ Streaming columnar message file writer """
+
+    def __init__(self, path: str, file_format: str = None, parameters: Iterable[str] = ()):
+        """
+        Arguments:
+            path {str} -- output file path
+
+        Keyword Arguments:
+            file_format {str} -- ARROW, PARQUET or BINARY, if None ARROW is used if
+                pyarrow is installed, otherwise BINARY (default: {None})
+            parameters {Iterable[str]} -- message parameters stored as columns (default: {()})
+        """
+        if file_format is None:
+            file_format = ARROW if has_pyarrow() else BINARY
+        if file_format not in (ARROW, PARQUET, BINARY):
+            raise ValueError(f"Unknown file format: {file_format}")
+        self.path = path
+        self.file_format = file_format
+        self.dtype = record_dtype(parameters)
+        self.count = 0
+        self.writer = None
+        if file_format == BINARY:
+            self.writer = open(path, "wb")
+            columns = [[name, self.dtype[name].str] for name in self.dtype.names]
+            header = json.dumps({"columns": columns})
+            padding = -(len(BINARY_MAGIC) + 4 + len(header)) % 8
+            header = (header + " " * padding).encode()
+            self.writer.write(BINARY_MAGIC + struct.pack("<I", len(header)) + header)
+        else:
+            pyarrow = _pyarrow()
+            schema = pyarrow.schema(
+                [(name, pyarrow.from_numpy_dtype(self.dtype[name])) for name in self.dtype.names]
+            )
+            if file_format == ARROW:
+                self.writer = pyarrow.ipc.new_file(path, schema)
+            else:
+                self.writer = pyarrow.parquet.ParquetWriter(path, schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def write(self, unit_id: int, messages: List[dict]):
+        """Write the message chunk
+
+        Arguments:
+            unit_id {int} -- message unit identifier
+            messages {List[dict]} -- messages returned by load_messages(...)
+        """
+        if not messages:
+            return
+        records = to_records(unit_id, messages, self.dtype)
+        if self.file_format == BINARY:
+            self.writer.write(records.tobytes())
+        else:
+            self.writer.write_table(
+                _pyarrow().table({name: records[name] for name in self.dtype.names})
+            )
+        self.count += len(records)
+
+    def close(self):
+        """ Complete the file """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def _filter(columns: Dict, unit_id, begin, end) -> Dict[str, np.ndarray]:
+    mask = None
+    for condition in (
+        columns["unit"] == unit_id if unit_id is not None else None,
+        columns["time"] >= begin if begin is not None else None,
+        columns["time"] <= end if end is not None else None,
+    ):
+        if condition is not None:
+            mask = condition if mask is None else mask & condition
+    if mask is None:
+        return columns
+    return {name: column[mask] for name, column in columns.items()}
+
+
+def read_messages(
+    path: str,
+    unit_id: Optional[int] = None,
+    begin_time: Union[datetime, int, float, None] = None,
+    end_time: Union[datetime, int, float, None] = None,
+) -> Dict[str, np.ndarray]:
+    """Read the exported messages
+
+    The binary and Arrow files are memory-mapped, so the columns aren't copied
+    to the memory if no filter is set.
+
+    Arguments:
+        path {str} -- exported file path
+
+    Keyword Arguments:
+        unit_id {Optional[int]} -- read the unit messages only (default: {None})
+        begin_time {Union[datetime, int, float, None]} -- interval beginning (default: {None})
+        end_time {Union[datetime, int, float, None]} -- interval end (default: {None})
+
+    Returns:
+        Dict[str, np.ndarray] -- key value pairs column_name -> values
+    """
+    begin = timestamp(begin_time) if begin_time is not None else None
+    end = timestamp(end_time) if end_time is not None else None
+    with open(path, "rb") as infile:
+        magic = infile.read(len(BINARY_MAGIC))
+        if magic == BINARY_MAGIC:
+            (length,) = struct.unpack("<I", infile.read(4))
+            header = json.loads(infile.read(length))
+    if magic == BINARY_MAGIC:
+        dtype = np.dtype([tuple(column) for column in header["columns"]])
+        records = np.memmap(path, dtype=dtype, mode="r", offset=len(BINARY_MAGIC) + 4 + length)
+        columns = {name: records[name] for name in dtype.names}
+        return _filter(columns, unit_id, begin, end)
+
+    if not magic.startswith(ARROW_MAGIC) and not magic.startswith(PARQUET_MAGIC):
+        raise ValueError(f"Unknown message file format: {path}")
+    pyarrow = _pyarrow()
+    if magic.startswith(ARROW_MAGIC):
+        table = pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all()
+    else:
+        table = pyarrow.parquet.read_table(path, memory_map=True)
+    columns = {
+        name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names
+    }
+    return _filter(columns, unit_id, begin, end)
+
+
+async def export_messages(  # pylint: disable=too-many-arguments
+    session: Session,
+    path: str,
+    unit_ids: Iterable[int],
+    begin_time: Union[datetime, int, float],
+    end_time: Union[datetime, int, float],
+    file_format: str = None,
+    parameters: Iterable[str] = (),
+    chunk_size: int = MESSAGES_CHUNK_SIZE,
+) -> int:
+    """Export the units messages to the columnar file
+
+    Arguments:
+        session {Session} -- Wialon API session
+        path {str} -- output file path
+        unit_ids {Iterable[int]} -- unit identifiers
+        begin_time {Union[datetime, int, float]} -- datetime for the beginning of the interval
+        end_time {Union[datetime, int, float]} -- datetime of end of the interval
+
+    Keyword Arguments:
+        file_format {str} -- ARROW, PARQUET or BINARY (default: {None}, see MessageWriter)
+        parameters {Iterable[str]} -- message parameters stored as columns (default: {()})
+        chunk_size {int} -- the number of messages per page (default: {10000})
+
+    Returns:
+        int -- the number of the exported messages
+    """
+    with MessageWriter(path, file_format=file_format, parameters=parameters) as writer:
+        for unit_id in unit_ids:
+            chunks = iterate_messages(session, unit_id, begin_time, end_time, chunk_size=chunk_size)
+            async with aclosing(chunks):
+                async for messages in chunks:
+                    writer.write(unit_id, messages)
+        return writer.count
@@ -0,0 +1,260 @@
+""" Reverse geocoding with the spatially quantized cache.
+
+    The coordinates are snapped to the grid cells, every point of the cell is
+    not farther than the tolerance from the cell center, and the cell center
+    address is used for all of them. The addresses are cached in LRU order.
+    The lookups made during the short delay are sent with the single
+    gis_geocode request, the concurrent lookups of the same cell share the
+    request. The cache can be stored to the file to reuse it after restart.
+
+    Usage:
+
+        async with Geocoder(session, tolerance=25, cache_path="geocode.json") as geocoder:
+            address = await geocoder.address(latitude, longitude)
+"""
+import json
+import os
+import tempfile
+from asyncio import Future, gather, get_running_loop, shield
+from collections import OrderedDict
+from logging import getLogger
+from math import cos, degrees, floor, radians, sqrt
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+from aiowialon.client import Session
+from aiowialon.exceptions import APIError, get_error
+from aiowialon.utils import EARTH_RADIUS
+
+LOGGER = getLogger(__name__)
+
+DEFAULT_GEOCODING_HOST = "https://geocode-maps.wialon.com"
+DEFAULT_FLAGS = 1255211008  # country, region, city, street, house
+DEFAULT_TOLERANCE = 25.0
+DEFAULT_CACHE_SIZE = 100000
+GEOCODE_BATCH_SIZE = 50
+GEOCODE_BATCH_DELAY = 0.005
+
+Cell = Tuple[int, int]
+
+
+class Geocoder:
+    """ Batching reverse geocoder with the grid cell cache """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        session: Session,
+        tolerance: float = DEFAULT_TOLERANCE,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        cache_path: Optional[str] = None,
+        flags: int = DEFAULT_FLAGS,
+        batch_size: int = GEOCODE_BATCH_SIZE,
+        batch_delay: float = GEOCODE_BATCH_DELAY,
+        url: Optional[str] = None,
+    ):
+        """
+        Arguments:
+            session {Session} -- active user session
+
+        Keyword Arguments:
+            tolerance {float} -- maximum distance between the point and the geocoded
+                cell center, meters (default: {25.0})
+            cache_size {int} -- maximum number of the cached addresses (default: {100000})
+            cache_path {Optional[str]} -- file to load the cache from and to store it to
+                on exit (default: {None})
+            flags {int} -- gis_geocode address format flags (default: {1255211008})
+            batch_size {int} -- maximum number of points per request (default: {50})
+            batch_delay {float} -- time to collect the lookups to the request,
+                seconds (default: {0.005})
+            url {Optional[str]} -- gis_geocode URL, if None the Wialon geocoding service
+                of the session host is used (default: {None})
+        """
+        if tolerance <= 0:
+            raise ValueError(f"Invalid tolerance: {tolerance}")
+        self.session = session
+        self.tolerance = tolerance
+        self.cache_size = cache_size
+        self.cache_path = cache_path
+        self.flags = flags
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.url = url or f"{DEFAULT_GEOCODING_HOST}/{urlparse(session.host).netloc}/gis_geocode"
+        # The cell diagonal is twice the tolerance
+        self.step = degrees(tolerance * sqrt(2) / EARTH_RADIUS)
+        self.cache = OrderedDict()  # type: OrderedDict[Cell, str]
+        self.pending = {}  # type: Dict[Cell, Future]
+        self.queue = []  # type: List[Cell]
+        self.flush_handle = None
+        self.requests = set()
+        self.hits = 0
+        self.misses = 0
+        if cache_path is not None:
+            self.load()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    def cell(self, latitude: float, longitude: float) -> Cell:
+        """Get the grid cell of the point
+
+        Arguments:
+            latitude {float} -- point latitude
+            longitude {float} -- point longitude
+
+        Returns:
+            Cell -- (row, column) pair
+        """
+        row = floor(latitude / self.step)
+        return row, floor(longitude / self._longitude_step(row))
+
+    def center(self, cell: Cell) -> Tuple[float, float]:
+        """Get the grid cell center
+
+        Arguments:
+            cell {Cell} -- (row, column) pair
+
+        Returns:
+            Tuple[float, float] -- (latitude, longitude) pair
+        """
+        row, column = cell
+        return (row + 0.5) * self.step, (column + 0.5) * self._longitude_step(row)
+
+    def _longitude_step(self, row: int) -> float:
+        return self.step / max(cos(radians((row + 0.5) * self.step)), 1e-6)
+
+    async def address(self, latitude: float, longitude: float) -> str:
+        """Get the point address
+
+        Arguments:
+            latitude {float} -- point latitude
+            longitude {float} -- point longitude
+
+        Returns:
+            str -- address
+        """
+        return (await self.addresses([(latitude, longitude)]))[0]
+
+    async def addresses(self, points: Iterable[Tuple[float, float]]) -> List[str]:
+        """Get the point addresses
+
+        Arguments:
+            points {Iterable[Tuple[float, float]]} -- (latitude, longitude) pairs
+
+        Returns:
+            List[str] -- addresses in the same order as the points
+        """
+        cells = [self.cell(latitude, longitude) for latitude, longitude in points]
+        found, waiting = {}, {}
+        for cell in dict.fromkeys(cells):
+            if cell in self.cache:
+                self.cache.move_to_end(cell)
+                found[cell] = self.cache[cell]
+                self.hits += 1
+                continue
+            self.misses += 1
+            if cell not in self.pending:
+                self.pending[cell] = get_running_loop().create_future()
+                self.queue.append(cell)
+            waiting[cell] = self.pending[cell]
+        if len(self.queue) >= self.batch_size:
+            self._flush()
+        elif self.queue and self.flush_handle is None:
+            self.flush_handle = get_running_loop().call_later(self.batch_delay, self._flush)
+        if waiting:
+            # The futures are shared by the callers, the cancelled caller mustn't cancel them
+            results = await gather(*(shield(future) for future in waiting.values()))
+            found.update(zip(waiting, results))
+        return [found[cell] for cell in cells]
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        while self.queue:
+            cells, self.queue = self.queue[: self.batch_size], self.queue[self.batch_size :]
+            request = get_running_loop().create_task(self._request(cells))
+            self.requests.add(request)
+            request.add_done_callback(self.requests.discard)
+
+    async def _request(self, cells: List[Cell]):
+        coordinates = [
+            {"lat": latitude, "lon": longitude} for latitude, longitude in map(self.center, cells)
+        ]
+        params = {"coords": json.dumps(coordinates), "flags": self.flags}
+        if self.session.user_id is not None:
+            params["uid"] = self.session.user_id
+        try:
+            async with self.session.client_session.get(
+                self.url, params=params, timeout=self.session.timeout
+            ) as response:
+                content = await response.json(content_type=None)
+            if isinstance(content, dict) and content.get("error", 0) > 0:
+                code = content["error"]
+                raise get_error(code)(self.session.sid, code, content.get("reason", None))
+            if not isinstance(content, list) or len(content) != len(cells):
+                raise APIError(self.session.sid, 3, "unexpected geocoding response")
+        except Exception as error:  # pylint: disable=broad-except
+            LOGGER.warning("Geocoding of %d points failed: %s", len(cells), error)
+            for cell in cells:
+                future = self.pending.pop(cell)
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for cell, address in zip(cells, content):
+            self._store(cell, address)
+            future = self.pending.pop(cell)
+            if not future.done():
+                future.set_result(address)
+
+    def _store(self, cell: Cell, address: str):
+        self.cache[cell] = address
+        self.cache.move_to_end(cell)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def close(self):
+        """ Complete the pending lookups and store the cache """
+        self._flush()
+        if self.requests:
+            await gather(*self.requests)
+        if self.cache_path is not None:
+            self.save()
+
+    def load(self):
+        """ Load the cache from the file, the cache of the other tolerance is ignored """
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as infile:
+                data = json.load(infile)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            LOGGER.warning("Unable to load the geocoding cache %s", self.cache_path, exc_info=True)
+            return
+        if data.get("tolerance") != self.tolerance or data.get("flags") != self.flags:
+            LOGGER.debug("Geocoding cache %s parameters don't match", self.cache_path)
+            return
+        for row, column, address in data["cells"]:
+            self._store((row, column), address)
+        LOGGER.debug("%d addresses loaded from %s", len(self.cache), self.cache_path)
+
+    def save(self):
+        """ Store the cache to the file """
+        data = {
+            "tolerance": self.tolerance,
+            "flags": self.flags,
+            "cells": [[row, column, address] for (row, column), address in self.cache.items()],
+        }
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as outfile:
+                json.dump(data, outfile)
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            LOGGER.warning("Unable to store the geocoding cache to %s", self.cache_path)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
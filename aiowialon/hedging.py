@@ -0,0 +1,148 @@
+""" Hedged requests of the idempotent API methods.
+
+    If the request of the idempotent method isn't completed during the delay
+    taken as the percentile of the recent method latencies, the duplicate
+    request is sent. The first completed one is used and the other one is
+    cancelled. The duplicates are limited by the token bucket: every call adds
+    `budget` tokens, every duplicate costs one token, so the extra load doesn't
+    exceed the `budget` share of the calls.
+
+    Only the primary requests are timed. The primary request cancelled when
+    the duplicate wins is recorded with the time it has been running as the
+    lower bound of its latency, so the delay isn't biased to the fast requests.
+
+    Usage:
+
+        async with connect(token, hedging=Hedging(percentile=0.95, budget=0.05)) as session:
+            ...
+"""
+from asyncio import FIRST_COMPLETED, ensure_future, get_running_loop, wait
+from collections import deque
+from logging import getLogger
+from typing import Awaitable, Callable, Deque, Dict, Iterable, Optional
+
+LOGGER = getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(
+    [
+        "core/search_item",
+        "core/search_items",
+        "resource/get_zone_data",
+        "resource/get_zones_by_point",
+        "account/get_account_data",
+    ]
+)
+
+DEFAULT_PERCENTILE = 0.95
+DEFAULT_BUDGET = 0.05
+HISTORY_SIZE = 200
+MIN_SAMPLES = 20
+MAX_BURST = 10.0
+
+
+class Hedging:
+    """ Hedged request policy and statistics """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        methods: Iterable[str] = IDEMPOTENT_METHODS,
+        percentile: float = DEFAULT_PERCENTILE,
+        budget: float = DEFAULT_BUDGET,
+        min_delay: float = 0.0,
+        history_size: int = HISTORY_SIZE,
+        min_samples: int = MIN_SAMPLES,
+    ):
+        """
+        Keyword Arguments:
+            methods {Iterable[str]} -- hedged idempotent methods (default: {IDEMPOTENT_METHODS})
+            percentile {float} -- latency percentile used as the hedging delay (default: {0.95})
+            budget {float} -- maximum share of the duplicate requests (default: {0.05})
+            min_delay {float} -- minimum hedging delay, seconds (default: {0.0})
+            history_size {int} -- the number of the recent latencies per method (default: {200})
+            min_samples {int} -- the requests aren't hedged until the method history
+                has the number of the latencies (default: {20})
+        """
+        if not 0 < percentile < 1:
+            raise ValueError(f"Invalid percentile: {percentile}")
+        self.methods = frozenset(methods)
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.history_size = history_size
+        self.min_samples = min_samples
+        self.latencies = {}  # type: Dict[str, Deque[float]]
+        self.tokens = 0.0
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def delay(self, method: str) -> Optional[float]:
+        """Get the hedging delay of the method
+
+        Arguments:
+            method {str} -- method name
+
+        Returns:
+            Optional[float] -- delay in seconds or None if the history is too short
+        """
+        latencies = self.latencies.get(method)
+        if latencies is None or len(latencies) < self.min_samples:
+            return None
+        ordered = sorted(latencies)
+        index = min(int(self.percentile * len(ordered)), len(ordered) - 1)
+        return max(ordered[index], self.min_delay)
+
+    def _record(self, method: str, latency: float):
+        if method not in self.latencies:
+            self.latencies[method] = deque(maxlen=self.history_size)
+        self.latencies[method].append(latency)
+
+    async def _timed(self, method: str, request: Callable[[], Awaitable]):
+        loop = get_running_loop()
+        started = loop.time()
+        try:
+            return await request()
+        finally:
+            # The cancelled request time is the lower bound of its latency
+            self._record(method, loop.time() - started)
+
+    async def run(self, method: str, request: Callable[[], Awaitable]):
+        """Execute the request with hedging
+
+        Arguments:
+            method {str} -- method name
+            request {Callable[[], Awaitable]} -- function starting the request
+
+        Returns:
+            Any -- the first completed request result
+        """
+        if method not in self.methods:
+            return await request()
+        self.calls += 1
+        self.tokens = min(self.tokens + self.budget, MAX_BURST)
+        delay = self.delay(method)
+        primary = ensure_future(self._timed(method, request))
+        if delay is None:
+            return await primary
+        tasks = {primary}
+        try:
+            done, _ = await wait(tasks, timeout=delay)
+            if done or self.tokens < 1:
+                return await primary
+            self.tokens -= 1
+            self.hedged += 1
+            LOGGER.debug("Hedge %s request after %.3f seconds", method, delay)
+            secondary = ensure_future(request())
+            tasks.add(secondary)
+            while True:
+                done, tasks = await wait(tasks, return_when=FIRST_COMPLETED)
+                # The failed request wins only if the other one has failed too
+                for task in sorted(done, key=lambda task: task.exception() is not None):
+                    if task.exception() is None or not tasks:
+                        self.hedge_wins += task is secondary
+                        return task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
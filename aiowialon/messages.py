@@ -1,10 +1,26 @@
+""" Unit message loading.
+
+    Wialon keeps the single loaded message interval per session: the next
+    messages/load_interval replaces the previous one. So the message loader
+    of the session is locked from the interval loading until messages/unload,
+    the concurrent loading with the same session is serialized. Use separate
+    sessions to load the messages in parallel.
+"""
 from datetime import datetime
 from itertools import zip_longest
-from typing import Union
+from typing import TYPE_CHECKING, AsyncIterator, Union
+from weakref import WeakKeyDictionary
 from aiowialon.client import Session
-from aiowialon.exceptions import InvalidInput
+from aiowialon.compact import ParameterSchema
 from aiowialon.flags import Messages, join
 
+if TYPE_CHECKING:  # pragma: no cover
+    from aiowialon.sensors import SensorEngine
+
+MESSAGES_CHUNK_SIZE = 10000
+
+_LOCKS = WeakKeyDictionary()  # type: WeakKeyDictionary
+
 
 def timestamp(date: Union[datetime, int, float]) -> int:
     """Adjust any datetime value to POSIX timestamp
@@ -20,44 +36,54 @@ def timestamp(date: Union[datetime, int, float]) -> int:
     return int(date.timestamp())
 
 
+class _LoaderLock:  # pylint: disable=too-few-public-methods
+    """ The session message loader lock and its owner task """
+
+    def __init__(self):
+        # asyncio is imported here to keep the package import fast
+        from asyncio import Lock  # pylint: disable=import-outside-toplevel
+
+        self.lock = Lock()
+        self.owner = None
+
+
 class MessageLoader:
-    """ Context messager to clean up the message loader after requests """
+    """Context manager to hold the session message loader
+
+    The loader is locked until the messages are unloaded on exit. The nested
+    loading with the same session in the same task can't get the lock, so
+    RuntimeError is raised instead of the deadlock.
+    """
 
     def __init__(self, session: Session):
         self.session = session
 
     async def __aenter__(self):
+        from asyncio import current_task  # pylint: disable=import-outside-toplevel
+
+        loader_lock = _LOCKS.get(self.session)
+        if loader_lock is None:
+            loader_lock = _LOCKS[self.session] = _LoaderLock()
+        task = current_task()
+        if loader_lock.owner is task:
+            raise RuntimeError(
+                "The session message loader is already used by the task, "
+                "complete or close the previous message iteration first"
+            )
+        await loader_lock.lock.acquire()
+        loader_lock.owner = task
         return self.session
 
     async def __aexit__(self, *_):
-        await self.session.call("messages/unload")
+        loader_lock = _LOCKS[self.session]
+        try:
+            await self.session.call("messages/unload")
+        finally:
+            loader_lock.owner = None
+            loader_lock.lock.release()
 
 
 # pylint: disable=too-many-arguments
-async def _call_load_messages(
-    session: Session,
-    item_id: int,
-    begin_time: Union[datetime, int, float],
-    end_time: Union[datetime, int, float],
-    flags: set,
-    flag_mask: int,
-    count: int,
-):
-    try:
-        await session.call("messages/unload")
-    except InvalidInput:
-        pass
-    return await session.call(
-        "messages/load_interval",
-        {
-            "itemId": item_id,
-            "timeFrom": timestamp(begin_time),
-            "timeTo": timestamp(end_time),
-            "flags": join(flags),
-            "flagsMask": flag_mask,
-            "loadCount": count,
-        },
-    )
 
 
 async def get_messages_count(
@@ -70,6 +96,8 @@ async def get_messages_count(
 ) -> int:
     """Get the number of messages received during the time interval.
 
+    The session message loader is locked during the call (see MessageLoader).
+
     Arguments:
         session {Session} -- Wialon API session
         item_id {int} -- item identifier
@@ -107,9 +135,14 @@ async def load_messages(
     flag_mask: int = 0xFF00,
     count: int = 0xFFFFFFFF,
     include_sensor_data=False,
+    sensor_engine: "SensorEngine" = None,
+    compact: bool = False,
+    schema: ParameterSchema = None,
 ) -> list:
     """Load the messages received during the time interval.
 
+    The session message loader is locked during the call (see MessageLoader).
+
     Arguments:
         session {Session} -- Wialon API session
         item_id {int} -- item identifier
@@ -120,6 +153,14 @@ async def load_messages(
         flags {set} -- request flags (default: {None})
         flag_mask {[type]} -- flag mask (default: {0xFF00})
         count {int} -- the number of messages to load (default: {0xFFFFFFFF})
+        include_sensor_data {bool} -- add the sensor values calculated by the server
+            (unit/calc_sensors request) to the messages (default: {False})
+        sensor_engine {SensorEngine} -- add the sensor values calculated locally by the
+            engine to the messages, implies `include_sensor_data` (default: {None})
+        compact {bool} -- store the message parameters and the sensor values as the
+            compact read-only mappings (default: {False})
+        schema {ParameterSchema} -- the unit parameter schema shared by the calls,
+            implies compact mode (default: {None})
 
     Returns:
         list -- message list
@@ -137,7 +178,10 @@ async def load_messages(
             },
         )
         messages = response["messages"]
-        if include_sensor_data and messages:
+        if sensor_engine is not None and messages:
+            for message, sensor_data in zip(messages, sensor_engine.calculate(messages)):
+                message["sensors_data"] = sensor_data
+        elif include_sensor_data and messages:
             sensors = await loader.call(
                 "unit/calc_sensors",
                 {
@@ -157,7 +201,71 @@ async def load_messages(
             for message, sensor_data in zip_longest(messages, sensors):
                 message["sensors_data"] = sensor_data
 
+        if compact or schema is not None:
+            (schema or ParameterSchema()).compact_messages(messages)
         return messages
 
 
+async def iterate_messages(
+    session: Session,
+    item_id: int,
+    begin_time: Union[datetime, int, float],
+    end_time: Union[datetime, int, float],
+    flags: set = None,
+    flag_mask: int = 0xFF00,
+    chunk_size: int = MESSAGES_CHUNK_SIZE,
+    schema: ParameterSchema = None,
+) -> AsyncIterator[list]:
+    """Load the messages received during the time interval chunk by chunk.
+
+    The interval is loaded to the session once, the messages are requested
+    with messages/get_messages in the pages of `chunk_size` messages.
+
+    The session message loader is locked until the iteration is completed or
+    the iterator is closed (see MessageLoader), so the other message requests
+    with the session wait for it. Close the iterator explicitly if the loop can
+    be left early, otherwise the lock is released on the garbage collection only:
+
+        async with aclosing(iterate_messages(session, ...)) as chunks:
+            async for messages in chunks:
+                ...
+
+    Arguments:
+        session {Session} -- Wialon API session
+        item_id {int} -- item identifier
+        begin_time {Union[datetime, int, float]} -- datetime for the beginning of the interval
+        end_time {Union[datetime, int, float]} -- datetime of end of the interval
+
+    Keyword Arguments:
+        flags {set} -- request flags (default: {None})
+        flag_mask {[type]} -- flag mask (default: {0xFF00})
+        chunk_size {int} -- the number of messages per page (default: {10000})
+        schema {ParameterSchema} -- store the message parameters as the compact
+            mappings using the unit schema (default: {None})
+
+    Returns:
+        AsyncIterator[list] -- message list iterator
+    """
+    async with MessageLoader(session) as loader:  # type: Session
+        response = await loader.call(
+            "messages/load_interval",
+            {
+                "itemId": item_id,
+                "timeFrom": timestamp(begin_time),
+                "timeTo": timestamp(end_time),
+                "flags": join(flags or {Messages.DATA}),
+                "flagsMask": flag_mask,
+                "loadCount": 0,
+            },
+        )
+        for index_from in range(0, response["count"], chunk_size):
+            index_to = min(index_from + chunk_size, response["count"]) - 1
+            messages = await loader.call(
+                "messages/get_messages", {"indexFrom": index_from, "indexTo": index_to}
+            )
+            if schema is not None:
+                schema.compact_messages(messages)
+            yield messages
+
+
 # pylint: enable=too-many-arguments
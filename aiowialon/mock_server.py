@@ -0,0 +1,636 @@
+""" Local mock of the Wialon Remote API server.
+
+    The server generates a synthetic fleet (units with the tracks and sensors,
+    resources with the geofences) of the configurable size and implements the
+    subset of the API methods used by the package. The latency and the errors
+    can be injected to test and benchmark the client without a Wialon account.
+
+    Usage:
+
+        async with MockServer(units=10, areas=100) as server:
+            async with connect(server.token, api_host=server.url) as session:
+                ...
+"""
+import json
+import random
+from asyncio import sleep
+from logging import getLogger
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from aiohttp import web
+from aiowialon.client import DEFAULT_API_PATH
+from aiowialon.flags import Resources, Units
+from aiowialon.resources import build_area
+from aiowialon.sensors import INVALID_VALUE
+
+LOGGER = getLogger(__name__)
+
+DEFAULT_TOKEN = "mock-token"
+DEFAULT_START_TIME = 1600000000
+GEOCODE_PATH = "/gis_geocode"
+
+CENTER = (55.75, 37.62)  # the synthetic fleet area center
+SPREAD = 0.5  # the synthetic fleet area half size, degrees
+
+SENSORS = {
+    "1": {"id": 1, "n": "Voltage", "t": "voltage", "m": "V", "p": "pwr_ext/const1000", "tbl": []},
+    "2": {"id": 2, "n": "Ignition", "t": "engine operation", "m": "", "p": "io:1", "tbl": []},
+    "3": {
+        "id": 3,
+        "n": "Fuel",
+        "t": "fuel level",
+        "m": "l",
+        "p": "adc1",
+        "tbl": [{"x": 0, "a": 10, "b": 0}, {"x": 5, "a": 8, "b": 10}],
+        "vs": 2,
+        "vt": 11,
+    },
+}
+
+
+def sensor_values(message: dict) -> Dict[str, float]:
+    """Calculate the SENSORS values the way the server does
+
+    The values are calculated independently of aiowialon.sensors,
+    so the local calculation can be checked against them.
+
+    Arguments:
+        message {dict} -- unit message
+
+    Returns:
+        Dict[str, float] -- key value pairs sensor_id -> value in the unit/calc_sensors format
+    """
+    params = message["p"]
+    ignition = float(params["io"] >> 1 & 1)  # io:1 is the second bit
+    adc = params["adc1"]
+    fuel = (10 * adc if adc < 5 else 8 * adc + 10) if ignition else INVALID_VALUE
+    return {"1": params["pwr_ext"] / 1000, "2": ignition, "3": fuel}
+
+
+REPORT_TEMPLATE = {"id": 1, "n": "Hourly activity", "ct": "avl_unit", "c": 1}
+REPORT_HEADER = ["Interval", "Messages", "Max speed"]
+REPORT_GROUP = 3600  # report row interval, seconds
+REPORT_SUBGROUP = 600  # report subrow interval, seconds
+
+
+class MockError(Exception):
+    """ API error raised by the mock method handlers """
+
+    def __init__(self, code: int):
+        super().__init__(code)
+        self.code = code
+
+
+class Fleet:
+    """ Synthetic fleet data """
+
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
+
+    def __init__(
+        self,
+        units: int = 10,
+        resources: int = 1,
+        areas: int = 100,
+        messages: int = 86400,
+        message_interval: int = 1,
+        start_time: int = DEFAULT_START_TIME,
+        seed: int = 0,
+    ):
+        """
+        Keyword Arguments:
+            units {int} -- the number of units (default: {10})
+            resources {int} -- the number of resources (default: {1})
+            areas {int} -- the number of areas per resource (default: {100})
+            messages {int} -- the number of messages per unit (default: {86400})
+            message_interval {int} -- the time between unit messages, seconds (default: {1})
+            start_time {int} -- the first message time (default: {DEFAULT_START_TIME})
+            seed {int} -- random generator seed (default: {0})
+        """
+        self.seed = seed
+        self.start_time = start_time
+        self.message_count = messages
+        self.message_interval = message_interval
+        self.user = {"nm": "mock_user", "id": 1, "bact": 2}
+        self.units = {
+            unit_id: {"id": unit_id, "nm": f"Unit {unit_id:05d}", "cls": 2, "uacl": -1}
+            for unit_id in range(1000, 1000 + units)
+        }
+        self.resources = {}
+        generator = random.Random(seed)
+        area_id = 1
+        for index in range(resources):
+            resource_id = self.user["bact"] if index == 0 else 100 + index
+            zones = {}
+            for _ in range(areas):
+                zones[area_id] = self._area(generator, resource_id, area_id)
+                area_id += 1
+            self.resources[resource_id] = {
+                "id": resource_id,
+                "nm": f"Resource {resource_id}",
+                "cls": 3,
+                "uacl": -1,
+                "zl": zones,
+                "rep": {1: dict(REPORT_TEMPLATE)},
+            }
+        self.tracks = {}
+
+    @staticmethod
+    def _area(generator: random.Random, resource_id: int, area_id: int) -> dict:
+        latitude = CENTER[0] + generator.uniform(-SPREAD, SPREAD)
+        longitude = CENTER[1] + generator.uniform(-SPREAD, SPREAD)
+        size = generator.uniform(0.001, 0.02)
+        area = {
+            "id": area_id,
+            "rid": resource_id,
+            "n": f"Area {area_id}",
+            "d": "",
+            "f": 0,
+            "c": 0,
+            "mt": DEFAULT_START_TIME,
+            "ct": DEFAULT_START_TIME,
+        }
+        if area_id % 2:
+            area["t"] = 3
+            area["w"] = size * 111195
+            area["p"] = [{"x": longitude, "y": latitude, "r": size * 111195}]
+        else:
+            corners = generator.randint(3, 8)
+            angles = sorted(generator.uniform(0, 2 * np.pi) for _ in range(corners))
+            area["t"] = 2
+            area["w"] = 0
+            area["p"] = [
+                {
+                    "x": longitude + size * np.cos(angle),
+                    "y": latitude + size * np.sin(angle),
+                    "r": 0,
+                }
+                for angle in angles
+            ]
+        return area
+
+    def track(self, unit_id: int) -> Dict[str, np.ndarray]:
+        """Get (generate) the unit track columns
+
+        Arguments:
+            unit_id {int} -- unit identifier
+
+        Returns:
+            Dict[str, np.ndarray] -- key value pairs column -> values
+        """
+        if unit_id not in self.tracks:
+            generator = np.random.default_rng(self.seed * 100000 + unit_id)
+            count = self.message_count
+            # Alternating moving and parking intervals of random length
+            lengths = generator.integers(60, 1800, size=count // 60 + 2)
+            moving = np.repeat(np.arange(len(lengths)) % 2 == 1, lengths)[:count]
+            speed = np.where(moving, generator.uniform(20, 90, size=count), 0).round()
+            course = np.cumsum(generator.normal(0, 5, size=count)) % 360
+            step = speed / 3.6 * self.message_interval / 111195
+            latitude = CENTER[0] + generator.uniform(-SPREAD, SPREAD) / 2
+            longitude = CENTER[1] + generator.uniform(-SPREAD, SPREAD) / 2
+            self.tracks[unit_id] = {
+                "t": self.start_time + np.arange(count) * self.message_interval,
+                "y": latitude + np.cumsum(step * np.cos(np.radians(course))),
+                "x": longitude + np.cumsum(step * np.sin(np.radians(course))),
+                "s": speed,
+                "c": course.round(),
+                "io": moving.astype(int) * 2,
+                "pwr_ext": generator.integers(11500, 14500, size=count),
+                "adc1": np.abs(generator.normal(5, 2, size=count)).round(2),
+            }
+        return self.tracks[unit_id]
+
+    def messages(self, unit_id: int, time_from: int, time_to: int) -> List[dict]:
+        """Get the unit messages for the time interval
+
+        Arguments:
+            unit_id {int} -- unit identifier
+            time_from {int} -- interval beginning
+            time_to {int} -- interval end
+
+        Returns:
+            List[dict] -- messages
+        """
+        track = self.track(unit_id)
+        first = np.searchsorted(track["t"], time_from, side="left")
+        last = np.searchsorted(track["t"], time_to, side="right")
+        columns = {key: values[first:last].tolist() for key, values in track.items()}
+        return [
+            {
+                "t": columns["t"][index],
+                "f": 1,
+                "tp": "ud",
+                "pos": {
+                    "y": columns["y"][index],
+                    "x": columns["x"][index],
+                    "c": columns["c"][index],
+                    "z": 150,
+                    "s": columns["s"][index],
+                    "sc": 12,
+                },
+                "i": columns["io"][index],
+                "o": 0,
+                "lc": 0,
+                "p": {
+                    "pwr_ext": columns["pwr_ext"][index],
+                    "adc1": columns["adc1"][index],
+                    "io": columns["io"][index],
+                },
+            }
+            for index in range(len(columns["t"]))
+        ]
+
+
+class MockServer:
+    """ Mock Wialon Remote API server """
+
+    # pylint: disable=too-many-instance-attributes,too-many-arguments
+
+    def __init__(
+        self,
+        fleet: Fleet = None,
+        token: str = DEFAULT_TOKEN,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_codes: List[int] = None,
+        method_latency: Dict[str, float] = None,
+        seed: int = 0,
+        **fleet_kwargs,
+    ):
+        """
+        Keyword Arguments:
+            fleet {Fleet} -- synthetic data, if None it's created with the rest
+                of the keyword arguments (default: {None})
+            token {str} -- the valid access token (default: {DEFAULT_TOKEN})
+            host {str} -- listening address (default: {"127.0.0.1"})
+            port {int} -- listening port, 0 to choose a free one (default: {0})
+            latency {float} -- response delay, seconds (default: {0.0})
+            jitter {float} -- maximum random addition to the delay, seconds (default: {0.0})
+            error_rate {float} -- the share of the requests failed with the error (default: {0.0})
+            error_codes {List[int]} -- the injected error codes (default: {[5]})
+            method_latency {Dict[str, float]} -- per method response delay (default: {None})
+            seed {int} -- random generator seed (default: {0})
+        """
+        self.fleet = fleet or Fleet(seed=seed, **fleet_kwargs)
+        self.token = token
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_codes = error_codes or [5]
+        self.method_latency = method_latency or {}
+        self.random = random.Random(seed)
+        self.sessions = {}  # sid -> loaded messages
+        self.reports = {}  # sid -> report result
+        self.requests = {}  # method -> the number of the requests
+        self.runner = None  # type: web.AppRunner
+        self.url = None
+        self.handlers = {
+            "token/login": self.token_login,
+            "core/logout": self.core_logout,
+            "core/search_items": self.core_search_items,
+            "core/search_item": self.core_search_item,
+            "messages/load_interval": self.messages_load_interval,
+            "messages/get_messages": self.messages_get_messages,
+            "messages/unload": self.messages_unload,
+            "unit/calc_sensors": self.unit_calc_sensors,
+            "resource/get_zone_data": self.resource_get_zone_data,
+            "resource/get_zones_by_point": self.resource_get_zones_by_point,
+            "account/get_account_data": self.account_get_account_data,
+            "report/exec_report": self.report_exec_report,
+            "report/get_report_status": self.report_get_report_status,
+            "report/apply_report_result": self.report_apply_report_result,
+            "report/get_result_rows": self.report_get_result_rows,
+            "report/get_result_subrows": self.report_get_result_subrows,
+            "report/cleanup_result": self.report_cleanup_result,
+        }  # type: Dict[str, Callable]
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    async def start(self) -> str:
+        """Start the server
+
+        Returns:
+            str -- server URL to use as the API host
+        """
+        app = web.Application()
+        app.router.add_route("*", DEFAULT_API_PATH, self.handle)
+        app.router.add_get(GEOCODE_PATH, self.handle_geocode)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://{self.host}:{port}"
+        LOGGER.debug("Mock Wialon server started on %s", self.url)
+        return self.url
+
+    async def close(self):
+        """ Stop the server """
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    @property
+    def geocode_url(self) -> str:
+        """ Reverse geocoding service URL """
+        return self.url + GEOCODE_PATH
+
+    async def handle_geocode(self, request: web.Request) -> web.Response:
+        """ Handle gis_geocode request, the address is the formatted coordinates """
+        self.requests["gis_geocode"] = self.requests.get("gis_geocode", 0) + 1
+        delay = self.method_latency.get("gis_geocode", self.latency)
+        delay += self.random.uniform(0, self.jitter)
+        if delay > 0:
+            await sleep(delay)
+        try:
+            coordinates = json.loads(request.query["coords"])
+            content = [f"{point['lat']:.6f}, {point['lon']:.6f}" for point in coordinates]
+        except (KeyError, TypeError, ValueError):
+            content = {"error": 4}
+        return web.json_response(content)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """ Handle the API request """
+        query = dict(request.query)
+        if request.can_read_body:
+            query.update(await request.post())
+        method = query.get("svc")
+        self.requests[method] = self.requests.get(method, 0) + 1
+        delay = self.method_latency.get(method, self.latency) + self.random.uniform(0, self.jitter)
+        if delay > 0:
+            await sleep(delay)
+        if self.error_rate and self.random.random() < self.error_rate:
+            return web.json_response({"error": self.random.choice(self.error_codes)})
+        try:
+            params = json.loads(query.get("params") or "{}")
+            content = self.dispatch(method, params, query.get("sid"))
+        except MockError as error:
+            content = {"error": error.code}
+        except (KeyError, TypeError, ValueError):
+            content = {"error": 4}
+        return web.json_response(content)
+
+    def dispatch(self, method: str, params: dict, sid: Optional[str]):
+        """ Execute the method """
+        if method == "core/batch":
+            self._check_session(sid)
+            result = []
+            for item in params["params"]:
+                try:
+                    result.append(self.dispatch(item["svc"], item.get("params") or {}, sid))
+                except MockError as error:
+                    result.append({"error": error.code})
+            return result
+        if method not in self.handlers:
+            raise MockError(2)
+        if method != "token/login":
+            self._check_session(sid)
+        return self.handlers[method](params, sid)
+
+    def _check_session(self, sid: Optional[str]):
+        if sid not in self.sessions:
+            raise MockError(1)
+
+    def token_login(self, params: dict, _) -> dict:
+        """ token/login """
+        if params.get("token") != self.token:
+            raise MockError(8)
+        sid = "%032x" % self.random.getrandbits(128)
+        self.sessions[sid] = None
+        return {"eid": sid, "host": self.host, "user": dict(self.fleet.user), "tm": 0}
+
+    def core_logout(self, _, sid: str) -> dict:
+        """ core/logout """
+        self.sessions.pop(sid, None)
+        self.reports.pop(sid, None)
+        return {"error": 0}
+
+    def _item(self, item: dict, items_type: str, flags: int) -> dict:
+        item = {key: value for key, value in item.items() if key not in ("zl", "rep")}
+        if items_type == "avl_unit" and Units.SENSORS.check(flags):
+            item["sens"] = SENSORS
+        if items_type == "avl_resource" and Resources.GEOFENCES.check(flags):
+            zones = self.fleet.resources[item["id"]]["zl"]
+            item["zl"] = {
+                str(area_id): {key: value for key, value in area.items() if key != "p"}
+                for area_id, area in zones.items()
+            }
+        if items_type == "avl_resource" and Resources.REPORT_TEMPLATES.check(flags):
+            item["rep"] = {
+                str(template_id): template
+                for template_id, template in self.fleet.resources[item["id"]]["rep"].items()
+            }
+        return item
+
+    def core_search_items(self, params: dict, _) -> dict:
+        """ core/search_items """
+        items_type = params["spec"]["itemsType"]
+        source = {"avl_unit": self.fleet.units, "avl_resource": self.fleet.resources}
+        if items_type not in source:
+            raise MockError(4)
+        items = [
+            self._item(item, items_type, params.get("flags", 0))
+            for _, item in sorted(source[items_type].items())
+        ]
+        if params["spec"].get("propName") == "rel_is_account":
+            # Every resource of the mock fleet is the account
+            items = [item for item in items if item["id"] in self.fleet.resources]
+        first, last = params.get("from", 0), params.get("to", 0)
+        if last:
+            items = items[first : last + 1]
+        return {"totalItemsCount": len(items), "indexFrom": first, "indexTo": last, "items": items}
+
+    def core_search_item(self, params: dict, _) -> dict:
+        """ core/search_item """
+        item_id = params["id"]
+        for items_type, source in (
+            ("avl_unit", self.fleet.units),
+            ("avl_resource", self.fleet.resources),
+        ):
+            if item_id in source:
+                return {"item": self._item(source[item_id], items_type, params.get("flags", 0))}
+        raise MockError(4)
+
+    def messages_load_interval(self, params: dict, sid: str) -> dict:
+        """ messages/load_interval """
+        if params["itemId"] not in self.fleet.units:
+            raise MockError(4)
+        messages = self.fleet.messages(params["itemId"], params["timeFrom"], params["timeTo"])
+        self.sessions[sid] = (params["itemId"], messages)
+        if not messages:
+            return {"count": 0, "messages": []}
+        return {"count": len(messages), "messages": messages[: params.get("loadCount", 0)]}
+
+    def _loaded(self, sid: str) -> list:
+        if self.sessions.get(sid) is None:
+            raise MockError(4)
+        return self.sessions[sid][1]
+
+    def messages_get_messages(self, params: dict, sid: str) -> list:
+        """ messages/get_messages """
+        return self._loaded(sid)[params["indexFrom"] : params["indexTo"] + 1]
+
+    def messages_unload(self, _, sid: str) -> dict:
+        """ messages/unload """
+        self.sessions[sid] = None
+        return {}
+
+    def unit_calc_sensors(self, params: dict, sid: str) -> list:
+        """ unit/calc_sensors """
+        messages = self._loaded(sid)[params["indexFrom"] : params["indexTo"] + 1]
+        return [sensor_values(message) for message in messages]
+
+    def resource_get_zone_data(self, params: dict, _) -> list:
+        """ resource/get_zone_data """
+        if params["itemId"] not in self.fleet.resources:
+            raise MockError(7)
+        zones = self.fleet.resources[params["itemId"]]["zl"]
+        area_id_list = params.get("col") or list(zones)
+        return [zones[area_id] for area_id in area_id_list if area_id in zones]
+
+    def resource_get_zones_by_point(self, params: dict, _) -> dict:
+        """ resource/get_zones_by_point """
+        spec = params["spec"]
+        result = {}
+        for resource_id, area_id_list in spec["zoneId"].items():
+            zones = self.fleet.resources.get(int(resource_id), {}).get("zl", {})
+            found = {}
+            for area_id in area_id_list or list(zones):
+                area = build_area(zones[area_id])
+                if area.contains(spec["lat"], spec["lon"]):
+                    found[str(area_id)] = 0
+            if found:
+                result[str(resource_id)] = found
+        return result
+
+    def account_get_account_data(self, params: dict, _) -> dict:
+        """ account/get_account_data """
+        if params["itemId"] not in self.fleet.resources:
+            raise MockError(7)
+        data = {
+            "plan": "mock",
+            "enabled": 1,
+            "flags": 0,
+            "balance": "0.00",
+            "daysCounter": 30,
+            "parentAccountId": self.fleet.user["bact"],
+        }
+        if params.get("type", 1) > 1:
+            data["services"] = {
+                "avl_unit": {"type": 1, "usage": len(self.fleet.units), "maxUsage": -1},
+                "avl_resource": {"type": 1, "usage": len(self.fleet.resources), "maxUsage": -1},
+            }
+        return data
+
+    @staticmethod
+    def _report_row(messages: List[dict], size: int) -> dict:
+        first, last = messages[0]["t"], messages[-1]["t"]
+        return {
+            "n": 0,
+            "i1": 0,
+            "i2": len(messages) - 1,
+            "t1": first - first % size,
+            "t2": first - first % size + size - 1,
+            "d": 0,
+            "c": [
+                f"{first} - {last}",
+                str(len(messages)),
+                str(max(message["pos"]["s"] for message in messages)),
+            ],
+        }
+
+    def _groups(self, messages: List[dict], size: int) -> List[List[dict]]:
+        groups = {}
+        for message in messages:
+            groups.setdefault(message["t"] // size, []).append(message)
+        return [groups[key] for key in sorted(groups)]
+
+    def report_exec_report(self, params: dict, sid: str) -> dict:
+        """ report/exec_report: the unit message statistics by hours """
+        resource = self.fleet.resources.get(params["reportResourceId"])
+        if resource is None or params["reportTemplateId"] not in resource["rep"]:
+            raise MockError(4)
+        if params["reportObjectId"] not in self.fleet.units:
+            raise MockError(4)
+        if sid in self.reports:
+            raise MockError(1003)
+        interval = params["interval"]
+        messages = self.fleet.messages(params["reportObjectId"], interval["from"], interval["to"])
+        rows, subrows = [], []
+        for index, group in enumerate(self._groups(messages, REPORT_GROUP)):
+            row = self._report_row(group, REPORT_GROUP)
+            children = [
+                self._report_row(item, REPORT_SUBGROUP)
+                for item in self._groups(group, REPORT_SUBGROUP)
+            ]
+            row["n"], row["d"] = index, len(children)
+            rows.append(row)
+            subrows.append(children)
+        result = {
+            "tables": [
+                {
+                    "name": "unit_hours",
+                    "label": "Hours",
+                    "grouping": {"type": "hour"},
+                    "flags": 0,
+                    "rows": len(rows),
+                    "level": 2,
+                    "columns": len(REPORT_HEADER),
+                    "header": REPORT_HEADER,
+                    "total": ["Total", str(len(messages)), ""],
+                }
+            ],
+            "stats": [["Messages", str(len(messages))]],
+            "attachments": [],
+        }
+        self.reports[sid] = {"result": result, "rows": rows, "subrows": subrows, "polls": 0}
+        if params.get("remoteExec"):
+            return {}
+        return {"reportResult": result, "reportLayer": {}}
+
+    def _report(self, sid: str) -> dict:
+        if sid not in self.reports:
+            raise MockError(4)
+        return self.reports[sid]
+
+    def report_get_report_status(self, _, sid: str) -> dict:
+        """ report/get_report_status: the report is processing during the first poll """
+        report = self._report(sid)
+        report["polls"] += 1
+        return {"status": "2" if report["polls"] < 2 else "4"}
+
+    def report_apply_report_result(self, _, sid: str) -> dict:
+        """ report/apply_report_result """
+        report = self._report(sid)
+        if report["polls"] < 2:
+            raise MockError(5)
+        return {"reportResult": report["result"], "reportLayer": {}}
+
+    def report_get_result_rows(self, params: dict, sid: str) -> list:
+        """ report/get_result_rows """
+        rows = self._report(sid)["rows"]
+        if params["tableIndex"] != 0:
+            raise MockError(4)
+        return rows[params["indexFrom"] : params["indexTo"] + 1]
+
+    def report_get_result_subrows(self, params: dict, sid: str) -> list:
+        """ report/get_result_subrows """
+        subrows = self._report(sid)["subrows"]
+        if params["tableIndex"] != 0:
+            raise MockError(4)
+        return subrows[params["rowIndex"]]
+
+    def report_cleanup_result(self, _, sid: str) -> dict:
+        """ report/cleanup_result """
+        self.reports.pop(sid, None)
+        return {"error": 0}
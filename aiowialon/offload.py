@@ -0,0 +1,245 @@
+""" Process pool offload for the CPU bound geometry and analytics.
+
+    The large batches are split to chunks and processed by the pool workers,
+    so the event loop keeps serving the API requests. The areas are sent to
+    the workers as the packed coordinate arrays, the sensor engines are sent
+    as the sensor definitions and rebuilt by the workers.
+"""
+from array import array
+from asyncio import gather, get_running_loop
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from shapely.geometry import Point, Polygon
+from shapely.prepared import prep
+from aiowialon.resources import Area, AreaType
+from aiowialon.sensors import SensorEngine
+from aiowialon.trips import distances, haversine
+from aiowialon.utils import chunks
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_INLINE_LIMIT = 1000
+
+# (area_type, area_id, resource_id, radius, packed latitude/longitude pairs)
+PackedArea = Tuple[int, int, int, Optional[float], bytes]
+
+
+def pack_areas(areas: Iterable[Area]) -> List[PackedArea]:
+    """Convert the areas to the compact picklable form
+
+    Arguments:
+        areas {Iterable[Area]} -- area instances
+
+    Returns:
+        List[PackedArea] -- packed areas
+    """
+    return [
+        (
+            area.area_type().value,
+            area.id(),
+            area.resource_id(),
+            area.radius() if area.is_circle() else None,
+            array("d", area.location()).tobytes()
+            if area.is_circle()
+            else area.points().coordinates.tobytes(),
+        )
+        for area in areas
+    ]
+
+
+def _unpack_area(packed: PackedArea) -> Callable:
+    area_type, _, _, radius, data = packed
+    coordinates = np.frombuffer(data, dtype=np.float64).reshape(-1, 2)
+    if area_type == AreaType.CIRCLE.value:
+        latitude, longitude = coordinates[0]
+
+        def contains(latitudes, longitudes):
+            return haversine(latitudes, longitudes, latitude, longitude) <= radius
+
+        return contains
+
+    polygon = prep(Polygon(coordinates))
+
+    def contains_polygon(latitudes, longitudes):
+        return np.array(
+            [polygon.contains(Point(lat, lon)) for lat, lon in zip(latitudes, longitudes)],
+            dtype=bool,
+        )
+
+    return contains_polygon
+
+
+def contains_worker(areas: List[PackedArea], points: bytes) -> List[List[int]]:
+    """Find the areas containing the points
+
+    Arguments:
+        areas {List[PackedArea]} -- packed areas
+        points {bytes} -- packed latitude/longitude pairs
+
+    Returns:
+        List[List[int]] -- area ID lists in the same order as the points
+    """
+    coordinates = np.frombuffer(points, dtype=np.float64).reshape(-1, 2)
+    latitudes, longitudes = coordinates[:, 0], coordinates[:, 1]
+    result = [[] for _ in range(len(coordinates))]
+    for packed in areas:
+        for index in np.flatnonzero(_unpack_area(packed)(latitudes, longitudes)):
+            result[index].append(packed[1])
+    return result
+
+
+def distances_worker(points: bytes) -> np.ndarray:
+    """Calculate the distances between the consecutive points
+
+    Arguments:
+        points {bytes} -- packed latitude/longitude pairs
+
+    Returns:
+        np.ndarray -- distances
+    """
+    coordinates = np.frombuffer(points, dtype=np.float64).reshape(-1, 2)
+    return distances(coordinates[:, 0], coordinates[:, 1])
+
+
+def sensors_worker(sensors: Dict[str, dict], messages: List[dict]) -> List[Dict[str, float]]:
+    """Calculate the sensor values
+
+    Arguments:
+        sensors {Dict[str, dict]} -- unit sensor definitions
+        messages {List[dict]} -- messages
+
+    Returns:
+        List[Dict[str, float]] -- sensor values
+    """
+    return SensorEngine(sensors).calculate(messages)
+
+
+def _pack_points(points: Sequence[Tuple[float, float]]) -> bytes:
+    packed = array("d")
+    for latitude, longitude in points:
+        packed.append(latitude)
+        packed.append(longitude)
+    return packed.tobytes()
+
+
+class Offload:
+    """ CPU bound work executor """
+
+    def __init__(
+        self,
+        executor: Executor = None,
+        max_workers: int = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        inline_limit: int = DEFAULT_INLINE_LIMIT,
+    ):
+        """
+        Keyword Arguments:
+            executor {Executor} -- executor to use, if None the process pool
+                is created (default: {None})
+            max_workers {int} -- the number of the pool processes (default: {None})
+            chunk_size {int} -- maximum number of items per worker call (default: {10000})
+            inline_limit {int} -- the batches smaller than the limit are processed
+                in the current process (default: {1000})
+        """
+        self.own_executor = executor is None
+        self.executor = executor or ProcessPoolExecutor(max_workers=max_workers)
+        self.chunk_size = chunk_size
+        self.inline_limit = inline_limit
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        # The pool is shut down in the thread, the running tasks don't block the event loop
+        if self.own_executor:
+            await get_running_loop().run_in_executor(
+                None, partial(self.executor.shutdown, wait=True)
+            )
+
+    def close(self):
+        """ Shutdown the own process pool, it's for the synchronous code only """
+        if self.own_executor:
+            self.executor.shutdown(wait=True)
+
+    async def run(self, func: Callable, *args):
+        """Run the picklable function in the executor
+
+        Arguments:
+            func {Callable} -- module level function
+
+        Returns:
+            Any -- function result
+        """
+        return await get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def contains(
+        self, areas: Sequence[Area], points: Sequence[Tuple[float, float]]
+    ) -> List[List[int]]:
+        """Find the areas containing every point
+
+        Arguments:
+            areas {Sequence[Area]} -- area instances
+            points {Sequence[Tuple[float, float]]} -- (latitude, longitude) pairs
+
+        Returns:
+            List[List[int]] -- area ID lists in the same order as the points
+        """
+        if len(points) * len(areas) < self.inline_limit:
+            return [
+                [area.id() for area in areas if area.contains(latitude, longitude)]
+                for latitude, longitude in points
+            ]
+        packed = pack_areas(areas)
+        results = await gather(
+            *(
+                self.run(contains_worker, packed, _pack_points(chunk))
+                for chunk in chunks(points, self.chunk_size)
+            )
+        )
+        return [item for result in results for item in result]
+
+    async def distances(self, points: Sequence[Tuple[float, float]]) -> np.ndarray:
+        """Calculate the distances between the consecutive points
+
+        Arguments:
+            points {Sequence[Tuple[float, float]]} -- (latitude, longitude) pairs
+
+        Returns:
+            np.ndarray -- distances, the array is one item shorter than the points
+        """
+        if len(points) < self.inline_limit:
+            return distances_worker(_pack_points(points))
+        # The neighbour chunks overlap by one point to keep the distance between them
+        starts = range(0, max(len(points) - 1, 1), self.chunk_size)
+        results = await gather(
+            *(
+                self.run(
+                    distances_worker, _pack_points(points[start : start + self.chunk_size + 1])
+                )
+                for start in starts
+            )
+        )
+        return np.concatenate(results)
+
+    async def calculate_sensors(
+        self, sensors: Dict[str, dict], messages: List[dict]
+    ) -> List[Dict[str, float]]:
+        """Calculate the sensor values
+
+        Arguments:
+            sensors {Dict[str, dict]} -- unit sensor definitions
+            messages {List[dict]} -- messages
+
+        Returns:
+            List[Dict[str, float]] -- sensor values in the unit/calc_sensors format
+        """
+        if len(messages) < self.inline_limit:
+            return sensors_worker(sensors, messages)
+        results = await gather(
+            *(
+                self.run(sensors_worker, sensors, chunk)
+                for chunk in chunks(messages, self.chunk_size)
+            )
+        )
+        return [item for result in results for item in result]
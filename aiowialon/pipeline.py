@@ -0,0 +1,309 @@
+""" Backpressured asynchronous processing pipeline.
+
+    The items of the source go through the stages connected by the bounded
+    queues, so every stage works concurrently with the others and the number
+    of the items in flight is limited. Every stage runs its function with
+    the configured concurrency:
+
+        * coroutine function -- the result is the stage output;
+        * async generator function -- every yielded value is the stage output,
+          e.g. the message pages of the unit;
+        * regular function -- it's run in the executor (the default thread pool
+          or the process pool for CPU bound work), the result is the stage output.
+
+    The ordered stage delivers the outputs in the order of the inputs, the
+    unordered one delivers them as they're ready. The outputs of the ordered
+    stage waiting for the turn of their input are buffered up to the queue
+    size, then the worker waits for the turn. If any stage fails, the
+    rest of the stages are cancelled and the error is raised to the consumer.
+
+    Usage:
+
+        pipeline = Pipeline(
+            await load_units(session),
+            Stage(unit_messages),
+            Stage(calculate_sensors, concurrency=2, executor=process_pool),
+            Stage(write_messages),
+        )
+        await pipeline.run()
+        print(pipeline.stats())
+"""
+from asyncio import (
+    FIRST_COMPLETED,
+    Condition,
+    Queue,
+    ensure_future,
+    gather,
+    get_running_loop,
+    iscoroutinefunction,
+    wait,
+)
+from concurrent.futures import Executor
+from inspect import isasyncgenfunction, isawaitable
+from logging import getLogger
+from time import monotonic
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Union
+from aiowialon.utils import aclosing
+
+LOGGER = getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 16
+
+_END = object()  # end of the stream marker
+
+
+class StageStats:
+    """ Stage throughput and latency statistics """
+
+    def __init__(self):
+        self.items_in = 0
+        self.items_out = 0
+        self.busy_time = 0.0
+        self.max_latency = 0.0
+        self.started = None
+        self.finished = None
+
+    def add(self, latency: float):
+        """Account the processed item
+
+        Arguments:
+            latency {float} -- item processing time, seconds
+        """
+        self.items_in += 1
+        self.busy_time += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def as_dict(self) -> dict:
+        """Get the statistics
+
+        Returns:
+            dict -- the number of the input and the output items, the average and the
+                maximum latency (seconds), the throughput (output items per second)
+        """
+        elapsed = (self.finished or monotonic()) - (self.started or monotonic())
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "avg_latency": self.busy_time / self.items_in if self.items_in else 0.0,
+            "max_latency": self.max_latency,
+            "throughput": self.items_out / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+class Stage:
+    """ Pipeline stage """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        func: Callable,
+        concurrency: int = 1,
+        ordered: bool = True,
+        executor: Executor = None,
+        name: str = None,
+    ):
+        """
+        Arguments:
+            func {Callable} -- coroutine function, async generator function or regular
+                function processing the single item
+
+        Keyword Arguments:
+            concurrency {int} -- the number of the items processed at the same time (default: {1})
+            ordered {bool} -- deliver the outputs in the order of the inputs (default: {True})
+            executor {Executor} -- executor of the regular function, if None the default
+                executor of the event loop is used (default: {None})
+            name {str} -- stage name used in the statistics (default: {function name})
+        """
+        if concurrency < 1:
+            raise ValueError(f"Invalid concurrency: {concurrency}")
+        self.func = func
+        self.concurrency = concurrency
+        self.ordered = ordered
+        self.executor = executor
+        self.name = name or getattr(func, "__name__", repr(func))
+        self.stats = StageStats()
+        self.received = 0  # the number of the received inputs
+        self.next_input = 0  # the sequence number of the input to deliver next
+        self.next_output = 0
+        self.turn = None  # type: Condition
+
+    async def _outputs(self, item) -> AsyncIterator:
+        if isasyncgenfunction(self.func):
+            # The generator is closed right away if the pipeline is cancelled
+            async with aclosing(self.func(item)) as outputs:
+                async for output in outputs:
+                    yield output
+        elif iscoroutinefunction(self.func):
+            yield await self.func(item)
+        else:
+            yield await get_running_loop().run_in_executor(self.executor, self.func, item)
+
+    async def _put(self, output_queue: Queue, output):
+        # The sequence number is taken before the put, the concurrent workers wait for it
+        sequence = self.next_output
+        self.next_output += 1
+        self.stats.items_out += 1
+        await output_queue.put((sequence, output))
+
+    async def _process(self, sequence: int, item, output_queue: Queue):
+        started = monotonic()
+        if not self.ordered:
+            async for output in self._outputs(item):
+                await self._put(output_queue, output)
+            self.stats.add(monotonic() - started)
+            return
+        limit = output_queue.maxsize  # the outputs buffered until the turn of the input
+        pending = []
+        async for output in self._outputs(item):
+            pending.append(output)
+            if self.next_input != sequence and 0 < limit <= len(pending):
+                async with self.turn:
+                    await self.turn.wait_for(lambda: self.next_input == sequence)
+            if self.next_input == sequence:
+                for value in pending:
+                    await self._put(output_queue, value)
+                pending.clear()
+        self.stats.add(monotonic() - started)
+        async with self.turn:
+            await self.turn.wait_for(lambda: self.next_input == sequence)
+            for value in pending:
+                await self._put(output_queue, value)
+            self.next_input += 1
+            self.turn.notify_all()
+
+    async def _worker(self, input_queue: Queue, output_queue: Queue):
+        while True:
+            sequence, item = await input_queue.get()
+            if item is _END:
+                await input_queue.put((sequence, item))  # stop the other workers
+                return
+            # The turn is taken in the order the inputs are received, the upstream
+            # unordered stage may put its sequence numbers out of order
+            sequence = self.received
+            self.received += 1
+            await self._process(sequence, item, output_queue)
+
+    async def run(self, input_queue: Queue, output_queue: Queue):
+        """Process the input queue items until the end of the stream
+
+        Arguments:
+            input_queue {Queue} -- (sequence, item) pairs
+            output_queue {Queue} -- (sequence, output) pairs
+        """
+        self.stats = StageStats()
+        self.stats.started = monotonic()
+        self.received = self.next_input = self.next_output = 0
+        self.turn = Condition()
+        await gather(*(self._worker(input_queue, output_queue) for _ in range(self.concurrency)))
+        self.stats.finished = monotonic()
+        await output_queue.put((self.next_output, _END))
+
+
+class Pipeline:
+    """ Asynchronous pipeline of the stages """
+
+    def __init__(
+        self,
+        source: Union[Iterable, AsyncIterable],
+        *stages: Stage,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        """
+        Arguments:
+            source {Union[Iterable, AsyncIterable]} -- input items
+            stages {Stage} -- processing stages
+
+        Keyword Arguments:
+            queue_size {int} -- maximum number of the items waiting for the stage (default: {16})
+        """
+        self.source = source
+        self.stages = list(stages)
+        self.queue_size = queue_size
+
+    async def _feed(self, queue: Queue):
+        sequence = 0
+        if hasattr(self.source, "__aiter__"):
+            async for item in self.source:
+                await queue.put((sequence, item))
+                sequence += 1
+        else:
+            for item in self.source:
+                await queue.put((sequence, item))
+                sequence += 1
+        await queue.put((sequence, _END))
+
+    async def __aiter__(self) -> AsyncIterator:
+        queues = [Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        tasks = [ensure_future(self._feed(queues[0]))] + [
+            ensure_future(stage.run(input_queue, output_queue))
+            for stage, input_queue, output_queue in zip(self.stages, queues, queues[1:])
+        ]
+        failure = get_running_loop().create_future()
+
+        def check(task):
+            if not task.cancelled() and task.exception() is not None and not failure.done():
+                failure.set_exception(task.exception())
+
+        for task in tasks:
+            task.add_done_callback(check)
+        try:
+            while True:
+                getter = ensure_future(queues[-1].get())
+                done, _ = await wait([getter, failure], return_when=FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    failure.result()
+                _, item = getter.result()
+                if item is _END:
+                    break
+                yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await gather(*tasks, return_exceptions=True)
+            if failure.done() and not failure.cancelled():
+                failure.exception()  # mark the exception as retrieved
+            else:
+                failure.cancel()
+
+    async def run(self, sink: Callable = None) -> int:
+        """Run the pipeline until the source is exhausted
+
+        Keyword Arguments:
+            sink {Callable} -- function or coroutine function called with every output
+                of the last stage (default: {None})
+
+        Returns:
+            int -- the number of the outputs
+        """
+        total = 0
+        results = self.__aiter__()
+        try:
+            async for item in results:
+                if sink is not None:
+                    result = sink(item)
+                    if isawaitable(result):
+                        await result
+                total += 1
+        finally:
+            await results.aclose()
+        return total
+
+    async def collect(self) -> List[Any]:
+        """Run the pipeline and collect the outputs of the last stage
+
+        Returns:
+            List[Any] -- outputs
+        """
+        results = []
+        await self.run(results.append)
+        return results
+
+    def stats(self) -> Dict[str, dict]:
+        """Get the stage statistics
+
+        Returns:
+            Dict[str, dict] -- key value pairs stage_name -> statistics (see StageStats)
+        """
+        return {stage.name: stage.stats.as_dict() for stage in self.stages}
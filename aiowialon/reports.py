@@ -0,0 +1,326 @@
+""" Report execution and paged result retrieval.
+
+    The report is executed remotely, its status is polled with the growing
+    interval and the result rows are streamed page by page, so the fleet-wide
+    reports don't have to be transferred with the single response. Wialon keeps
+    the only report result per session, the result is always cleaned up when
+    the report context is closed. Use ReportPool to run the reports in parallel
+    over several sessions.
+
+    Usage:
+
+        async with execute_report(session, resource_id, template_id, unit_id, begin, end) as report:
+            for index, table in enumerate(report.tables):
+                async for rows in report.rows(index, subrows=True):
+                    ...
+"""
+from asyncio import Queue, get_running_loop, sleep
+from datetime import datetime
+from logging import getLogger
+from typing import AsyncIterator, Iterable, List, Optional, Union
+from aiowialon.client import Session
+from aiowialon.exceptions import APIError, ReportError
+from aiowialon.flags import Resources, join
+from aiowialon.messages import timestamp
+from aiowialon.utils import chunks
+
+LOGGER = getLogger(__name__)
+
+REPORT_PAGE_SIZE = 1000
+SUBROWS_BATCH_SIZE = 100
+POLL_INTERVAL = 0.2
+MAX_POLL_INTERVAL = 3.0
+
+STATUS_QUEUED = 1
+STATUS_PROCESSING = 2
+STATUS_DONE = 4
+STATUS_CANCELED = 8
+STATUS_INVALID = 16
+
+
+async def load_report_templates(session: Session) -> List[dict]:
+    """Load the report templates of all the available resources
+
+    Arguments:
+        session {Session} -- active user session
+
+    Returns:
+        List[dict] -- report templates, the resource ID is set as `rid` property
+    """
+    response = await session.call(
+        "core/search_items",
+        {
+            "spec": {
+                "itemsType": "avl_resource",
+                "propName": "reporttemplates",
+                "propValueMask": "*",
+                "propType": "propitemname",
+                "sortType": "reporttemplates",
+            },
+            "force": 1,
+            "flags": join({Resources.BASE, Resources.REPORT_TEMPLATES}),
+            "from": 0,
+            "to": 0,
+        },
+    )
+    templates = []
+    for resource in response["items"]:
+        for template in (resource.get("rep") or {}).values():
+            template = dict(template)
+            template.setdefault("rid", resource["id"])
+            templates.append(template)
+    return templates
+
+
+class Report:
+    """ Report execution async context manager """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        session: Session,
+        resource_id: int,
+        template_id: int,
+        object_id: int,
+        begin_time: Union[datetime, int, float],
+        end_time: Union[datetime, int, float],
+        object_sec_id: int = 0,
+        flags: int = 0,
+        timeout: Optional[float] = None,
+        poll_interval: float = POLL_INTERVAL,
+        max_poll_interval: float = MAX_POLL_INTERVAL,
+    ):
+        """
+        Arguments:
+            session {Session} -- active user session
+            resource_id {int} -- report template resource identifier
+            template_id {int} -- report template identifier
+            object_id {int} -- report object (unit, unit group, etc.) identifier
+            begin_time {Union[datetime, int, float]} -- report interval beginning
+            end_time {Union[datetime, int, float]} -- report interval end
+
+        Keyword Arguments:
+            object_sec_id {int} -- report object secondary identifier (default: {0})
+            flags {int} -- report interval flags (default: {0})
+            timeout {Optional[float]} -- maximum execution time, seconds (default: {None})
+            poll_interval {float} -- the first status poll delay, seconds (default: {0.2})
+            max_poll_interval {float} -- maximum status poll delay, seconds (default: {3.0})
+        """
+        self.session = session
+        self.params = {
+            "reportResourceId": resource_id,
+            "reportTemplateId": template_id,
+            "reportObjectId": object_id,
+            "reportObjectSecId": object_sec_id,
+            "interval": {"from": timestamp(begin_time), "to": timestamp(end_time), "flags": flags},
+            "remoteExec": 1,
+        }
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.result = None  # type: dict
+
+    async def __aenter__(self):
+        try:
+            await self.execute()
+        except BaseException:
+            await self.cleanup()
+            raise
+        return self
+
+    async def __aexit__(self, *_):
+        await self.cleanup()
+
+    @property
+    def tables(self) -> List[dict]:
+        """ Result tables: name, label, the number of rows, columns header, etc. """
+        return self.result.get("tables", [])
+
+    @property
+    def stats(self) -> list:
+        """ Result statistics """
+        return self.result.get("stats", [])
+
+    async def execute(self) -> dict:
+        """Execute the report and wait for the result
+
+        Returns:
+            dict -- report result
+        """
+        try:
+            await self.session.call("report/cleanup_result")
+        except APIError:
+            pass
+        response = await self.session.call("report/exec_report", self.params)
+        if "reportResult" not in response:
+            await self._wait()
+            response = await self.session.call("report/apply_report_result")
+        self.result = response["reportResult"]
+        LOGGER.debug(
+            "Report %s executed (sid %s): %d tables",
+            self.params["reportTemplateId"],
+            self.session.sid,
+            len(self.tables),
+        )
+        return self.result
+
+    async def _wait(self):
+        loop = get_running_loop()
+        deadline = None if self.timeout is None else loop.time() + self.timeout
+        delay = self.poll_interval
+        while True:
+            response = await self.session.call("report/get_report_status")
+            status = int(response["status"])
+            if status == STATUS_DONE:
+                return
+            if status not in (STATUS_QUEUED, STATUS_PROCESSING):
+                raise ReportError(self.session.sid, 5, f"report status {status}")
+            if deadline is not None and loop.time() + delay > deadline:
+                raise ReportError(self.session.sid, 1005, "report execution timeout")
+            await sleep(delay)
+            delay = min(delay * 2, self.max_poll_interval)
+
+    async def cleanup(self):
+        """ Remove the report result from the session """
+        self.result = None
+        try:
+            await self.session.call("report/cleanup_result")
+        except APIError:
+            LOGGER.warning("Unable to clean up the report result (sid %s)", self.session.sid)
+
+    async def rows(
+        self, table_index: int, page_size: int = REPORT_PAGE_SIZE, subrows: bool = False
+    ) -> AsyncIterator[List[dict]]:
+        """Iterate over the table rows page by page
+
+        Arguments:
+            table_index {int} -- table index
+
+        Keyword Arguments:
+            page_size {int} -- the number of rows per request (default: {1000})
+            subrows {bool} -- load the subrows of the grouped rows as `r` row
+                property (default: {False})
+
+        Returns:
+            AsyncIterator[List[dict]] -- row pages
+        """
+        total = self.tables[table_index]["rows"]
+        for first in range(0, total, page_size):
+            rows = await self.session.call(
+                "report/get_result_rows",
+                {
+                    "tableIndex": table_index,
+                    "indexFrom": first,
+                    "indexTo": min(first + page_size, total) - 1,
+                },
+            )
+            if subrows:
+                await self._load_subrows(table_index, first, rows)
+            yield rows
+
+    async def _load_subrows(self, table_index: int, first: int, rows: List[dict]):
+        grouped = [(first + index, row) for index, row in enumerate(rows) if row.get("d")]
+        for chunk in chunks(grouped, SUBROWS_BATCH_SIZE):
+            responses = await self.session.batch(
+                [
+                    ("report/get_result_subrows", {"tableIndex": table_index, "rowIndex": index})
+                    for index, _ in chunk
+                ]
+            )
+            for (_, row), response in zip(chunk, responses):
+                row["r"] = response
+
+
+def execute_report(session: Session, *args, **kwargs) -> Report:
+    """Create report execution context manager
+
+    Arguments:
+        session {Session} -- active user session
+
+    The rest of the arguments are the same as Report(...) accepts.
+
+    Returns:
+        Report -- report execution context manager
+    """
+    return Report(session, *args, **kwargs)
+
+
+class ReportPool:  # pylint: disable=too-few-public-methods
+    """Parallel report execution over several sessions
+
+    Every session executes the only report at a time, the report waits for
+    the free session.
+
+    Usage:
+
+        pool = ReportPool(sessions)
+
+        async def unit_report(unit_id):
+            async with pool.execute(resource_id, template_id, unit_id, begin, end) as report:
+                return [rows async for rows in report.rows(0)]
+
+        results = await gather(*(unit_report(unit_id) for unit_id in unit_ids))
+    """
+
+    def __init__(self, sessions: Iterable[Session]):
+        """
+        Arguments:
+            sessions {Iterable[Session]} -- active sessions
+        """
+        self.sessions = list(sessions)
+        if not self.sessions:
+            raise ValueError("Session pool is empty")
+        self.queue = None  # type: Queue
+
+    def free_sessions(self) -> Queue:
+        """Get the queue of the free sessions
+
+        The queue is created in the running event loop on the first use
+        (asyncio.Queue is bound to the current loop on creation in Python < 3.10).
+
+        Returns:
+            Queue -- free sessions
+        """
+        if self.queue is None:
+            self.queue = Queue()
+            for session in self.sessions:
+                self.queue.put_nowait(session)
+        return self.queue
+
+    def execute(self, *args, **kwargs) -> "PooledReport":
+        """Create report execution context manager
+
+        The arguments are the same as Report(...) accepts except the session.
+
+        Returns:
+            PooledReport -- report execution context manager
+        """
+        return PooledReport(self, args, kwargs)
+
+
+class PooledReport:
+    """ Report execution async context manager using the free pool session """
+
+    def __init__(self, pool: ReportPool, args: tuple, kwargs: dict):
+        self.pool = pool
+        self.sessions = None  # type: Queue
+        self.args = args
+        self.kwargs = kwargs
+        self.report = None  # type: Report
+
+    async def __aenter__(self) -> Report:
+        self.sessions = self.pool.free_sessions()
+        session = await self.sessions.get()
+        self.report = Report(session, *self.args, **self.kwargs)
+        try:
+            return await self.report.__aenter__()
+        except BaseException:
+            self.sessions.put_nowait(session)
+            raise
+
+    async def __aexit__(self, *exc_info):
+        try:
+            await self.report.__aexit__(*exc_info)
+        finally:
+            self.sessions.put_nowait(self.report.session)
@@ -1,10 +1,16 @@
 from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Sequence
 from enum import Enum
 from typing import List, Tuple, Iterable, Dict
-from shapely.geometry import Point, Polygon
 from aiowialon.flags import Resources, join
 from aiowialon.client import Session
-from aiowialon.utils import distance
+from aiowialon.utils import chunks, distance, gather_limited
+
+DETAIL_CHUNK_SIZE = 500
+DETAIL_CONCURRENCY = 8
+SEARCH_BATCH_SIZE = 50
+SEARCH_CONCURRENCY = 4
 
 
 class AreaFlags(Enum):
@@ -25,12 +31,54 @@ class AreaType(Enum):
     CIRCLE = 3
 
 
+class Points(Sequence):
+    """ Lightweight read-only view of the area points packed to the float array """
+
+    __slots__ = ("coordinates",)
+
+    def __init__(self, coordinates: array):
+        self.coordinates = coordinates
+
+    def __len__(self):
+        return len(self.coordinates) // 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("point index out of range")
+        return self.coordinates[2 * index], self.coordinates[2 * index + 1]
+
+    def __eq__(self, other):
+        return isinstance(other, Sequence) and list(self) == list(other)
+
+    def __repr__(self):
+        return "Points({!r})".format(list(self))
+
+
 class Area(ABC):
-    """ Wialon area (geofence) """
+    """Wialon area (geofence)
 
-    def __init__(self, data, session=None):
-        self.data = data
+    The area attributes and point coordinates are parsed once and stored in
+    the compact form. The raw API data is available as `data` attribute unless
+    the area is built with `keep_data=False`.
+    """
+
+    __slots__ = ("data", "session", "_id", "_resource_id", "_name", "_description", "_coordinates")
+
+    def __init__(self, data, session=None, keep_data: bool = True):
+        self.data = data if keep_data else None
         self.session = session
+        self._id = data["id"]
+        self._resource_id = data.get("rid")
+        self._name = data.get("n")
+        self._description = data.get("d")
+        self._coordinates = array("d")
+        for point in data.get("p", ()):
+            self._coordinates.append(point["y"])
+            self._coordinates.append(point["x"])
 
     def __eq__(self, other):
         return (
@@ -62,19 +110,19 @@ class Area(ABC):
 
     def id(self) -> int:  # pylint: disable=invalid-name
         """ Get area ID """
-        return self.data["id"]
+        return self._id
 
     def resource_id(self) -> int:
         """ Get area parent resource ID """
-        return self.data["rid"]
+        return self._resource_id
 
     def name(self) -> str:
         """ Get area name """
-        return self.data["n"]
+        return self._name
 
     def description(self) -> str:
         """ Get area description """
-        return self.data["d"]
+        return self._description
 
     def is_line(self) -> bool:
         """ Check if the area is a line """
@@ -92,6 +140,12 @@ class Area(ABC):
 class CircleArea(Area):
     """ Circale Area Class """
 
+    __slots__ = ("_radius",)
+
+    def __init__(self, data, session=None, keep_data: bool = True):
+        super().__init__(data, session=session, keep_data=keep_data)
+        self._radius = data["p"][0]["r"] if data.get("p") else None
+
     def area_type(self):
         return AreaType.CIRCLE
 
@@ -100,7 +154,7 @@ class CircleArea(Area):
 
     def radius(self) -> float:
         """ Get circle area radius """
-        return self.data["p"][0]["r"]
+        return self._radius
 
     def location(self) -> Tuple[float, float]:
         """ Get the area latitude and longitude
@@ -108,66 +162,104 @@ class CircleArea(Area):
         Returns:
             Tuple[float, float] -- coordinates of the area central point
         """
-        return self.data["p"][0]["y"], self.data["p"][0]["x"]
+        return self._coordinates[0], self._coordinates[1]
 
 
 class PolygonArea(Area):
     """ Polygon Area Class """
 
+    __slots__ = ()
+
     def area_type(self):
         return AreaType.POLYGON
 
     def contains(self, latitude, longitude) -> bool:
+        # Shapely (GEOS) is loaded on the first polygon check only
+        from shapely.geometry import Point, Polygon  # pylint: disable=import-outside-toplevel
+
         point = Point(latitude, longitude)
-        polygon = Polygon(self.points())
+        polygon = Polygon(list(self.points()))
         return polygon.contains(point)
 
-    def points(self) -> List[Tuple[float, float]]:
+    def points(self) -> Points:
         """Get area point array
 
         Returns:
-            List[Tuple[float, float]] -- area point list
+            Points -- area point sequence of (latitude, longitude) tuples
         """
-        return [(p["y"], p["x"]) for p in self.data["p"]]
+        return Points(self._coordinates)
 
 
-def build_area(data) -> Area:
+def build_area(data, keep_data: bool = True) -> Area:
     """Area object builder
 
     Arguments:
         data {dict} -- area data from the Wialon remote API
 
+    Keyword Arguments:
+        keep_data {bool} -- keep the raw area data in the area instance (default: {True})
+
     Returns:
         Area -- area instance
     """
     area_type = AreaType(data["t"])
     if area_type == AreaType.CIRCLE:
-        return CircleArea(data)
+        return CircleArea(data, keep_data=keep_data)
     if area_type == AreaType.POLYGON:
-        return PolygonArea(data)
+        return PolygonArea(data, keep_data=keep_data)
     raise ValueError(f"Unsupported area type: {area_type.name()}")
 
 
-async def load_areas(session: Session) -> List[Area]:
+async def load_areas(  # pylint: disable=too-many-arguments
+    session: Session,
+    flags: List[AreaFlags] = None,
+    concurrency: int = DETAIL_CONCURRENCY,
+    chunk_size: int = DETAIL_CHUNK_SIZE,
+    keep_data: bool = True,
+) -> List[Area]:
     """Load available area list
 
     Arguments:
         session {Session} -- active user session
 
+    Keyword Arguments:
+        flags {List[AreaFlags]} -- area data flags (default: [AreaFlags.BASE])
+        concurrency {int} -- maximum number of concurrent detail requests (default: {8})
+        chunk_size {int} -- maximum number of areas per detail request (default: {500})
+        keep_data {bool} -- keep the raw area data in the area instances (default: {True})
+
     Returns:
         List[Area] -- Area instance list
     """
-    return [build_area(item) for item in await load_areas_raw(session, load_detail=True)]
+    return [
+        build_area(item, keep_data=keep_data)
+        for item in await load_areas_raw(
+            session, load_detail=True, flags=flags, concurrency=concurrency, chunk_size=chunk_size
+        )
+    ]
 
 
-async def load_areas_raw(session: Session, load_detail: bool = False) -> list:
+async def load_areas_raw(  # pylint: disable=too-many-arguments
+    session: Session,
+    load_detail: bool = False,
+    flags: List[AreaFlags] = None,
+    concurrency: int = DETAIL_CONCURRENCY,
+    chunk_size: int = DETAIL_CHUNK_SIZE,
+) -> list:
     """Load available geofence raw info list
 
+    The detail requests of all the resources are sent concurrently,
+    the area ID list of every resource is split to chunks of `chunk_size`
+    areas to keep the request query size limited.
+
     Arguments:
         session {Session} -- active user session
 
     Keyword Arguments:
         load_detail {bool} -- include area detail info (default: {False})
+        flags {List[AreaFlags]} -- detail data flags (default: [AreaFlags.BASE])
+        concurrency {int} -- maximum number of concurrent detail requests (default: {8})
+        chunk_size {int} -- maximum number of areas per detail request (default: {500})
 
     Returns:
         list -- geofence list
@@ -196,12 +288,48 @@ async def load_areas_raw(session: Session, load_detail: bool = False) -> list:
             for area in resource["zl"].values()
         ]
 
-    result = []
-    for resource in response["items"]:
-        areas = [area["id"] for area in resource["zl"].values()]
-        areas_detail = await get_areas_detail_raw(session, areas, resource["id"])
-        result.extend(areas_detail.values())
-    return result
+    return await get_resource_areas_detail_raw(
+        session,
+        {
+            resource["id"]: [area["id"] for area in resource["zl"].values()]
+            for resource in response["items"]
+        },
+        flags=flags,
+        concurrency=concurrency,
+        chunk_size=chunk_size,
+    )
+
+
+async def get_resource_areas_detail_raw(
+    session: Session,
+    resource_areas: Dict[int, Iterable[int]],
+    flags: List[AreaFlags] = None,
+    concurrency: int = DETAIL_CONCURRENCY,
+    chunk_size: int = DETAIL_CHUNK_SIZE,
+) -> list:
+    """Query the raw info of the areas belonging to the several resources
+
+    Arguments:
+        session {Session} -- active API session
+        resource_areas {Dict[int, Iterable[int]]} -- key value pairs resource_id -> area ID list
+
+    Keyword Arguments:
+        flags {List[AreaFlags]} -- area data flags (default: [AreaFlags.BASE])
+        concurrency {int} -- maximum number of concurrent requests (default: {8})
+        chunk_size {int} -- maximum number of areas per request (default: {500})
+
+    Returns:
+        list -- area info list
+    """
+    responses = await gather_limited(
+        (
+            _get_zone_data(session, resource, area_id_chunk, flags)
+            for resource, area_id_list in resource_areas.items()
+            for area_id_chunk in chunks(area_id_list, chunk_size)
+        ),
+        concurrency,
+    )
+    return [area for chunk in responses for area in chunk]
 
 
 async def search_areas_by_point(  # pylint: disable=too-many-arguments
@@ -249,6 +377,83 @@ async def search_areas_by_point(  # pylint: disable=too-many-arguments
     return result
 
 
+async def search_areas_by_points(  # pylint: disable=too-many-arguments
+    session: Session,
+    points: Iterable[Tuple[float, float]],
+    resource: int = None,
+    area_detail: bool = True,
+    radius: int = 0,
+    batch_size: int = SEARCH_BATCH_SIZE,
+    concurrency: int = SEARCH_CONCURRENCY,
+) -> List[list]:
+    """
+    Check which areas contain the points or search the areas
+    inside the search radius for the every point
+
+    The point requests are packed to core/batch requests of `batch_size` points,
+    the repeated points and the detail of every found area are requested only once.
+
+    Arguments:
+        session {Session} -- active session
+        points {Iterable[Tuple[float, float]]} -- (latitude, longitude) pairs
+
+    Keyword Arguments:
+        resource {int} -- resource identifier, if None user account id is used (default: {None})
+        area_detail {bool} -- request the area detail (default: {True})
+        radius {int} -- area search radius (default: 0)
+        batch_size {int} -- maximum number of points per batch request (default: {50})
+        concurrency {int} -- maximum number of concurrent batch requests (default: {4})
+
+    Returns:
+        List[list] -- lists of tuples (area_info, distance) in the same order as the points
+    """
+    resource = resource or session.account_id
+    points = [tuple(point) for point in points]
+    unique = list(dict.fromkeys(points))
+    responses = await gather_limited(
+        (
+            session.batch(
+                [
+                    (
+                        "resource/get_zones_by_point",
+                        {
+                            "spec": {
+                                "zoneId": {resource: []},
+                                "lat": latitude,
+                                "lon": longitude,
+                                "radius": radius,
+                            }
+                        },
+                    )
+                    for latitude, longitude in chunk
+                ]
+            )
+            for chunk in chunks(unique, batch_size)
+        ),
+        concurrency,
+    )
+    found = dict(
+        zip(
+            unique,
+            (
+                list(response.get(str(resource), {}).items()) if response else []
+                for batch in responses
+                for response in batch
+            ),
+        )
+    )
+
+    detail = {}
+    area_id_list = {int(gid) for areas in found.values() for gid, _ in areas}
+    if area_detail and area_id_list:
+        detail = await get_areas_detail_raw(session, area_id_list, resource=resource)
+
+    return [
+        [({"id": int(gid), **detail.get(int(gid), {})}, distance) for gid, distance in found[point]]
+        for point in points
+    ]
+
+
 async def get_areas_detail(
     session: Session,
     area_id_list: Iterable[int],
@@ -278,11 +483,13 @@ async def get_areas_detail(
     }
 
 
-async def get_areas_detail_raw(
+async def get_areas_detail_raw(  # pylint: disable=too-many-arguments
     session: Session,
     area_id_list: Iterable[int],
     resource: int = None,
     flags: List[AreaFlags] = None,
+    concurrency: int = DETAIL_CONCURRENCY,
+    chunk_size: int = DETAIL_CHUNK_SIZE,
 ) -> dict:
     """Query the areas raw info
 
@@ -293,17 +500,31 @@ async def get_areas_detail_raw(
     Keyword Arguments:
         resource {int} -- owner resource ID, if None user acccount ID is used (default: None)
         flags {List[AreaFlags]} -- area data flags (default: [AreaFlags.BASE])
+        concurrency {int} -- maximum number of concurrent requests (default: {8})
+        chunk_size {int} -- maximum number of areas per request (default: {500})
 
     Returns:
         dict -- key value pairs area_id -> area_info
     """
-    flags = flags or [AreaFlags.BASE]
     resource = resource or session.account_id
+    # Empty ID list is passed as is: the API returns all the resource areas in this case
+    area_id_chunks = list(chunks(area_id_list, chunk_size)) or [[]]
+    responses = await gather_limited(
+        (_get_zone_data(session, resource, chunk, flags) for chunk in area_id_chunks), concurrency,
+    )
+    return {area["id"]: area for chunk in responses for area in chunk}
+
+
+async def _get_zone_data(
+    session: Session, resource: int, area_id_list: List[int], flags: List[AreaFlags] = None
+) -> list:
+    flags = flags or [AreaFlags.BASE]
     response = await session.call(
-        "resource/get_zone_data",
-        {"itemId": resource, "col": list(area_id_list), "flag": join(flags)},
+        "resource/get_zone_data", {"itemId": resource, "col": area_id_list, "flag": join(flags)},
     )
-    return {area["id"]: area for area in response}
+    for area in response:
+        area.setdefault("rid", resource)
+    return response
 
 
 async def get_area_detail(
@@ -0,0 +1,207 @@
+""" Priority and fairness scheduler of the session requests.
+
+    The scheduler limits the number of the concurrent API requests of the
+    session. The waiting requests are dispatched in the priority class order,
+    the requests of the same class are dispatched by the weighted fair queuing
+    over the caller tags, so the bulk job of the one caller doesn't delay the
+    requests of the others. Some slots can be reserved for the class, the
+    other classes never use them.
+
+    The priority and the tag are set for all the requests made inside the
+    request_priority(...) block (including the tasks started there) or
+    passed to Session.call(...) explicitly.
+
+    Usage:
+
+        scheduler = Scheduler(max_concurrency=8, reservations={INTERACTIVE: 2})
+        async with connect(token, scheduler=scheduler) as session:
+            with request_priority(BULK, tag="backfill"):
+                await load_messages(session, ...)
+"""
+import heapq
+from asyncio import CancelledError, get_running_loop
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from time import monotonic
+from typing import Dict, Iterator, Optional, Tuple
+
+INTERACTIVE = 0
+NORMAL = 1
+BULK = 2
+
+DEFAULT_TAG = ""
+DEFAULT_CONCURRENCY = 8
+
+_PRIORITY = ContextVar("aiowialon_request_priority", default=(NORMAL, DEFAULT_TAG))
+
+
+@contextmanager
+def request_priority(priority: int, tag: Optional[str] = None) -> Iterator[None]:
+    """Set the priority class and the caller tag of the requests made inside the block
+
+    Arguments:
+        priority {int} -- priority class, the lower value is the higher priority
+
+    Keyword Arguments:
+        tag {Optional[str]} -- caller tag, if None the current one is kept (default: {None})
+    """
+    if tag is None:
+        tag = _PRIORITY.get()[1]
+    token = _PRIORITY.set((priority, tag))
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def current_priority(priority: Optional[int] = None, tag: Optional[str] = None) -> Tuple[int, str]:
+    """Get the priority class and the caller tag of the request
+
+    Keyword Arguments:
+        priority {Optional[int]} -- explicit priority class (default: {None})
+        tag {Optional[str]} -- explicit caller tag (default: {None})
+
+    Returns:
+        Tuple[int, str] -- (priority, tag) pair, the context values are used if not set
+    """
+    context_priority, context_tag = _PRIORITY.get()
+    return (
+        context_priority if priority is None else priority,
+        context_tag if tag is None else tag,
+    )
+
+
+class Scheduler:
+    """ Request slot scheduler """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        reservations: Optional[Dict[int, int]] = None,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        """
+        Keyword Arguments:
+            max_concurrency {int} -- maximum number of concurrent requests (default: {8})
+            reservations {Optional[Dict[int, int]]} -- key value pairs priority -> the number
+                of the slots available to the class only (default: {None})
+            weights {Optional[Dict[str, float]]} -- key value pairs tag -> the relative share
+                of the class slots, the default weight is 1 (default: {None})
+        """
+        self.max_concurrency = max_concurrency
+        self.reservations = dict(reservations or {})
+        self.weights = dict(weights or {})
+        if sum(self.reservations.values()) > max_concurrency:
+            raise ValueError("Reserved slots exceed the maximum concurrency")
+        self.active = {}  # type: Dict[int, int]
+        self.queues = {}  # priority -> heap of [finish, sequence, start, tag, future]
+        self.virtual_time = {}  # type: Dict[int, float]
+        self.finish = {}  # type: Dict[Tuple[int, str], float]
+        self.sequence = count()
+        self.requests = {}  # type: Dict[int, int]
+        self.wait_time = {}  # type: Dict[int, float]
+
+    @staticmethod
+    def context(priority: Optional[int] = None, tag: Optional[str] = None) -> Tuple[int, str]:
+        """ The same as current_priority(...) """
+        return current_priority(priority, tag)
+
+    def _available(self, priority: int) -> bool:
+        free = self.max_concurrency - sum(self.active.values())
+        reserved = sum(
+            max(reservation - self.active.get(other, 0), 0)
+            for other, reservation in self.reservations.items()
+            if other != priority
+        )
+        return free > reserved
+
+    async def acquire(self, priority: int = NORMAL, tag: str = DEFAULT_TAG):
+        """Wait for the free request slot
+
+        Keyword Arguments:
+            priority {int} -- priority class (default: {NORMAL})
+            tag {str} -- caller tag (default: {DEFAULT_TAG})
+        """
+        started = monotonic()
+        virtual_time = self.virtual_time.get(priority, 0.0)
+        start = max(virtual_time, self.finish.get((priority, tag), virtual_time))
+        finish = start + 1.0 / self.weights.get(tag, 1.0)
+        self.finish[(priority, tag)] = finish
+        future = get_running_loop().create_future()
+        entry = [finish, next(self.sequence), start, tag, future]
+        heapq.heappush(self.queues.setdefault(priority, []), entry)
+        self._dispatch()
+        try:
+            await future
+        except CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted after the waiting task had been cancelled
+                self.release(priority)
+            else:
+                future.cancel()
+                self._withdraw(priority, entry)
+            raise
+        self.requests[priority] = self.requests.get(priority, 0) + 1
+        self.wait_time[priority] = self.wait_time.get(priority, 0.0) + monotonic() - started
+
+    def _withdraw(self, priority: int, entry: list):
+        """ Remove the cancelled request, the later requests of the tag take its place """
+        finish, sequence, start, tag, _ = entry
+        queue = [item for item in self.queues.get(priority, []) if item is not entry]
+        later = sorted(
+            (item for item in queue if item[3] == tag and item[1] > sequence),
+            key=lambda item: item[1],
+        )
+        # The chained requests are moved back, the ones started by the virtual time are kept
+        previous, new_finish = finish, start
+        for item in later:
+            item_start = new_finish if item[2] == previous else item[2]
+            previous = item[0]
+            item[0], item[2] = item_start + item[0] - item[2], item_start
+            new_finish = item[0]
+        heapq.heapify(queue)
+        self.queues[priority] = queue
+        if self.finish.get((priority, tag)) == previous:
+            self.finish[(priority, tag)] = new_finish
+
+    def release(self, priority: int = NORMAL):
+        """Release the request slot
+
+        Keyword Arguments:
+            priority {int} -- priority class of the acquired slot (default: {NORMAL})
+        """
+        self.active[priority] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        for priority in sorted(self.queues):
+            queue = self.queues[priority]
+            while queue and self._available(priority):
+                _, _, start, _, future = heapq.heappop(queue)
+                if future.done():
+                    continue  # the waiting request is cancelled
+                self.virtual_time[priority] = start
+                self.active[priority] = self.active.get(priority, 0) + 1
+                future.set_result(None)
+
+    def stats(self) -> Dict[int, dict]:
+        """Get the scheduler statistics
+
+        Returns:
+            Dict[int, dict] -- key value pairs priority -> the number of the active
+                and the queued requests, the total number of the requests and the
+                average waiting time
+        """
+        priorities = set(self.active) | set(self.queues) | set(self.requests)
+        return {
+            priority: {
+                "active": self.active.get(priority, 0),
+                "queued": sum(1 for item in self.queues.get(priority, []) if not item[4].done()),
+                "requests": self.requests.get(priority, 0),
+                "wait": self.wait_time.get(priority, 0.0) / max(self.requests.get(priority, 0), 1),
+            }
+            for priority in sorted(priorities)
+        }
@@ -0,0 +1,370 @@
+""" Local unit sensor values calculation.
+
+    The sensor definitions are loaded once and the sensor values are calculated
+    from the message parameters without unit/calc_sensors requests. The calculation
+    is vectorized: the messages are converted to the parameter columns and every
+    sensor expression is evaluated over the whole column set at once.
+
+    Only the instant sensor types are supported: the value of the message is the
+    result of the expression, the calibration table, the bounds and the validation.
+    The accumulating types (counters, mileage, engine hours, consumed fuel) depend
+    on the previous messages and the unit settings on the server side, their values
+    are invalid (or SensorError is raised in the strict mode).
+"""
+import json
+import re
+from logging import getLogger
+from typing import Callable, Dict, Iterable, List
+import numpy as np
+from aiowialon.client import Session
+from aiowialon.flags import Units, join
+
+LOGGER = getLogger(__name__)
+
+INVALID_VALUE = -348201.3876  # the value unit/calc_sensors returns for the invalid sensors
+
+TOKEN_PATTERN = re.compile(
+    r"\s*(?:"
+    r"(?P<number>\d+(?:\.\d*)?|\.\d+)"
+    r"|(?P<sensor>\[[^\]]+\])"
+    r"|(?P<param>#?[A-Za-z_][A-Za-z0-9_]*(?::\d+)?)"
+    r"|(?P<operator>==|!=|>=|<=|[-+*/^()<>])"
+    r")"
+)
+
+OPERATORS = {"^": "**"}
+
+# Sensor types (`t` property) which values are accumulated over the messages
+ACCUMULATING_TYPES = frozenset(
+    [
+        "counter",
+        "mileage",
+        "odometer",
+        "engine hours",
+        "absolute fuel consumption",
+        "impulse fuel consumption",
+        "fuel level impulse sensor",
+    ]
+)
+
+# Message position and time values available as the sensor parameters
+POSITION_PARAMETERS = {
+    "speed": "s",
+    "course": "c",
+    "altitude": "z",
+    "sats": "sc",
+    "lat": "y",
+    "lon": "x",
+}
+
+
+class SensorError(ValueError):
+    """ Invalid sensor definition """
+
+
+def _bit(values: np.ndarray, index: int) -> np.ndarray:
+    result = np.full(values.shape, np.nan)
+    valid = ~np.isnan(values)
+    result[valid] = (values[valid].astype(np.int64) >> index) & 1
+    return result
+
+
+def compile_expression(expression: str) -> Callable:
+    """Compile Wialon sensor parameter expression
+
+    The expression can contain the message parameter names, bit access (`io:3`),
+    constants (`const10`), other sensor references (`[Sensor name]`), numbers,
+    arithmetic and comparison operators and parentheses.
+
+    Arguments:
+        expression {str} -- sensor parameter expression
+
+    Returns:
+        Callable -- function (param, sensor) -> values, where param and sensor are
+            functions returning the column of the parameter or the sensor by name
+    """
+    parts = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if not match or match.end() == position:
+            raise SensorError(f"Invalid sensor expression: {expression!r}")
+        position = match.end()
+        if match.group("number"):
+            parts.append(match.group("number"))
+        elif match.group("sensor"):
+            parts.append("_sensor({!r})".format(match.group("sensor")[1:-1]))
+        elif match.group("param"):
+            name, _, bit = match.group("param").lstrip("#").partition(":")
+            if re.fullmatch(r"const\d+(?:\.\d*)?", name):
+                parts.append(name[len("const") :])
+            elif bit:
+                parts.append("_bit(_param({!r}), {})".format(name, int(bit)))
+            else:
+                parts.append("_param({!r})".format(name))
+        else:
+            operator = match.group("operator")
+            parts.append(OPERATORS.get(operator, operator))
+    if not parts:
+        raise SensorError("Empty sensor expression")
+    try:
+        code = compile(" ".join(parts), f"<sensor {expression}>", "eval")
+    except SyntaxError as exp:
+        raise SensorError(f"Invalid sensor expression: {expression!r}") from exp
+
+    def evaluate(param: Callable, sensor: Callable) -> np.ndarray:
+        namespace = {"__builtins__": {}, "_param": param, "_sensor": sensor, "_bit": _bit}
+        with np.errstate(all="ignore"):
+            return np.asarray(eval(code, namespace), dtype=float)  # pylint: disable=eval-used
+
+    return evaluate
+
+
+def _validate(values: np.ndarray, validator: np.ndarray, validation_type: int) -> np.ndarray:
+    # pylint: disable=too-many-return-statements
+    valid = ~(np.isnan(values) | np.isnan(validator))
+    if validation_type == 1:
+        return np.where(valid, ((values != 0) & (validator != 0)).astype(float), np.nan)
+    if validation_type == 2:
+        return np.where(valid, ((values != 0) | (validator != 0)).astype(float), np.nan)
+    if validation_type in (3, 4):
+        result = np.full(values.shape, np.nan)
+        left, right = values[valid].astype(np.int64), validator[valid].astype(np.int64)
+        result[valid] = left & right if validation_type == 3 else left | right
+        return result
+    if validation_type == 5:
+        return values + validator
+    if validation_type == 6:
+        return values - validator
+    if validation_type == 7:
+        return validator - values
+    if validation_type == 8:
+        return values * validator
+    if validation_type == 9:
+        return values / validator
+    if validation_type == 10:
+        return validator / values
+    if validation_type == 11:
+        return np.where(np.isnan(validator) | (validator == 0), np.nan, values)
+    if validation_type == 12:
+        return np.where(np.isnan(values), validator, values)
+    raise SensorError(f"Unsupported sensor validation type: {validation_type}")
+
+
+def _calibrate(values: np.ndarray, table: List[dict]) -> np.ndarray:
+    rows = sorted(table, key=lambda row: row["x"])
+    bounds = np.array([row["x"] for row in rows], dtype=float)
+    factors = np.array([row["a"] for row in rows], dtype=float)
+    offsets = np.array([row["b"] for row in rows], dtype=float)
+    index = np.clip(np.searchsorted(bounds, values, side="right") - 1, 0, len(rows) - 1)
+    return factors[index] * values + offsets[index]
+
+
+def _config(sensor: dict) -> dict:
+    config = sensor.get("c") or {}
+    if isinstance(config, str):
+        try:
+            config = json.loads(config)
+        except ValueError:
+            config = {}
+    return config
+
+
+def to_columns(messages: Iterable[dict], names: Iterable[str]) -> Dict[str, np.ndarray]:
+    """Convert the message parameters to the float columns
+
+    The missing and non-numeric parameter values are converted to NaN. The position
+    values (speed, course, altitude, sats, lat, lon) and the message time are used
+    if the message has no parameter with the same name.
+
+    Arguments:
+        messages {Iterable[dict]} -- messages returned by load_messages(...)
+        names {Iterable[str]} -- parameter names
+
+    Returns:
+        Dict[str, np.ndarray] -- key value pairs parameter_name -> values
+    """
+    messages = list(messages)
+    columns = {}
+    for name in names:
+        column = np.full(len(messages), np.nan)
+        for index, message in enumerate(messages):
+            value = (message.get("p") or {}).get(name)
+            if value is None and name in POSITION_PARAMETERS:
+                value = (message.get("pos") or {}).get(POSITION_PARAMETERS[name])
+            elif value is None and name == "time":
+                value = message.get("t")
+            if isinstance(value, (int, float)):
+                column[index] = value
+        columns[name] = column
+    return columns
+
+
+class SensorEngine:
+    """ Unit sensor values calculator """
+
+    def __init__(self, sensors: Dict[str, dict], strict: bool = False):
+        """
+        Arguments:
+            sensors {Dict[str, dict]} -- unit sensor definitions (unit `sens` property)
+
+        Keyword Arguments:
+            strict {bool} -- raise SensorError if the unit has the sensors of the
+                accumulating types instead of returning the invalid values (default: {False})
+        """
+        self.sensors = {int(sensor["id"]): sensor for sensor in sensors.values()}
+        self.unsupported = {
+            sensor_id: sensor["t"]
+            for sensor_id, sensor in self.sensors.items()
+            if sensor.get("t") in ACCUMULATING_TYPES
+        }
+        if self.unsupported and strict:
+            raise SensorError(
+                "Unsupported sensor types: "
+                + ", ".join(
+                    f"{self.sensors[sensor_id]['n']!r} ({sensor_type})"
+                    for sensor_id, sensor_type in self.unsupported.items()
+                )
+            )
+        for sensor_id, sensor_type in self.unsupported.items():
+            LOGGER.warning(
+                "Sensor %r of type %r can't be calculated locally, its values are invalid",
+                self.sensors[sensor_id]["n"],
+                sensor_type,
+            )
+        self.names = {sensor["n"]: sensor_id for sensor_id, sensor in self.sensors.items()}
+        self.expressions = {
+            sensor_id: compile_expression(sensor["p"])
+            for sensor_id, sensor in self.sensors.items()
+            if sensor.get("p", "").strip()
+        }
+        self.parameters = sorted(
+            {
+                match.group("param").lstrip("#").partition(":")[0]
+                for sensor in self.sensors.values()
+                for match in TOKEN_PATTERN.finditer(sensor.get("p", ""))
+                if match.group("param")
+            }
+        )
+
+    def calculate_columns(
+        self, columns: Dict[str, np.ndarray], size: int = None
+    ) -> Dict[int, np.ndarray]:
+        """Calculate the sensor values over the parameter columns
+
+        Arguments:
+            columns {Dict[str, np.ndarray]} -- key value pairs parameter_name -> values
+
+        Keyword Arguments:
+            size {int} -- the number of messages, required for the empty columns (default: {None})
+
+        Returns:
+            Dict[int, np.ndarray] -- key value pairs sensor_id -> values (NaN for invalid values
+                and the sensors of the accumulating types)
+        """
+        if size is None:
+            size = len(next(iter(columns.values()))) if columns else 0
+        missing = np.full(size, np.nan)
+        result = {}
+        in_progress = set()
+
+        def param(name):
+            return columns.get(name, missing)
+
+        def sensor_by_name(name):
+            if name not in self.names:
+                raise SensorError(f"Unknown sensor: {name!r}")
+            return calculate(self.names[name])
+
+        def calculate(sensor_id):
+            if sensor_id in result:
+                return result[sensor_id]
+            if sensor_id in in_progress:
+                raise SensorError(f"Circular sensor dependency: {self.sensors[sensor_id]['n']!r}")
+            in_progress.add(sensor_id)
+            sensor = self.sensors[sensor_id]
+            if sensor_id in self.unsupported:
+                in_progress.discard(sensor_id)
+                result[sensor_id] = missing.copy()
+                return result[sensor_id]
+            if sensor_id in self.expressions:
+                values = self.expressions[sensor_id](param, sensor_by_name)
+                values = np.broadcast_to(values, (size,)).astype(float)
+            else:
+                values = missing.copy()
+            if sensor.get("tbl"):
+                values = _calibrate(values, sensor["tbl"])
+            config = _config(sensor)
+            lower, upper = config.get("lower_bound"), config.get("upper_bound")
+            if lower is not None and upper is not None and lower < upper:
+                values = np.where((values < lower) | (values > upper), np.nan, values)
+            if sensor.get("vs"):
+                validator = calculate(int(sensor["vs"]))
+                with np.errstate(all="ignore"):
+                    values = _validate(values, validator, sensor.get("vt", 1))
+            values[~np.isfinite(values)] = np.nan
+            in_progress.discard(sensor_id)
+            result[sensor_id] = values
+            return values
+
+        for sensor_id in self.sensors:
+            calculate(sensor_id)
+        return result
+
+    def calculate(self, messages: List[dict]) -> List[Dict[str, float]]:
+        """Calculate the sensor values for the messages
+
+        Arguments:
+            messages {List[dict]} -- messages returned by load_messages(...)
+
+        Returns:
+            List[Dict[str, float]] -- sensor values in the unit/calc_sensors format
+        """
+        columns = self.calculate_columns(
+            to_columns(messages, self.parameters), size=len(messages)
+        )
+        values = {
+            str(sensor_id): np.where(np.isnan(column), INVALID_VALUE, column).tolist()
+            for sensor_id, column in columns.items()
+        }
+        return [
+            {sensor_id: column[index] for sensor_id, column in values.items()}
+            for index in range(len(messages))
+        ]
+
+
+async def load_sensors(session: Session, unit_id: int) -> Dict[str, dict]:
+    """Load the unit sensor definitions
+
+    Arguments:
+        session {Session} -- active session
+        unit_id {int} -- unit identifier
+
+    Returns:
+        Dict[str, dict] -- key value pairs sensor_id -> sensor definition
+    """
+    response = await session.call(
+        "core/search_item",
+        {"id": unit_id, "flags": join({Units.GENERAL_PROPERTIES, Units.SENSORS})},
+    )
+    return response["item"].get("sens", {})
+
+
+async def load_sensor_engine(
+    session: Session, unit_id: int, strict: bool = False
+) -> SensorEngine:
+    """Create the sensor engine for the unit
+
+    Arguments:
+        session {Session} -- active session
+        unit_id {int} -- unit identifier
+
+    Keyword Arguments:
+        strict {bool} -- raise SensorError if the unit has the sensors of the
+            accumulating types (default: {False})
+
+    Returns:
+        SensorEngine -- sensor values calculator
+    """
+    return SensorEngine(await load_sensors(session, unit_id), strict=strict)
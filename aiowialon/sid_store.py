@@ -0,0 +1,127 @@
+""" Persistent storage of the Wialon sessions to reuse them between the processes. """
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from logging import getLogger
+from typing import Optional
+
+LOGGER = getLogger(__name__)
+
+DEFAULT_TTL = 240  # Wialon closes the session after 5 minutes of inactivity
+
+
+def session_key(host: str, token: str) -> str:
+    """Get the storage key of the session
+
+    Arguments:
+        host {str} -- Remote API host
+        token {str} -- access token
+
+    Returns:
+        str -- session key
+    """
+    return hashlib.sha256(f"{host}\n{token}".encode()).hexdigest()[:32]
+
+
+class SidStore(ABC):
+    """ Abstract session storage """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        """Get the stored session info
+
+        Arguments:
+            key {str} -- session key
+
+        Returns:
+            Optional[dict] -- token/login response or None if the session isn't stored
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def set(self, key: str, session_info: dict):
+        """Store the session info
+
+        Arguments:
+            key {str} -- session key
+            session_info {dict} -- token/login response
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove the session info
+
+        Arguments:
+            key {str} -- session key
+        """
+        raise NotImplementedError()
+
+
+class MemorySidStore(SidStore):
+    """ In-process session storage """
+
+    def __init__(self, ttl: int = DEFAULT_TTL):
+        self.ttl = ttl
+        self.sessions = {}
+
+    def get(self, key):
+        stored, session_info = self.sessions.get(key, (0, None))
+        if time.time() - stored > self.ttl:
+            return None
+        return session_info
+
+    def set(self, key, session_info):
+        self.sessions[key] = (time.time(), session_info)
+
+    def delete(self, key):
+        self.sessions.pop(key, None)
+
+
+class FileSidStore(SidStore):
+    """File based session storage
+
+    Every session is stored to the separate JSON file. The files are replaced
+    atomically, so the store can be shared by several processes. The session
+    is considered expired if it isn't stored again during `ttl` seconds.
+    """
+
+    def __init__(self, path: str, ttl: int = DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(path, exist_ok=True)
+
+    def _filepath(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key):
+        filepath = self._filepath(key)
+        try:
+            if time.time() - os.path.getmtime(filepath) > self.ttl:
+                return None
+            with open(filepath, "r", encoding="utf-8") as infile:
+                return json.load(infile)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, session_info):
+        descriptor, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as outfile:
+                json.dump(session_info, outfile)
+            os.chmod(temp_path, 0o600)
+            os.replace(temp_path, self._filepath(key))
+        except OSError:
+            LOGGER.warning("Unable to store the session to %s", self.path, exc_info=True)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._filepath(key))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,187 @@
+""" Streaming unit track simplification.
+
+    The messages are processed chunk by chunk, so the memory usage is limited
+    by the chunk size. The kept messages are returned as is, the tolerance is
+    set in meters.
+"""
+from math import cos, radians
+from typing import Iterable, List, Optional
+import numpy as np
+from aiowialon.utils import EARTH_RADIUS, distance
+
+DOUGLAS_PEUCKER = "douglas_peucker"
+RADIAL = "radial"
+
+DATA_MESSAGE_TYPE = "ud"
+
+
+def _douglas_peucker(x: np.ndarray, y: np.ndarray, tolerance: float) -> np.ndarray:
+    """ Get the mask of the points kept by Douglas-Peucker algorithm """
+    keep = np.zeros(len(x), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(x) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1 : last] - x[first], y[first + 1 : last] - y[first]
+        length = np.hypot(dx, dy)
+        if length > 0:
+            deviation = np.abs(px * dy - py * dx) / length
+        else:
+            deviation = np.hypot(px, py)
+        index = int(np.argmax(deviation))
+        if deviation[index] > tolerance:
+            index += first + 1
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return keep
+
+
+class TrackSimplifier:
+    """ Streaming track simplifier """
+
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
+
+    def __init__(
+        self,
+        tolerance: float = 10.0,
+        method: str = DOUGLAS_PEUCKER,
+        max_gap: Optional[int] = None,
+        keep_events: bool = False,
+        keep_parameters: Optional[Iterable[str]] = None,
+    ):
+        """
+        Keyword Arguments:
+            tolerance {float} -- maximum deviation (Douglas-Peucker) or minimum distance
+                between the kept points (radial), meters (default: {10.0})
+            method {str} -- DOUGLAS_PEUCKER or RADIAL (default: {DOUGLAS_PEUCKER})
+            max_gap {Optional[int]} -- keep the message if the time passed since the last
+                kept message exceeds the gap, seconds; radial method only (default: {None})
+            keep_events {bool} -- keep all the non-data messages and the messages
+                with the changed inputs or outputs (default: {False})
+            keep_parameters {Optional[Iterable[str]]} -- keep the messages where the
+                listed parameters are changed (default: {None})
+        """
+        if method not in (DOUGLAS_PEUCKER, RADIAL):
+            raise ValueError(f"Unknown simplification method: {method}")
+        self.tolerance = tolerance
+        self.method = method
+        self.max_gap = max_gap
+        self.keep_events = keep_events
+        self.keep_parameters = list(keep_parameters or [])
+        self.anchor = None  # the last kept message with the position
+        self.last = None  # the last processed message with the position
+        self.state = None  # the last inputs, outputs and watched parameter values
+
+    def _important(self, message: dict) -> bool:
+        if message.get("tp", DATA_MESSAGE_TYPE) != DATA_MESSAGE_TYPE:
+            return self.keep_events
+        params = message.get("p") or {}
+        state = (
+            message.get("i"),
+            message.get("o"),
+            tuple(params.get(name) for name in self.keep_parameters),
+        )
+        previous, self.state = self.state, state
+        if previous is None:
+            return False
+        if self.keep_events and state[:2] != previous[:2]:
+            return True
+        return state[2] != previous[2]
+
+    def feed(self, messages: Iterable[dict]) -> List[dict]:
+        """Simplify the next message chunk
+
+        Arguments:
+            messages {Iterable[dict]} -- messages ordered by time
+
+        Returns:
+            List[dict] -- kept messages
+        """
+        messages = list(messages)
+        important = [self._important(message) for message in messages]
+        if self.method == RADIAL:
+            return self._radial(messages, important)
+        return self._douglas_peucker(messages, important)
+
+    def finish(self) -> List[dict]:
+        """Complete the simplification, the simplifier is reset after that
+
+        Returns:
+            List[dict] -- the rest of the kept messages
+        """
+        result = [self.last] if self.last is not None and self.last is not self.anchor else []
+        self.anchor = self.last = self.state = None
+        return result
+
+    def _radial(self, messages: List[dict], important: List[bool]) -> List[dict]:
+        result = []
+        for message, is_important in zip(messages, important):
+            position = message.get("pos")
+            if not position:
+                if is_important:
+                    result.append(message)
+                continue
+            self.last = message
+            anchor = self.anchor
+            if (
+                is_important
+                or anchor is None
+                or (self.max_gap is not None and message["t"] - anchor["t"] >= self.max_gap)
+                or distance(position["y"], position["x"], anchor["pos"]["y"], anchor["pos"]["x"])
+                >= self.tolerance
+            ):
+                self.anchor = message
+                result.append(message)
+        return result
+
+    def _douglas_peucker(self, messages: List[dict], important: List[bool]) -> List[dict]:
+        anchor = [] if self.anchor is None else [self.anchor]
+        track = anchor + [message for message in messages if message.get("pos")]
+        if not track:
+            return [message for message, flag in zip(messages, important) if flag]
+        forced = {id(message) for message, flag in zip(messages, important) if flag}
+
+        # Local equirectangular projection to meters
+        latitude = np.radians([message["pos"]["y"] for message in track])
+        longitude = np.radians([message["pos"]["x"] for message in track])
+        x = EARTH_RADIUS * longitude * cos(radians(track[0]["pos"]["y"]))
+        y = EARTH_RADIUS * latitude
+
+        # The important messages split the track to independently simplified parts
+        breaks = [0] + [i for i, message in enumerate(track) if id(message) in forced]
+        breaks.append(len(track) - 1)
+        keep = np.zeros(len(track), dtype=bool)
+        for first, last in zip(breaks[:-1], breaks[1:]):
+            if last > first:
+                keep[first : last + 1] |= _douglas_peucker(
+                    x[first : last + 1], y[first : last + 1], self.tolerance
+                )
+        keep[breaks] = True
+
+        kept = {id(message) for message, flag in zip(track, keep) if flag}
+        self.anchor = self.last = track[-1]
+        return [
+            message
+            for message in messages
+            if id(message) in kept or (id(message) in forced and not message.get("pos"))
+        ]
+
+
+def simplify_track(messages: Iterable[dict], **kwargs) -> List[dict]:
+    """Simplify the track
+
+    Arguments:
+        messages {Iterable[dict]} -- messages ordered by time
+
+    Keyword Arguments:
+        The same as TrackSimplifier(...) accepts
+
+    Returns:
+        List[dict] -- kept messages
+    """
+    simplifier = TrackSimplifier(**kwargs)
+    return simplifier.feed(messages) + simplifier.finish()
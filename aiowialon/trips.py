@@ -0,0 +1,345 @@
+""" Trips, stops and parkings detection over the unit messages.
+
+    The messages are processed as the numpy columns, so the detection cost
+    doesn't depend on the Python per-message loops. The detector can consume
+    the message chunks one by one: the segments are returned as soon as
+    they can't be changed by the following messages.
+"""
+from typing import Dict, Iterable, List, NamedTuple, Tuple, Union
+import numpy as np
+from aiowialon.utils import EARTH_RADIUS
+
+TRIP = "trip"
+STOP = "stop"
+PARKING = "parking"
+
+
+class MessageColumns(NamedTuple):
+    """ Columnar message container """
+
+    time: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+    speed: np.ndarray
+
+    def __len__(self):
+        return len(self.time)
+
+
+class Segment(NamedTuple):
+    """ Trip, stop or parking interval """
+
+    kind: str
+    begin: int
+    end: int
+    distance: float
+    max_speed: float
+    begin_position: Tuple[float, float]
+    end_position: Tuple[float, float]
+
+    def duration(self) -> int:
+        """ Get the segment duration in seconds """
+        return self.end - self.begin
+
+
+def message_columns(messages: Union[Iterable[dict], Dict, MessageColumns]) -> MessageColumns:
+    """Convert the messages to the columnar container
+
+    The messages without the position are skipped.
+
+    Arguments:
+        messages {Union[Iterable[dict], Dict, MessageColumns]} -- messages returned by
+            load_messages(...), the columnar container or the dictionary with the same keys
+
+    Returns:
+        MessageColumns -- columnar messages
+    """
+    if isinstance(messages, MessageColumns):
+        return messages
+    if isinstance(messages, dict):
+        return MessageColumns(
+            *(np.asarray(messages[name], dtype=float) for name in MessageColumns._fields)
+        )
+    rows = [
+        (message["t"], message["pos"]["y"], message["pos"]["x"], message["pos"].get("s", 0))
+        for message in messages
+        if message.get("pos")
+    ]
+    data = np.array(rows, dtype=float).reshape(-1, 4)
+    return MessageColumns(data[:, 0], data[:, 1], data[:, 2], data[:, 3])
+
+
+def distances(latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    """Calculate the distances between the consecutive points
+
+    The same haversine formula as utils.distance(...) uses is applied.
+
+    Arguments:
+        latitude {np.ndarray} -- point latitudes
+        longitude {np.ndarray} -- point longitudes
+
+    Returns:
+        np.ndarray -- distances, the array is one item shorter than the point arrays
+    """
+    return haversine(latitude[:-1], longitude[:-1], latitude[1:], longitude[1:])
+
+
+def haversine(latitude_1, longitude_1, latitude_2, longitude_2) -> np.ndarray:
+    """Vectorized version of utils.distance(...)
+
+    Arguments:
+        latitude_1 {np.ndarray} -- first points' latitudes
+        longitude_1 {np.ndarray} -- first points' longitudes
+        latitude_2 {np.ndarray} -- second points' latitudes
+        longitude_2 {np.ndarray} -- second points' longitudes
+
+    Returns:
+        np.ndarray -- distances
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (latitude_1, longitude_1, latitude_2, longitude_2))
+    return (
+        2
+        * EARTH_RADIUS
+        * np.arcsin(
+            np.sqrt(
+                np.sin((lat2 - lat1) / 2) ** 2
+                + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+            )
+        )
+    )
+
+
+class _Part:  # pylint: disable=too-few-public-methods
+    """ Accumulated part of the message run """
+
+    __slots__ = ("begin", "latitude", "longitude", "distance", "max_speed")
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, begin: int, latitude: float, longitude: float, distance: float, max_speed: float
+    ):
+        self.begin = begin
+        self.latitude = latitude
+        self.longitude = longitude
+        self.distance = distance
+        self.max_speed = max_speed
+
+    def extend(self, other: "_Part") -> "_Part":
+        """ Add the next part of the same run """
+        self.distance += other.distance
+        self.max_speed = max(self.max_speed, other.max_speed)
+        return self
+
+
+class TripDetector:
+    """Incremental trips, stops and parkings detector
+
+    The messages are labeled by the speed and grouped to the runs in three
+    passes: the short stops become the parts of the moving runs, the moving
+    runs too short by the time or the distance become the parts of the stops,
+    the rest are the trips. Only the open run of every pass is kept between
+    the chunks, so the memory doesn't depend on the stream length.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
+
+    def __init__(
+        self,
+        min_moving_speed: float = 5,
+        min_stop_duration: int = 60,
+        min_parking_duration: int = 300,
+        min_trip_duration: int = 60,
+        min_trip_distance: float = 100,
+    ):
+        """
+        Keyword Arguments:
+            min_moving_speed {float} -- minimum moving speed, km/h (default: {5})
+            min_stop_duration {int} -- minimum stop duration, seconds (default: {60})
+            min_parking_duration {int} -- minimum parking duration, seconds (default: {300})
+            min_trip_duration {int} -- minimum trip duration, seconds (default: {60})
+            min_trip_distance {float} -- minimum trip distance, meters (default: {100})
+        """
+        self.min_moving_speed = min_moving_speed
+        self.min_stop_duration = min_stop_duration
+        self.min_parking_duration = min_parking_duration
+        self.min_trip_duration = min_trip_duration
+        self.min_trip_distance = min_trip_distance
+        self._reset()
+
+    def _reset(self):
+        self.last = None  # (time, latitude, longitude) of the last message
+        # The speed run: the stop is passed on when it's known to be long or short
+        self.run_moving = None
+        self.run_begin = None
+        self.run_known = False
+        self.run_part = None  # type: _Part
+        # The motion run with the short stops: the moving one is held until it's a trip
+        self.motion_moving = None
+        self.motion_begin = None
+        self.motion_distance = 0.0
+        self.motion_part = None  # type: _Part
+        # The segment run
+        self.segment_moving = None
+        self.segment = None  # type: _Part
+
+    def feed(self, messages: Union[Iterable[dict], Dict, MessageColumns]) -> List[Segment]:
+        """Process the next message chunk
+
+        Arguments:
+            messages {Union[Iterable[dict], Dict, MessageColumns]} -- messages ordered by time
+
+        Returns:
+            List[Segment] -- the segments which are completed
+        """
+        columns = message_columns(messages)
+        if not len(columns):
+            return []
+        # The distance passed to the every message from the previous one
+        first_step = (
+            haversine(self.last[1], self.last[2], columns.latitude[0], columns.longitude[0])
+            if self.last is not None
+            else 0.0
+        )
+        steps = np.concatenate(([first_step], distances(columns.latitude, columns.longitude)))
+        labels = columns.speed >= self.min_moving_speed
+        starts = np.flatnonzero(np.concatenate(([True], labels[1:] != labels[:-1])))
+        runs = zip(
+            labels[starts].tolist(),
+            columns.time[starts].astype(np.int64).tolist(),
+            columns.latitude[starts].tolist(),
+            columns.longitude[starts].tolist(),
+            np.add.reduceat(steps, starts).tolist(),
+            np.maximum.reduceat(columns.speed, starts).tolist(),
+        )
+        segments = []
+        for moving, *fields in runs:
+            part = _Part(*fields)
+            if moving != self.run_moving:
+                self._close_run(part.begin, segments)
+                self.run_moving, self.run_begin, self.run_known = moving, part.begin, moving
+                self.run_part = part
+            elif self.run_part is None:
+                self.run_part = part
+            else:
+                self.run_part.extend(part)
+
+        self.last = (
+            int(columns.time[-1]),
+            float(columns.latitude[-1]),
+            float(columns.longitude[-1]),
+        )
+        # The stop lasting long enough can only grow
+        if not self.run_known and self.last[0] - self.run_begin >= self.min_stop_duration:
+            self.run_known = True
+        if self.run_known and self.run_part is not None:
+            self._motion(self.run_moving, self.run_part, segments)
+            self.run_part = None
+        # The moving run lasting and passing enough is the trip, it lasts until
+        # the last message or the beginning of the stop which can be long
+        end = self.last[0] if self.run_moving or self.run_known else self.run_begin
+        if (
+            self.motion_part is not None
+            and end - self.motion_begin >= self.min_trip_duration
+            and self.motion_distance >= self.min_trip_distance
+        ):
+            self._segment(True, self.motion_part, segments)
+            self.motion_part = None
+        return segments
+
+    def finish(self) -> List[Segment]:
+        """Complete the detection, the detector is reset after that
+
+        Returns:
+            List[Segment] -- the rest of the segments
+        """
+        if self.last is None:
+            return []
+        segments = []
+        end, latitude, longitude = self.last
+        self._close_run(end, segments)
+        self._close_motion(end, segments)
+        if self.segment is not None:
+            self._emit(end, latitude, longitude, segments)
+        self._reset()
+        return segments
+
+    def _close_run(self, end: int, segments: List[Segment]):
+        if self.run_part is None:
+            return
+        # The short stop is the part of the moving run
+        moving = self.run_moving or (
+            not self.run_known and end - self.run_begin < self.min_stop_duration
+        )
+        self._motion(moving, self.run_part, segments)
+        self.run_part = None
+
+    def _motion(self, moving: bool, part: _Part, segments: List[Segment]):
+        if moving != self.motion_moving:
+            self._close_motion(part.begin, segments)
+            self.motion_moving, self.motion_begin, self.motion_distance = moving, part.begin, 0.0
+            self.motion_part = (
+                _Part(part.begin, part.latitude, part.longitude, 0.0, 0.0) if moving else None
+            )
+        self.motion_distance += part.distance
+        if self.motion_part is not None:
+            self.motion_part.extend(part)
+        else:
+            self._segment(moving, part, segments)
+
+    def _close_motion(self, end: int, segments: List[Segment]):
+        if self.motion_part is None:
+            return
+        # Too short moving run is the part of the stop
+        trip = (
+            end - self.motion_begin >= self.min_trip_duration
+            and self.motion_distance >= self.min_trip_distance
+        )
+        self._segment(trip, self.motion_part, segments)
+        self.motion_part = None
+
+    def _segment(self, moving: bool, part: _Part, segments: List[Segment]):
+        if self.segment is not None and moving == self.segment_moving:
+            self.segment.extend(part)
+            return
+        if self.segment is not None:
+            self._emit(part.begin, part.latitude, part.longitude, segments)
+        self.segment_moving, self.segment = moving, part
+
+    def _emit(self, end: int, latitude: float, longitude: float, segments: List[Segment]):
+        duration = end - self.segment.begin
+        if self.segment_moving:
+            kind = TRIP
+        elif duration >= self.min_parking_duration:
+            kind = PARKING
+        elif duration >= self.min_stop_duration:
+            kind = STOP
+        else:
+            return
+        segments.append(
+            Segment(
+                kind=kind,
+                begin=self.segment.begin,
+                end=end,
+                distance=self.segment.distance,
+                max_speed=self.segment.max_speed,
+                begin_position=(self.segment.latitude, self.segment.longitude),
+                end_position=(latitude, longitude),
+            )
+        )
+
+
+def detect_trips(
+    messages: Union[Iterable[dict], Dict, MessageColumns], **kwargs
+) -> List[Segment]:
+    """Detect trips, stops and parkings
+
+    Arguments:
+        messages {Union[Iterable[dict], Dict, MessageColumns]} -- messages ordered by time
+
+    Keyword Arguments:
+        The same as TripDetector(...) accepts
+
+    Returns:
+        List[Segment] -- segment list
+    """
+    detector = TripDetector(**kwargs)
+    return detector.feed(messages) + detector.finish()
@@ -4,7 +4,7 @@
 """
 from typing import Optional, Iterable
 from aiowialon.flags import join, Units
-from aiowialon import Session
+from aiowialon.client import Session
 
 
 async def load_units(session: Session, flags: Optional[Iterable] = None) -> list:
@@ -1,4 +1,7 @@
+from contextlib import asynccontextmanager
+from itertools import islice
 from math import asin, cos, radians, sin, sqrt
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Iterable, Iterator, List
 
 EARTH_RADIUS = 6371000.0
 
@@ -25,3 +28,61 @@ def distance(latitude_1: float, longitude_1: float, latitude_2: float, longitude
             )
         )
     )
+
+
+def chunks(items: Iterable, size: int) -> Iterator[list]:
+    """Split the iterable to the lists of the limited size
+
+    Arguments:
+        items {Iterable} -- source items
+        size {int} -- maximum chunk size
+
+    Returns:
+        Iterator[list] -- chunk iterator
+    """
+    if size < 1:
+        raise ValueError(f"Invalid chunk size: {size}")
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+async def gather_limited(awaitables: Iterable[Awaitable], limit: int) -> List:
+    """Await all the awaitables running not more than `limit` of them at the same time
+
+    Arguments:
+        awaitables {Iterable[Awaitable]} -- awaitables to run
+        limit {int} -- maximum number of the awaitables running concurrently
+
+    Returns:
+        List -- results in the same order as the awaitables
+    """
+    # asyncio is imported here to keep the package import fast
+    from asyncio import Semaphore, gather  # pylint: disable=import-outside-toplevel
+
+    semaphore = Semaphore(max(limit, 1))
+
+    async def run(awaitable):
+        async with semaphore:
+            return await awaitable
+
+    return list(await gather(*(run(awaitable) for awaitable in awaitables)))
+
+
+@asynccontextmanager
+async def aclosing(generator: AsyncGenerator) -> AsyncIterator[AsyncGenerator]:
+    """Close the async generator on exit (contextlib.aclosing of Python 3.10+)
+
+    Arguments:
+        generator {AsyncGenerator} -- async generator
+
+    Returns:
+        AsyncIterator[AsyncGenerator] -- context manager returning the generator
+    """
+    try:
+        yield generator
+    finally:
+        await generator.aclose()
@@ -0,0 +1,141 @@
+""" Offline client benchmarks over the mock Wialon server.
+
+    Run `python benchmarks/benchmark.py` (or `make benchmark`), the results are
+    printed and appended to benchmarks/history.jsonl to track them over time.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+from statistics import median
+from aiowialon import connect
+from aiowialon.messages import load_messages
+from aiowialon.mock_server import DEFAULT_START_TIME, MockServer
+from aiowialon.resources import load_areas
+
+HISTORY_PATH = os.path.join(os.path.dirname(__file__), "history.jsonl")
+
+# pylint: disable=missing-function-docstring
+
+
+def percentile(values: list, share: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+async def bench_session_call(server: MockServer, calls: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    async with connect(server.token, api_host=server.url) as session:
+
+        async def call():
+            async with semaphore:
+                started = time.perf_counter()
+                await session.call("core/search_item", {"id": 1000, "flags": 1})
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(call() for _ in range(calls)))
+        elapsed = time.perf_counter() - started
+    return {
+        "calls_per_second": calls / elapsed,
+        "latency_p50": median(latencies),
+        "latency_p95": percentile(latencies, 0.95),
+    }
+
+
+async def bench_load_messages(server: MockServer, messages: int) -> dict:
+    async with connect(server.token, api_host=server.url) as session:
+        started = time.perf_counter()
+        result = await load_messages(
+            session, 1000, DEFAULT_START_TIME, DEFAULT_START_TIME + messages
+        )
+        elapsed = time.perf_counter() - started
+    return {"seconds": elapsed, "messages_per_second": len(result) / elapsed}
+
+
+async def bench_load_areas(server: MockServer) -> dict:
+    async with connect(server.token, api_host=server.url) as session:
+        started = time.perf_counter()
+        areas = await load_areas(session)
+        elapsed = time.perf_counter() - started
+    return {"seconds": elapsed, "areas": len(areas)}, areas
+
+
+def bench_area_contains(areas: list, points: int) -> dict:
+    coordinates = [(55.25 + (i % 100) / 100, 37.12 + i // 100 % 100 / 100) for i in range(points)]
+    started = time.perf_counter()
+    for latitude, longitude in coordinates:
+        for area in areas:
+            area.contains(latitude, longitude)
+    elapsed = time.perf_counter() - started
+    return {"checks_per_second": points * len(areas) / elapsed}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def run(args) -> dict:
+    async with MockServer(
+        units=1,
+        resources=args.resources,
+        areas=args.areas,
+        messages=args.messages,
+        latency=args.latency,
+        jitter=args.jitter,
+    ) as server:
+        results = {
+            "session_call": await bench_session_call(server, args.calls, args.concurrency),
+            "load_messages": await bench_load_messages(server, args.messages),
+        }
+        results["load_areas"], areas = await bench_load_areas(server)
+    results["area_contains"] = bench_area_contains(areas, args.points)
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run aiowialon benchmarks")
+    parser.add_argument("--calls", type=int, default=2000, help="Session.call requests")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent requests")
+    parser.add_argument("--messages", type=int, default=86400, help="Messages to load")
+    parser.add_argument("--resources", type=int, default=4, help="Resources")
+    parser.add_argument("--areas", type=int, default=500, help="Areas per resource")
+    parser.add_argument("--points", type=int, default=100, help="Points to check")
+    parser.add_argument("--latency", type=float, default=0.0, help="Server latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Server jitter, seconds")
+    parser.add_argument("--history", default=HISTORY_PATH, help="History file path")
+    parser.add_argument("--no-history", action="store_true", help="Don't store the results")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = asyncio.run(run(args))
+    for name, values in results.items():
+        print(name)
+        for key, value in values.items():
+            print(f"    {key:<20} {value:.6g}")
+    if not args.no_history:
+        record = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "parameters": {key: value for key, value in vars(args).items() if key != "history"},
+            "results": results,
+        }
+        with open(args.history, "a", encoding="utf-8") as history:
+            history.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+""" Package import time benchmark.
+
+    Every package module is imported in a fresh interpreter with `-X importtime`,
+    the best of several runs is compared with the budget. The script exits
+    with non-zero status if any module exceeds the budget.
+"""
+import argparse
+import pkgutil
+import re
+import subprocess
+import sys
+from typing import List
+import aiowialon
+
+DEFAULT_BUDGET = 0.15  # seconds per module including its package dependencies
+
+# The modules built on the heavy dependencies (aiohttp, shapely) get the larger budget
+DEPENDENCY_BUDGETS = {
+    "aiowialon.mock_server": 0.5,
+    "aiowialon.offload": 0.3,
+}
+
+# pylint: disable=missing-function-docstring
+
+
+def package_modules() -> List[str]:
+    """ Get all the package modules including the command line scripts """
+    modules = ["aiowialon", "aiowialon.bin.wialon_query"]
+    modules.extend(
+        module.name for module in pkgutil.walk_packages(aiowialon.__path__, prefix="aiowialon.")
+    )
+    return sorted(set(modules))
+
+
+def import_time(module: str) -> float:
+    """ Measure the cumulative import time of the module in seconds """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    ).stderr
+    total = 0
+    for line in output.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)", line)
+        # Top level imports have the single space indent
+        if match and len(match.group(2)) == 1 and not match.group(3).startswith("encodings"):
+            total += int(match.group(1))
+    return total / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check aiowialon import time budget")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="Seconds")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per module")
+    args = parser.parse_args()
+    exceeded = False
+    for module in package_modules():
+        seconds = min(import_time(module) for _ in range(args.runs))
+        budget = max(args.budget, DEPENDENCY_BUDGETS.get(module, 0))
+        status = "ok" if seconds <= budget else "OVER BUDGET"
+        exceeded = exceeded or seconds > budget
+        print(f"{module:<30} {seconds * 1000:8.1f} ms  {status}")
+    sys.exit(1 if exceeded else 0)
+
+
+if __name__ == "__main__":
+    main()
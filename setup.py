@@ -31,5 +31,6 @@ setuptools.setup(
     ],
     python_requires=">=3.7",
     install_requires=get_requirements(),
+    extras_require={"arrow": ["pyarrow"]},
     entry_points={"console_scripts": ["wialon_query=aiowialon.bin.wialon_query:main"],},
 )
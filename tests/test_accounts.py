@@ -1,5 +1,14 @@
 import pytest
-from aiowialon.accounts import get_account_data
+from aiowialon import connect
+from aiowialon.accounts import (
+    FULL_ACCOUNT_INFO,
+    AccountDataCache,
+    get_account_data,
+    load_accounts_data,
+    search_accounts,
+)
+from aiowialon.exceptions import APIError
+from aiowialon.mock_server import MockServer
 
 
 @pytest.mark.asyncio
@@ -7,3 +16,46 @@ async def test_get_account_data(session):
     """ Test that active user account info isn't empty """
     account_info = await get_account_data(session)
     assert account_info
+
+
+@pytest.mark.asyncio
+async def test_load_accounts_data():
+    """ Test the account crawl with and without core/batch packing and the cache """
+    async with MockServer(resources=5, areas=0) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            accounts = await search_accounts(session)
+            assert len(accounts) == 5
+            for batch_size in (None, 2):
+                data = await load_accounts_data(session, batch_size=batch_size, concurrency=2)
+                assert list(data) == [account["id"] for account in accounts]
+            assert server.requests["account/get_account_data"] == 5
+            assert server.requests["core/batch"] == 3
+
+            cache = AccountDataCache(ttl=60)
+            full = await load_accounts_data(session, detail_type=FULL_ACCOUNT_INFO, cache=cache)
+            assert all("services" in item for item in full.values())
+            assert await load_accounts_data(
+                session, detail_type=FULL_ACCOUNT_INFO, cache=cache
+            ) == full
+            assert server.requests["account/get_account_data"] == 10
+
+            data = await load_accounts_data(session, [1000, 2], raise_errors=False)
+            assert isinstance(data[1000], APIError) and data[2]["plan"] == "mock"
+            with pytest.raises(APIError):
+                await load_accounts_data(session, [1000], batch_size=10)
+
+
+@pytest.mark.asyncio
+async def test_account_list_cache():
+    """ Test that the cached account list isn't searched again until it's expired """
+    async with MockServer(resources=3, areas=0) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            cache = AccountDataCache(ttl=60)
+            data = await load_accounts_data(session, cache=cache)
+            searches = server.requests["core/search_items"]
+            assert await load_accounts_data(session, cache=cache) == data
+            assert server.requests["core/search_items"] == searches
+            assert cache.get_account_ids(session.user_id) == list(data)
+            cache.ttl = -1
+            await load_accounts_data(session, cache=cache)
+            assert server.requests["core/search_items"] == searches + 1
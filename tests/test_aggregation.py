@@ -0,0 +1,183 @@
+import sqlite3
+import numpy as np
+import pytest
+from aiowialon import connect
+from aiowialon.aggregation import (
+    DAY,
+    HOUR,
+    AggregateStore,
+    Aggregator,
+    Bucket,
+    UnitState,
+    ignition_input,
+    rollup,
+    update_aggregates,
+)
+from aiowialon.mock_server import DEFAULT_START_TIME, MockServer
+from aiowialon.utils import distance
+
+START = DEFAULT_START_TIME - DEFAULT_START_TIME % DAY + DAY  # the first whole day
+
+
+def messages(count: int, start: int = START, step: int = 60) -> list:
+    """ Moving north with the ignition on every other hour """
+    return [
+        {
+            "t": start + index * step,
+            "pos": {"y": 55.0 + index * 0.001, "x": 37.0, "s": index % 100},
+            "i": 1 if (index * step // HOUR) % 2 == 0 else 0,
+        }
+        for index in range(count)
+    ]
+
+
+def test_bucket_merge():
+    """ Test that the merged bucket keeps the sums and the maximum """
+    bucket = Bucket(0, 2, 2, 10.0, 50.0, 60.0, 120.0).merge(Bucket(0, 1, 1, 5.0, 70.0, 70.0))
+    assert bucket.as_dict() == {
+        "begin": 0,
+        "messages": 3,
+        "positions": 3,
+        "distance": 15.0,
+        "max_speed": 70.0,
+        "speed_sum": 130.0,
+        "engine_time": 120.0,
+    }
+    assert bucket.avg_speed() == pytest.approx(130 / 3)
+    assert [item.begin for item in rollup([Bucket(HOUR), Bucket(DAY + HOUR)], DAY)] == [0, DAY]
+
+
+def test_aggregator():
+    """ Test the hourly aggregates and the daily rollup """
+    aggregator = Aggregator(ignition=ignition_input(1))
+    aggregator.feed(1, messages(180))
+    hours = aggregator.buckets(1, START, START + DAY)
+    assert [bucket.begin for bucket in hours] == [START, START + HOUR, START + 2 * HOUR]
+    assert [bucket.messages for bucket in hours] == [60, 60, 60]
+    assert hours[0].distance == pytest.approx(59 * distance(55.0, 37.0, 55.001, 37.0), rel=1e-3)
+    assert hours[0].max_speed == 59
+    # The minute before the ignition is switched off is accounted to the next hour
+    assert [bucket.engine_time for bucket in hours] == [59 * 60, 60, 59 * 60]
+    day = aggregator.buckets(1, START, START + DAY, interval=DAY)
+    assert len(day) == 1 and day[0].messages == 180
+    assert day[0].distance == pytest.approx(sum(bucket.distance for bucket in hours))
+    with pytest.raises(ValueError):
+        aggregator.buckets(1, START, START + DAY, interval=HOUR + 1)
+
+
+def test_aggregator_chunks():
+    """ Test that the chunked and the repeated messages give the same aggregates """
+    whole = Aggregator(ignition=ignition_input(1))
+    whole.feed(1, messages(300))
+    chunked = Aggregator(ignition=ignition_input(1))
+    source = messages(300)
+    for index in range(0, 300, 70):
+        chunked.feed(1, source[max(index - 10, 0) : index + 70])
+    expected, result = whole.buckets(1, START, START + DAY), chunked.buckets(1, START, START + DAY)
+    assert [bucket.messages for bucket in result] == [bucket.messages for bucket in expected]
+    for bucket, other in zip(result, expected):
+        assert bucket.distance == pytest.approx(other.distance)
+        assert bucket.engine_time == other.engine_time
+
+
+def test_aggregator_same_second():
+    """ Test the messages of the same second split between the chunks """
+    aggregator = Aggregator()
+    aggregator.feed(1, [{"t": START}, {"t": START + 1}])
+    aggregator.feed(1, [{"t": START + 1}, {"t": START + 2}])
+    assert aggregator.buckets(1, START, START)[0].messages == 4
+    aggregator.feed(1, [{"t": START + 2}] * 3)
+    assert aggregator.state(1).time_count == 4
+    # The overlapping chunk beginning earlier than the last second
+    aggregator.feed(1, [{"t": START + 1}] + [{"t": START + 2}] * 5)
+    assert aggregator.state(1).time_count == 5
+    assert aggregator.buckets(1, START, START)[0].messages == 8
+
+
+def test_aggregator_without_positions():
+    """ Test that the engine hours include the messages without the position """
+    aggregator = Aggregator(ignition=ignition_input(1))
+    source = messages(3, step=300)
+    aggregator.feed(1, source[:1])
+    aggregator.feed(1, [{"t": START + 100, "i": 1}, {"t": START + 200, "i": 0}])
+    aggregator.feed(1, source[1:])
+    bucket = aggregator.buckets(1, START, START)[0]
+    assert (bucket.messages, bucket.positions, bucket.engine_time) == (5, 3, 500)
+    assert bucket.distance == pytest.approx(2 * distance(55.0, 37.0, 55.001, 37.0), rel=1e-3)
+
+
+def test_aggregate_store(tmp_path):
+    """ Test that the aggregation is continued after the reopening of the store """
+    path, source = str(tmp_path / "aggregates.sqlite"), messages(240)
+    with AggregateStore(path) as store:
+        aggregator = Aggregator(store=store)
+        aggregator.feed(1, source[:100])
+        aggregator.flush()
+        assert not aggregator.pending
+    with AggregateStore(path) as store:
+        aggregator = Aggregator(store=store)
+        assert aggregator.state(1).time == source[99]["t"]
+        aggregator.feed(1, source[90:])
+        assert aggregator.buckets(1, START, START + DAY, DAY)[0].messages == 240
+        aggregator.flush()
+        hours = store.buckets(1, HOUR, START, START + DAY)
+        assert [bucket.messages for bucket in hours] == [60, 60, 60, 60]
+        total = sum(bucket.distance for bucket in hours)
+        assert total == pytest.approx(239 * distance(55.0, 37.0, 55.001, 37.0), rel=1e-3)
+
+
+def test_aggregate_store_upgrade(tmp_path):
+    """ Test the store created before the messages of the same second were counted """
+    path = str(tmp_path / "aggregates.sqlite")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE states (unit INTEGER NOT NULL, interval INTEGER NOT NULL, "
+        "time INTEGER NOT NULL, position_time INTEGER, latitude REAL, longitude REAL, "
+        "ignition INTEGER NOT NULL, PRIMARY KEY (unit, interval))"
+    )
+    connection.execute("INSERT INTO states VALUES (1, ?, ?, NULL, NULL, NULL, 0)", (HOUR, START))
+    connection.commit()
+    connection.close()
+    with AggregateStore(path) as store:
+        assert store.state(1, HOUR) == UnitState(START, None, None, None, False, 1)
+        aggregator = Aggregator(store=store)
+        aggregator.feed(1, [{"t": START - 1}, {"t": START}, {"t": START}])
+        aggregator.flush()
+        assert store.state(1, HOUR).time_count == 2
+        assert store.buckets(1, HOUR, START, START)[0].messages == 1
+
+
+@pytest.mark.asyncio
+async def test_update_aggregates_same_second():
+    """ Test that the reloaded messages of the last aggregated second are skipped by index """
+    async with MockServer(units=1, messages=5) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            times = [START, START + 1, START + 1, START + 1, START + 2]
+            server.fleet.track(1000)["t"] = np.array(times)
+            aggregator = Aggregator()
+            await update_aggregates(session, aggregator, [1000], START, START + 1, chunk_size=2)
+            assert aggregator.state(1000).time_count == 3
+            await update_aggregates(session, aggregator, [1000], START, START + 2, chunk_size=1)
+            assert aggregator.buckets(1000, START, START)[0].messages == 5
+
+
+@pytest.mark.asyncio
+async def test_update_aggregates(tmp_path):
+    """ Test the incremental aggregation of the loaded messages """
+    async with MockServer(units=2, messages=7200) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            with AggregateStore(str(tmp_path / "aggregates.sqlite")) as store:
+                aggregator = Aggregator(store=store, ignition=ignition_input(2))
+                end = DEFAULT_START_TIME + 3599
+                await update_aggregates(
+                    session, aggregator, [1000, 1001], DEFAULT_START_TIME, end, chunk_size=1000
+                )
+                loads = server.requests["messages/load_interval"]
+                await update_aggregates(session, aggregator, [1000, 1001], DEFAULT_START_TIME, end)
+                assert server.requests["messages/load_interval"] == loads
+                await update_aggregates(
+                    session, aggregator, [1000], DEFAULT_START_TIME, DEFAULT_START_TIME + 7199
+                )
+                day = aggregator.buckets(1000, DEFAULT_START_TIME, end + 3600, DAY)
+                assert sum(bucket.messages for bucket in day) == 7200
+                assert sum(bucket.engine_time for bucket in day) > 0
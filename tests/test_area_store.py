@@ -0,0 +1,72 @@
+import json
+import sqlite3
+import pytest
+from aiowialon import connect
+from aiowialon.area_store import AreaStore, area_marker, sync_areas
+from aiowialon.mock_server import MockServer
+from aiowialon.resources import AreaFlags
+
+AREA = {"id": 1, "rid": 10, "n": "Circle", "d": "", "t": 3, "p": [{"x": 37.6, "y": 55.7, "r": 50}]}
+
+
+def test_area_marker():
+    """ Test that the modification time is used as the marker if it's available """
+    assert area_marker({"id": 1, "mt": 1600000000}) == "1600000000"
+    assert area_marker({"id": 1, "n": "a"}) != area_marker({"id": 1, "n": "b"})
+
+
+def test_area_store(tmp_path):
+    """ Test the area store update, persistence and removal """
+    path = str(tmp_path / "areas.sqlite")
+    with AreaStore(path) as store:
+        store.update([("1", AREA)])
+    with AreaStore(path) as store:
+        assert store.markers() == {(10, 1): "1"}
+        area = store.areas()[0]
+        assert area.is_circle() and area.radius() == 50
+        store.remove([(10, 1)])
+        assert len(store) == 0
+
+
+def test_area_store_upgrade(tmp_path):
+    """ Test that the store created without the flags column is upgraded """
+    path = str(tmp_path / "areas.sqlite")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE areas (rid INTEGER NOT NULL, id INTEGER NOT NULL, marker TEXT NOT NULL, "
+        "data TEXT NOT NULL, PRIMARY KEY (rid, id))"
+    )
+    connection.execute("INSERT INTO areas VALUES (10, 1, '1', ?)", (json.dumps(AREA),))
+    connection.commit()
+    connection.close()
+    with AreaStore(path) as store:
+        assert store.flags() == {(10, 1): 0}
+        assert store.areas()[0].radius() == 50
+
+
+@pytest.mark.asyncio
+async def test_sync_areas(session, tmp_path):
+    """ Test that the second synchronization doesn't reload unchanged areas """
+    with AreaStore(str(tmp_path / "areas.sqlite")) as store:
+        result = await sync_areas(session, store)
+        assert len(result.added) == len(store) > 0
+        result = await sync_areas(session, store)
+        assert not result.added and not result.updated and not result.removed
+
+
+@pytest.mark.asyncio
+async def test_sync_areas_flags(tmp_path):
+    """ Test that the areas stored with the other detail flags are reloaded """
+    async with MockServer(units=1, resources=1, areas=5) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            with AreaStore(str(tmp_path / "areas.sqlite")) as store:
+                result = await sync_areas(session, store)
+                assert len(result.added) == 5
+                assert set(store.flags().values()) == {AreaFlags.BASE.value}
+                result = await sync_areas(session, store)
+                assert not result.updated
+                result = await sync_areas(session, store, flags=[AreaFlags.BASE, AreaFlags.POINTS])
+                assert len(result.updated) == 5
+                assert set(store.flags().values()) == {0x18}
+                result = await sync_areas(session, store, flags=[AreaFlags.POINTS, AreaFlags.BASE])
+                assert not result.updated
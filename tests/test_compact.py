@@ -0,0 +1,59 @@
+import pickle
+import tracemalloc
+import pytest
+from aiowialon import connect
+from aiowialon.compact import CompactParameters, ParameterSchema
+from aiowialon.messages import load_messages
+from aiowialon.mock_server import DEFAULT_START_TIME, MockServer
+
+
+def test_compact_parameters():
+    """ Test the mapping behaviour and the layout interning """
+    schema = ParameterSchema()
+    first = schema.compact({"io": 1, "adc1": 0.5})
+    second = schema.compact({"io": 0, "adc1": 1.5})
+    other = schema.compact({"pwr_ext": 12000})
+    assert first == {"io": 1, "adc1": 0.5} and dict(second) == {"io": 0, "adc1": 1.5}
+    assert first.layout is second.layout and other.layout is not first.layout
+    assert first.get("pwr_ext") is None and "io" in first and len(other) == 1
+    assert list(schema.keys()) == ["io", "adc1", "pwr_ext"]
+    assert schema.compact(None) is None and schema.compact(first) is first
+    assert pickle.loads(pickle.dumps(first)) == first
+    with pytest.raises(KeyError):
+        other["io"]  # pylint: disable=pointless-statement
+
+
+def test_compact_memory():
+    """ Test that the compact parameters take less memory than the dictionaries """
+    keys = ["io_1", "io_2", "adc1", "adc2", "pwr_ext", "pwr_int", "gsm", "hdop"]
+
+    def allocated(convert):
+        tracemalloc.start()
+        snapshot = tracemalloc.take_snapshot()
+        result = [convert({key: index for key in keys}) for index in range(10000)]
+        size = sum(
+            stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, "filename")
+        )
+        tracemalloc.stop()
+        assert len(result) == 10000
+        return size
+
+    assert allocated(ParameterSchema().compact) < allocated(dict) * 0.7
+
+
+@pytest.mark.asyncio
+async def test_load_compact_messages():
+    """ Test that the compact messages are the same as the regular ones """
+    async with MockServer(units=1, messages=100) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            end = DEFAULT_START_TIME + 99
+            kwargs = dict(include_sensor_data=True)
+            messages = await load_messages(session, 1000, DEFAULT_START_TIME, end, **kwargs)
+            schema = ParameterSchema()
+            compact = await load_messages(
+                session, 1000, DEFAULT_START_TIME, end, schema=schema, **kwargs
+            )
+            assert isinstance(compact[0]["p"], CompactParameters)
+            assert isinstance(compact[0]["sensors_data"], CompactParameters)
+            assert compact == messages
+            assert len(schema.layouts) == 2
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from aiowialon.export import ARROW, BINARY, PARQUET, MessageWriter, read_messages
+
+MESSAGES = [
+    {"t": 100, "f": 1, "i": 0, "o": 0, "pos": {"y": 55.7, "x": 37.6, "s": 10}, "p": {"adc1": 1.5}},
+    {"t": 200, "f": 1, "i": 1, "o": None, "pos": None, "p": {"adc1": "text"}},
+    {"t": 300, "f": 1, "i": 0, "o": 0, "pos": {"y": 55.8, "x": 37.5, "s": 0}, "p": {}},
+]
+
+
+@pytest.mark.parametrize("file_format", [BINARY, ARROW, PARQUET])
+def test_export_and_read(tmp_path, file_format):
+    """ Test that the chunked export can be read back with the filters """
+    if file_format != BINARY:
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / "messages.data")
+    with MessageWriter(path, file_format=file_format, parameters=["adc1"]) as writer:
+        writer.write(1, MESSAGES[:2])
+        writer.write(1, MESSAGES[2:])
+        writer.write(2, MESSAGES)
+        assert writer.count == 6
+
+    columns = read_messages(path)
+    assert list(columns["unit"]) == [1, 1, 1, 2, 2, 2]
+    assert columns["outputs"][1] == -1
+    assert np.isnan(columns["latitude"][1]) and columns["latitude"][2] == 55.8
+
+    columns = read_messages(path, unit_id=2, begin_time=150, end_time=300)
+    assert list(columns["time"]) == [200, 300]
+    assert np.isnan(columns["p_adc1"]).all()
+    assert read_messages(path, unit_id=1)["p_adc1"][0] == 1.5
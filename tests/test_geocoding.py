@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+from aiowialon import connect
+from aiowialon.geocoding import Geocoder
+from aiowialon.mock_server import MockServer
+from aiowialon.utils import distance
+
+
+@pytest.mark.asyncio
+async def test_geocoder(tmp_path):
+    """ Test the cell tolerance, batching, deduplication and the persistent cache """
+    cache_path = str(tmp_path / "geocode.json")
+    async with MockServer(units=1) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            async with Geocoder(
+                session, tolerance=20, batch_size=3, url=server.geocode_url, cache_path=cache_path
+            ) as geocoder:
+                points = [(55.75 + index * 0.001, 37.62) for index in range(5)]
+                for latitude, longitude in points:
+                    center = geocoder.center(geocoder.cell(latitude, longitude))
+                    assert distance(latitude, longitude, *center) <= 20
+                results = await asyncio.gather(
+                    geocoder.addresses(points),
+                    geocoder.addresses(points[::-1]),
+                    geocoder.address(55.75, 37.62),
+                )
+                assert results[0] == results[1][::-1]
+                assert results[2] == results[0][0]
+                assert server.requests["gis_geocode"] == 2
+                assert await geocoder.address(55.75, 37.62001) == results[2]
+                assert server.requests["gis_geocode"] == 2
+
+            with pytest.raises(ValueError):
+                Geocoder(session, tolerance=0)
+            async with Geocoder(
+                session, tolerance=20, url=server.geocode_url, cache_path=cache_path
+            ) as geocoder:
+                assert await geocoder.addresses(points) == results[0]
+                assert server.requests["gis_geocode"] == 2
+
+
+@pytest.mark.asyncio
+async def test_geocoder_cancellation():
+    """ Test that the cancelled caller doesn't cancel the shared lookup of the others """
+    async with MockServer(units=1, method_latency={"gis_geocode": 0.05}) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            async with Geocoder(session, url=server.geocode_url) as geocoder:
+                first = asyncio.ensure_future(geocoder.address(55.75, 37.62))
+                second = asyncio.ensure_future(geocoder.address(55.75, 37.62))
+                await asyncio.sleep(0.02)
+                first.cancel()
+                assert await second == await geocoder.address(55.75, 37.62)
+                assert first.cancelled()
+                assert server.requests["gis_geocode"] == 1
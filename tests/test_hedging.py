@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+from aiowialon import connect
+from aiowialon.hedging import Hedging
+from aiowialon.mock_server import MockServer
+
+
+@pytest.mark.asyncio
+async def test_hedged_request():
+    """ Test that the slow request is duplicated and the fast duplicate wins """
+    hedging = Hedging(percentile=0.5, budget=0.25, min_samples=4)
+    delays = [0.01] * 4 + [0.2, 0.01, 0.2, 0.2]
+    cancelled = []
+
+    async def request():
+        delay = delays.pop(0)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return delay
+
+    for _ in range(4):
+        await hedging.run("core/search_items", request)
+    assert hedging.delay("core/search_items") == pytest.approx(0.01, abs=0.01)
+    assert await hedging.run("core/search_items", request) == 0.01
+    await asyncio.sleep(0)
+    assert cancelled == [0.2]
+    assert (hedging.hedged, hedging.hedge_wins) == (1, 1)
+    # The cancelled primary request is recorded instead of the faster duplicate
+    latencies = hedging.latencies["core/search_items"]
+    assert len(latencies) == 5 and latencies[-1] >= 0.015
+
+    # The budget is exhausted, the request isn't duplicated
+    assert await hedging.run("core/search_items", request) == 0.2
+    assert hedging.hedged == 1
+    assert await hedging.run("messages/load_interval", request) == 0.2
+    assert hedging.calls == 6
+
+
+@pytest.mark.asyncio
+async def test_session_hedging():
+    """ Test the hedging of the session calls """
+    hedging = Hedging(min_samples=5)
+    async with MockServer(units=1) as server:
+        async with connect(server.token, api_host=server.url, hedging=hedging) as session:
+            for _ in range(10):
+                await session.call("core/search_item", {"id": 1000})
+            assert hedging.calls == 10
+            assert len(hedging.latencies["core/search_item"]) == 10
+            assert server.requests["core/search_item"] == 10 + hedging.hedged
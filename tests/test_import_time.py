@@ -0,0 +1,48 @@
+import json
+import pkgutil
+import subprocess
+import sys
+import aiowialon
+
+HEAVY_MODULES = ["aiohttp", "numpy", "shapely", "yaml", "pyarrow"]
+
+# The modules built on the heavy dependencies, the rest of the modules import them lazily
+ALLOWED_DEPENDENCIES = {
+    "aiowialon.aggregation": {"numpy"},
+    "aiowialon.export": {"numpy"},
+    "aiowialon.mock_server": {"aiohttp", "numpy"},
+    "aiowialon.offload": {"numpy", "shapely"},
+    "aiowialon.sensors": {"numpy"},
+    "aiowialon.simplify": {"numpy"},
+    "aiowialon.trips": {"numpy"},
+}
+
+
+def package_modules() -> list:
+    """ Get all the package modules including the command line scripts """
+    modules = ["aiowialon", "aiowialon.bin.wialon_query"]
+    modules.extend(
+        module.name for module in pkgutil.walk_packages(aiowialon.__path__, prefix="aiowialon.")
+    )
+    return sorted(set(modules))
+
+
+def test_lazy_imports():
+    """ Test that every module imports only the heavy dependencies it's built on """
+    code = (
+        "import importlib, json, sys\n"
+        "importlib.import_module(sys.argv[1])\n"
+        f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))"
+    )
+    imported = {}
+    for module in package_modules():
+        output = subprocess.run(
+            [sys.executable, "-c", code, module], stdout=subprocess.PIPE, text=True, check=True
+        ).stdout
+        imported[module] = set(json.loads(output))
+    assert {
+        module: dependencies - ALLOWED_DEPENDENCIES.get(module, set())
+        for module, dependencies in imported.items()
+        if dependencies - ALLOWED_DEPENDENCIES.get(module, set())
+    } == {}
+    assert "aiowialon.geocoding" in imported and "aiowialon.pipeline" in imported
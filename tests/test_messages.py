@@ -1,8 +1,12 @@
+import asyncio
 from datetime import datetime, timedelta
 
 import pytest
-from aiowialon.messages import load_messages, get_messages_count
+from aiowialon import connect
+from aiowialon.messages import get_messages_count, iterate_messages, load_messages
+from aiowialon.mock_server import DEFAULT_START_TIME, MockServer
 from aiowialon.units import load_units
+from aiowialon.utils import aclosing
 
 
 @pytest.mark.asyncio
@@ -35,3 +39,44 @@ async def test_load_messages(session):
             at_least_one_unit_has_messages = True
             break
     assert at_least_one_unit_has_messages
+
+
+@pytest.mark.asyncio
+async def test_concurrent_message_loading():
+    """ Test that the concurrent iterations with the same session don't mix the units """
+    async with MockServer(units=2, messages=600) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            end = DEFAULT_START_TIME + 599
+
+            async def unit_messages(unit_id):
+                result = []
+                async for messages in iterate_messages(
+                    session, unit_id, DEFAULT_START_TIME, end, chunk_size=100
+                ):
+                    result.extend(messages)
+                    await asyncio.sleep(0)
+                return result
+
+            first, second, loaded = await asyncio.gather(
+                unit_messages(1000),
+                unit_messages(1001),
+                load_messages(session, 1001, DEFAULT_START_TIME, end),
+            )
+            assert first == server.fleet.messages(1000, DEFAULT_START_TIME, end)
+            assert second == loaded == server.fleet.messages(1001, DEFAULT_START_TIME, end)
+
+
+@pytest.mark.asyncio
+async def test_message_loader_release():
+    """ Test the early iteration exit and the nested loading in the same task """
+    async with MockServer(units=1, messages=600) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            end = DEFAULT_START_TIME + 599
+            chunks = iterate_messages(session, 1000, DEFAULT_START_TIME, end, chunk_size=100)
+            async with aclosing(chunks):
+                async for _ in chunks:
+                    with pytest.raises(RuntimeError):
+                        await get_messages_count(session, 1000, DEFAULT_START_TIME, end)
+                    break
+            assert server.requests["messages/unload"] == 1
+            assert await get_messages_count(session, 1000, DEFAULT_START_TIME, end) == 600
@@ -0,0 +1,71 @@
+import pytest
+from aiowialon import connect
+from aiowialon.exceptions import APIError, AuthError
+from aiowialon.messages import load_messages
+from aiowialon.mock_server import DEFAULT_START_TIME, MockServer, sensor_values
+from aiowialon.resources import load_areas, search_areas_by_points
+from aiowialon.sensors import INVALID_VALUE, load_sensor_engine
+from aiowialon.units import load_units
+
+
+@pytest.mark.asyncio
+async def test_mock_session():
+    """ Test the login, item search and batch requests """
+    async with MockServer(units=3, areas=10) as server:
+        with pytest.raises(AuthError):
+            async with connect("invalid", api_host=server.url):
+                pass
+        async with connect(server.token, api_host=server.url) as session:
+            assert len(await load_units(session)) == 3
+            results = await session.batch(
+                [("core/search_items", {"spec": {"itemsType": "avl_unit"}}), ("unknown", {})],
+                raise_errors=False,
+            )
+            assert len(results[0]["items"]) == 3
+            assert isinstance(results[1], APIError) and results[1].code == 2
+        assert server.requests["core/logout"] == 1
+
+
+@pytest.mark.asyncio
+async def test_mock_messages_and_sensors():
+    """ Test the messages loading and the local sensors match the server ones """
+    async with MockServer(units=1, messages=3600) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            unit_id = (await load_units(session))[0]["id"]
+            begin, end = DEFAULT_START_TIME, DEFAULT_START_TIME + 3599
+            remote = await load_messages(session, unit_id, begin, end, include_sensor_data=True)
+            assert len(remote) == 3600
+            engine = await load_sensor_engine(session, unit_id)
+            calculations = server.requests["unit/calc_sensors"]
+            local = await load_messages(session, unit_id, begin, end, sensor_engine=engine)
+            assert server.requests["unit/calc_sensors"] == calculations
+            assert {item["sensors_data"]["2"] for item in remote} == {0.0, 1.0}
+            for remote_message, local_message in zip(remote, local):
+                for sensor_id, value in remote_message["sensors_data"].items():
+                    assert local_message["sensors_data"][sensor_id] == pytest.approx(value)
+
+
+def test_mock_sensor_values():
+    """ Test the server style sensor values the local calculation is checked against """
+    assert sensor_values({"p": {"pwr_ext": 12500, "adc1": 2.5, "io": 2}}) == {
+        "1": 12.5,
+        "2": 1.0,
+        "3": 25.0,
+    }
+    assert sensor_values({"p": {"pwr_ext": 12000, "adc1": 6, "io": 3}})["3"] == 58
+    assert sensor_values({"p": {"pwr_ext": 12000, "adc1": 6, "io": 1}})["3"] == INVALID_VALUE
+
+
+@pytest.mark.asyncio
+async def test_mock_areas():
+    """ Test the areas loading and the server point search """
+    async with MockServer(resources=2, areas=20) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            areas = await load_areas(session, chunk_size=7)
+            assert len(areas) == 40
+            own = [area for area in areas if area.resource_id() == session.account_id]
+            points = [area.location() if area.is_circle() else area.points()[0] for area in own]
+            found = await search_areas_by_points(session, points, batch_size=4)
+            for area, result in zip(own, found):
+                if area.is_circle():
+                    assert area.id() in [item["id"] for item, _ in result]
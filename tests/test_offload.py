@@ -0,0 +1,71 @@
+import asyncio
+import time
+import numpy as np
+import pytest
+from aiowialon.offload import Offload
+from aiowialon.resources import build_area
+from aiowialon.utils import distance
+
+AREAS = [
+    build_area(
+        {
+            "id": 1,
+            "rid": 10,
+            "n": "Square",
+            "d": "",
+            "t": 2,
+            "p": [{"x": 0, "y": 0}, {"x": 1, "y": 0}, {"x": 1, "y": 1}, {"x": 0, "y": 1}],
+        }
+    ),
+    build_area(
+        {"id": 2, "rid": 10, "n": "Circle", "d": "", "t": 3, "p": [{"x": 1, "y": 1, "r": 50000}]}
+    ),
+]
+
+POINTS = [(0.5, 0.5), (1.1, 1.1), (2, 2), (0.9, 0.95), (-1, 0.5)]
+
+
+@pytest.mark.asyncio
+async def test_offload_contains():
+    """ Test that the pool calculation returns the same result as the inline one """
+    expected = [[area.id() for area in AREAS if area.contains(*point)] for point in POINTS]
+    assert expected == [[1], [2], [], [1, 2], []]
+    async with Offload(max_workers=2, chunk_size=2, inline_limit=0) as offload:
+        assert await offload.contains(AREAS, POINTS) == expected
+
+
+@pytest.mark.asyncio
+async def test_offload_distances():
+    """ Test the chunked distance calculation """
+    expected = [distance(*POINTS[i], *POINTS[i + 1]) for i in range(len(POINTS) - 1)]
+    async with Offload(max_workers=2, chunk_size=2, inline_limit=0) as offload:
+        assert np.allclose(await offload.distances(POINTS), expected)
+
+
+@pytest.mark.asyncio
+async def test_offload_sensors():
+    """ Test the sensor calculation in the pool """
+    sensors = {"1": {"id": 1, "n": "Voltage", "p": "pwr_ext/1000"}}
+    messages = [{"t": t, "p": {"pwr_ext": 12000 + t}} for t in range(5)]
+    async with Offload(max_workers=2, chunk_size=2, inline_limit=0) as offload:
+        result = await offload.calculate_sensors(sensors, messages)
+    assert [item["1"] for item in result] == pytest.approx([12, 12.001, 12.002, 12.003, 12.004])
+
+
+@pytest.mark.asyncio
+async def test_offload_exit():
+    """ Test that the pool shutdown waits for the running task without blocking the loop """
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async with Offload(max_workers=1) as offload:
+        task = asyncio.ensure_future(offload.run(time.sleep, 0.3))
+        await asyncio.sleep(0.1)  # the worker process is started
+        ticking = asyncio.ensure_future(ticker())
+    ticking.cancel()
+    assert await task is None
+    assert len(ticks) > 5
@@ -0,0 +1,115 @@
+import asyncio
+import time
+import pytest
+from aiowialon.pipeline import Pipeline, Stage
+
+
+async def delayed(item):
+    """ Network bound stage: the later items are faster """
+    await asyncio.sleep(0.01 * (5 - item % 5))
+    return item
+
+
+async def repeat(item):
+    """ Fan-out stage """
+    for _ in range(item % 3):
+        await asyncio.sleep(0)
+        yield item
+
+
+def square(item):
+    """ CPU bound stage """
+    time.sleep(0.001)
+    return item * item
+
+
+@pytest.mark.asyncio
+async def test_ordered_pipeline():
+    """ Test the ordered delivery through the coroutine, generator and executor stages """
+    pipeline = Pipeline(
+        range(20),
+        Stage(delayed, concurrency=5),
+        Stage(repeat, concurrency=3),
+        Stage(square, concurrency=2),
+        queue_size=2,
+    )
+    expected = [item * item for item in range(20) for _ in range(item % 3)]
+    assert await pipeline.collect() == expected
+    stats = pipeline.stats()
+    assert stats["delayed"]["items_in"] == 20
+    assert stats["repeat"]["items_out"] == len(expected)
+    assert stats["square"]["throughput"] > 0
+
+
+@pytest.mark.asyncio
+async def test_unordered_pipeline_and_failure():
+    """ Test the unordered delivery, overlap and the error propagation """
+
+    async def source():
+        for item in range(10):
+            yield item
+
+    started = time.monotonic()
+    results = await Pipeline(source(), Stage(delayed, concurrency=10, ordered=False)).collect()
+    assert sorted(results) == list(range(10))
+    assert results != list(range(10))
+    assert time.monotonic() - started < 0.1
+
+    processed = []
+
+    async def fail(item):
+        if item == 3:
+            raise ValueError(item)
+        await asyncio.sleep(0.01)
+        processed.append(item)
+        return item
+
+    pipeline = Pipeline(range(100), Stage(fail, concurrency=2), Stage(delayed))
+    with pytest.raises(ValueError):
+        await pipeline.run()
+    assert len(processed) < 10
+
+    with pytest.raises(ValueError):
+        Stage(fail, concurrency=0)
+
+
+@pytest.mark.asyncio
+async def test_unordered_to_ordered_stage():
+    """ Test the concurrent unordered workers feeding the ordered stage through the small queue """
+
+    async def fast(item):
+        await asyncio.sleep(0)
+        return item
+
+    async def slow(item):
+        await asyncio.sleep(0.001)
+        return item
+
+    pipeline = Pipeline(
+        range(50),
+        Stage(fast, concurrency=4, ordered=False),
+        Stage(slow, concurrency=2),
+        queue_size=1,
+    )
+    assert sorted(await asyncio.wait_for(pipeline.collect(), 5)) == list(range(50))
+
+
+@pytest.mark.asyncio
+async def test_ordered_stage_buffer():
+    """ Test that the ordered stage doesn't buffer more outputs than the queue size """
+    buffered = []
+
+    async def pages(item):
+        for page in range(20 if item else 1):
+            if item:
+                buffered.append(page)
+            else:
+                await asyncio.sleep(0.05)
+            yield item, page
+
+    pipeline = Pipeline(range(2), Stage(pages, concurrency=2), queue_size=4)
+    results = pipeline.__aiter__()
+    assert await results.__anext__() == (0, 0)
+    await asyncio.sleep(0.01)
+    assert len(buffered) <= 4 + 1
+    assert [item async for item in results] == [(1, page) for page in range(20)]
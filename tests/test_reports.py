@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from aiowialon import connect
+from aiowialon.exceptions import ReportError
+from aiowialon.mock_server import DEFAULT_START_TIME, MockServer
+from aiowialon.reports import ReportPool, execute_report, load_report_templates
+
+HOUR = DEFAULT_START_TIME - DEFAULT_START_TIME % 3600 + 3600  # the first whole hour
+
+
+@pytest.mark.asyncio
+async def test_execute_report():
+    """ Test the remote report execution, paged rows and the result cleanup """
+    async with MockServer(units=1, messages=10800) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            template = (await load_report_templates(session))[0]
+            assert template["rid"] == session.account_id
+            async with execute_report(
+                session,
+                template["rid"],
+                template["id"],
+                1000,
+                HOUR,
+                HOUR + 7199,
+                poll_interval=0.01,
+            ) as report:
+                assert report.tables[0]["rows"] == 2
+                pages = [rows async for rows in report.rows(0, page_size=1, subrows=True)]
+                assert [len(rows) for rows in pages] == [1, 1]
+                assert [len(rows[0]["r"]) for rows in pages] == [6, 6]
+                assert sum(int(rows[0]["c"][1]) for rows in pages) == 7200
+            assert not server.reports
+            with pytest.raises(ReportError):
+                async with execute_report(
+                    session, template["rid"], template["id"], 1000, 0, 1, timeout=0
+                ):
+                    pass
+            assert not server.reports
+
+
+@pytest.mark.asyncio
+async def test_report_pool():
+    """ Test the parallel report execution over the session pool """
+    async with MockServer(units=4, messages=7200) as server:
+        sessions = [connect(server.token, api_host=server.url) for _ in range(2)]
+        for session in sessions:
+            await session.__aenter__()
+        try:
+            pool = ReportPool(sessions)
+
+            async def unit_report(unit_id):
+                async with pool.execute(
+                    server.fleet.user["bact"],
+                    1,
+                    unit_id,
+                    HOUR,
+                    HOUR + 3599,
+                    poll_interval=0.01,
+                ) as report:
+                    pages = [rows async for rows in report.rows(0)]
+                    return [row for rows in pages for row in rows]
+
+            results = await asyncio.gather(*map(unit_report, server.fleet.units))
+            assert [len(rows) for rows in results] == [1] * 4
+            assert server.requests["report/exec_report"] == 4
+        finally:
+            for session in sessions:
+                await session.__aexit__(None, None, None)
+
+
+def test_report_pool_queue():
+    """ Test that the free session queue is created in the running loop """
+    pool = ReportPool(["first", "second"])
+    assert pool.queue is None
+
+    async def take():
+        return await pool.free_sessions().get()
+
+    assert asyncio.run(take()) == "first"
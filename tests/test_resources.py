@@ -1,5 +1,15 @@
 import pytest
-from aiowialon.resources import load_areas_raw, get_areas_detail_raw, get_area_detail
+from aiowialon import connect
+from aiowialon.mock_server import MockServer
+from aiowialon.resources import (
+    build_area,
+    load_areas,
+    load_areas_raw,
+    get_areas_detail_raw,
+    get_area_detail,
+    search_areas_by_point,
+    search_areas_by_points,
+)
 
 
 @pytest.mark.asyncio
@@ -35,3 +45,84 @@ async def test_get_area_detail(session):
     area = (await load_areas_raw(session))[0]
     detail = await get_area_detail(session, area["rid"], area["id"])
     assert detail
+
+
+@pytest.mark.asyncio
+async def test_load_areas_raw_detail_chunked(session):
+    """ Test that chunked detail loading returns the same areas as the area list """
+    areas = await load_areas_raw(session)
+    detail = await load_areas_raw(session, load_detail=True, chunk_size=2, concurrency=2)
+    assert sorted(area["id"] for area in detail) == sorted(area["id"] for area in areas)
+
+
+def test_compact_area():
+    """ Test that the area accessors work without the raw area data """
+    polygon = build_area(
+        {
+            "id": 1,
+            "rid": 10,
+            "n": "Square",
+            "d": "",
+            "t": 2,
+            "p": [{"x": 0, "y": 0}, {"x": 1, "y": 0}, {"x": 1, "y": 1}, {"x": 0, "y": 1}],
+        },
+        keep_data=False,
+    )
+    assert polygon.data is None
+    assert polygon.name() == "Square" and polygon.resource_id() == 10
+    assert polygon.points() == [(0, 0), (0, 1), (1, 1), (1, 0)]
+    assert polygon.points()[-1] == (1, 0)
+    assert polygon.contains(0.5, 0.5) and not polygon.contains(1.5, 0.5)
+    assert not hasattr(polygon, "__dict__")
+
+    circle = build_area(
+        {"id": 2, "rid": 10, "n": "Circle", "d": "", "t": 3, "p": [{"x": 1, "y": 2, "r": 100}]},
+        keep_data=False,
+    )
+    assert circle.location() == (2, 1) and circle.radius() == 100
+    assert circle.contains(2, 1) and not circle.contains(3, 1)
+
+
+@pytest.mark.asyncio
+async def test_search_areas_by_points(session):
+    """ Test that the batch search returns the same areas as the single point search """
+    area = build_area((await load_areas_raw(session, load_detail=True))[0])
+    if area.is_circle():
+        point = area.location()
+    else:
+        point = area.points()[0]
+    single = await search_areas_by_point(session, *point, resource=area.resource_id())
+    batch = await search_areas_by_points(
+        session, [point, (0, 0), point], resource=area.resource_id(), batch_size=2
+    )
+    assert len(batch) == 3
+    assert batch[0] == batch[2]
+    assert sorted(item["id"] for item, _ in batch[0]) == sorted(item["id"] for item, _ in single)
+
+
+@pytest.mark.asyncio
+async def test_search_areas_by_points_offline():
+    """ Test the batch packing, the repeated points and the order of the batch search """
+    async with MockServer(resources=1, areas=20) as server:
+        async with connect(server.token, api_host=server.url) as session:
+            areas = [area for area in await load_areas(session) if area.is_circle()][:3]
+            points = [area.location() for area in areas]
+            points = [points[0], (0, 0), points[1], points[0], points[2], (0, 0)]
+            single = [await search_areas_by_point(session, *point) for point in points]
+            searched = []
+            search = server.handlers["resource/get_zones_by_point"]
+
+            def counted_search(params, sid):
+                searched.append((params["spec"]["lat"], params["spec"]["lon"]))
+                return search(params, sid)
+
+            server.handlers["resource/get_zones_by_point"] = counted_search
+            batch = await search_areas_by_points(session, points, batch_size=2)
+            assert searched == list(dict.fromkeys(points))
+            assert server.requests["core/batch"] == 2
+            for result, expected in zip(batch, single):
+                assert sorted(result, key=lambda item: item[0]["id"]) == sorted(
+                    expected, key=lambda item: item[0]["id"]
+                )
+            assert areas[0].id() in [item["id"] for item, _ in batch[3]]
+            assert batch[1] == batch[5] == []
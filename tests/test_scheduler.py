@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from aiowialon import connect
+from aiowialon.mock_server import MockServer
+from aiowialon.scheduler import BULK, INTERACTIVE, NORMAL, Scheduler, request_priority
+
+
+@pytest.mark.asyncio
+async def test_weighted_fair_queuing():
+    """ Test the priority order and the tag shares of the dispatched requests """
+    scheduler = Scheduler(max_concurrency=1, weights={"a": 2})
+    await scheduler.acquire()
+    order = []
+
+    async def request(priority, tag):
+        await scheduler.acquire(priority, tag)
+        order.append((priority, tag))
+        scheduler.release(priority)
+
+    tasks = [asyncio.ensure_future(request(NORMAL, tag)) for tag in "aaaabb"]
+    tasks.append(asyncio.ensure_future(request(BULK, "a")))
+    tasks.append(asyncio.ensure_future(request(INTERACTIVE, "b")))
+    cancelled = asyncio.ensure_future(request(NORMAL, "b"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    assert [tag for _, tag in order] == ["b", "a", "a", "b", "a", "a", "b", "a"]
+    assert [priority for priority, _ in order] == [INTERACTIVE] + [NORMAL] * 6 + [BULK]
+    assert scheduler.stats()[NORMAL] == {
+        "active": 0,
+        "queued": 0,
+        "requests": 7,
+        "wait": pytest.approx(scheduler.wait_time[NORMAL] / 7),
+    }
+    with pytest.raises(ValueError):
+        Scheduler(max_concurrency=1, reservations={INTERACTIVE: 2})
+
+
+@pytest.mark.asyncio
+async def test_cancelled_requests_share():
+    """ Test that the tag isn't charged for the cancelled waiting requests """
+    scheduler = Scheduler(max_concurrency=1)
+    await scheduler.acquire()
+    order = []
+
+    async def request(tag):
+        await scheduler.acquire(NORMAL, tag)
+        order.append(tag)
+        scheduler.release()
+
+    timed_out = [asyncio.ensure_future(asyncio.wait_for(request("a"), 0.01)) for _ in range(5)]
+    waiting = asyncio.ensure_future(request("a"))
+    await asyncio.gather(*timed_out, return_exceptions=True)
+    tasks = [asyncio.ensure_future(request(tag)) for tag in "aabb"]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(waiting, *tasks)
+    assert order == ["a", "b", "a", "b", "a"]
+    assert scheduler.stats()[NORMAL]["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_reserved_slots():
+    """ Test that the interactive request isn't delayed by the bulk ones """
+    scheduler = Scheduler(max_concurrency=2, reservations={INTERACTIVE: 1})
+    async with MockServer(units=1, latency=0.02) as server:
+        async with connect(server.token, api_host=server.url, scheduler=scheduler) as session:
+            with request_priority(BULK, tag="backfill"):
+                bulk = asyncio.gather(
+                    *(session.call("core/search_item", {"id": 1000}) for _ in range(20))
+                )
+            await asyncio.sleep(0.03)
+            await session.call("core/search_item", {"id": 1000}, priority=INTERACTIVE)
+            assert not bulk.done()
+            await bulk
+            assert scheduler.stats()[BULK]["requests"] == 20
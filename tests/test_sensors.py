@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import pytest
+from aiowialon.messages import load_messages
+from aiowialon.sensors import INVALID_VALUE, SensorEngine, SensorError, load_sensor_engine
+from aiowialon.units import load_units
+
+SENSORS = {
+    "1": {"id": 1, "n": "Voltage", "p": "pwr_ext/const1000", "tbl": []},
+    "2": {
+        "id": 2,
+        "n": "Fuel",
+        "p": "adc1",
+        "tbl": [{"x": 0, "a": 0, "b": 0}, {"x": 1, "a": 10, "b": 0}, {"x": 5, "a": 5, "b": 25}],
+    },
+    "3": {"id": 3, "n": "Ignition", "p": "io:2", "c": '{"lower_bound": 0, "upper_bound": 1}'},
+    "4": {"id": 4, "n": "Fuel on", "p": "[Fuel]", "vs": 3, "vt": 11},
+    "5": {"id": 5, "n": "Speed x2", "p": "speed * 2 ^ 1"},
+}
+
+MESSAGES = [
+    {"t": 1, "p": {"pwr_ext": 12500, "adc1": 2, "io": 4}, "pos": {"s": 10}},
+    {"t": 2, "p": {"pwr_ext": 12000, "adc1": 6, "io": 0}, "pos": {"s": 0}},
+    {"t": 3, "p": {"adc1": "text"}, "pos": None},
+]
+
+
+def test_sensor_engine():
+    """ Test expressions, calibration tables, bounds and validation """
+    invalid = INVALID_VALUE
+    assert SensorEngine(SENSORS).calculate(MESSAGES) == [
+        {"1": 12.5, "2": 20.0, "3": 1.0, "4": 20.0, "5": 20.0},
+        {"1": 12.0, "2": 55.0, "3": 0.0, "4": invalid, "5": 0.0},
+        {"1": invalid, "2": invalid, "3": invalid, "4": invalid, "5": invalid},
+    ]
+
+
+def test_invalid_sensors():
+    """ Test invalid expressions and circular dependencies """
+    with pytest.raises(SensorError):
+        SensorEngine({"1": {"id": 1, "n": "Bad", "p": "adc1 +* 2 $"}})
+    engine = SensorEngine(
+        {"1": {"id": 1, "n": "A", "p": "[B]"}, "2": {"id": 2, "n": "B", "p": "[A]"}}
+    )
+    with pytest.raises(SensorError):
+        engine.calculate(MESSAGES)
+
+
+def test_accumulating_sensors():
+    """ Test that the sensors of the accumulating types are flagged as invalid """
+    sensors = dict(SENSORS)
+    sensors["6"] = {"id": 6, "n": "Mileage", "t": "mileage", "p": "odo"}
+    sensors["7"] = {"id": 7, "n": "Mileage km", "p": "[Mileage]/const1000"}
+    engine = SensorEngine(sensors)
+    assert engine.unsupported == {6: "mileage"}
+    values = engine.calculate([{"t": 1, "p": {"odo": 1000}}])[0]
+    assert values["6"] == values["7"] == INVALID_VALUE
+    with pytest.raises(SensorError):
+        SensorEngine(sensors, strict=True)
+
+
+@pytest.mark.asyncio
+async def test_local_sensors_match_calc_sensors(session):
+    """ Test that the local sensor values are the same as unit/calc_sensors returns """
+    for unit in await load_units(session):
+        arguments = dict(
+            begin_time=datetime.now() - timedelta(days=1),
+            end_time=datetime.now(),
+            include_sensor_data=True,
+        )
+        remote = await load_messages(session, unit["id"], **arguments)
+        if not remote:
+            continue
+        engine = await load_sensor_engine(session, unit["id"])
+        local = await load_messages(session, unit["id"], sensor_engine=engine, **arguments)
+        for remote_message, local_message in zip(remote, local):
+            for sensor_id, value in remote_message["sensors_data"].items():
+                assert local_message["sensors_data"][sensor_id] == pytest.approx(value)
+        break
@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from aiowialon import connect
+from aiowialon.exceptions import AuthError
+from aiowialon.mock_server import MockServer
+from aiowialon.sid_store import FileSidStore, MemorySidStore
+
+
+def test_file_sid_store(tmp_path):
+    """ Test the session storing, expiration and removal """
+    store = FileSidStore(str(tmp_path))
+    assert store.get("key") is None
+    store.set("key", {"eid": "sid"})
+    assert FileSidStore(str(tmp_path)).get("key") == {"eid": "sid"}
+    assert FileSidStore(str(tmp_path), ttl=-1).get("key") is None
+    store.delete("key")
+    store.delete("key")
+    assert store.get("key") is None
+
+
+@pytest.mark.asyncio
+async def test_session_reuse(tmp_path):
+    """ Test that the shared session is reused without login and logout """
+    store = FileSidStore(str(tmp_path))
+    async with MockServer() as server:
+        for _ in range(3):
+            async with connect(
+                server.token, api_host=server.url, sid_store=store, share_sid=True
+            ) as session:
+                assert session.account_id == server.fleet.user["bact"]
+                await session.call("core/search_item", {"id": 1000, "flags": 1})
+        assert server.requests["token/login"] == 1
+        assert "core/logout" not in server.requests
+
+        # The session which isn't shared can use the stored one but never closes it
+        async with connect(server.token, api_host=server.url, sid_store=store) as session:
+            assert session.restored
+            await session.call("core/search_item", {"id": 1000, "flags": 1})
+        assert "core/logout" not in server.requests
+        assert store.get(session._session_key()) is not None  # pylint: disable=protected-access
+        assert len(server.sessions) == 1
+
+
+@pytest.mark.asyncio
+async def test_private_session(tmp_path):
+    """ Test that the session which isn't shared isn't stored and is closed on exit """
+    store = FileSidStore(str(tmp_path))
+    async with MockServer() as server:
+        async with connect(server.token, api_host=server.url, sid_store=store) as session:
+            assert not session.restored
+            assert store.get(session._session_key()) is None  # pylint: disable=protected-access
+        assert server.requests["core/logout"] == 1
+        async with connect(server.token, api_host=server.url, sid_store=store):
+            pass
+        assert server.requests["token/login"] == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_session_relogin():
+    """ Test that the expired stored session is replaced with the new one """
+    store = MemorySidStore()
+    async with MockServer() as server:
+        async with connect(server.token, api_host=server.url, sid_store=store, share_sid=True):
+            pass
+        server.sessions.clear()
+        async with connect(
+            server.token, api_host=server.url, sid_store=store, share_sid=True
+        ) as session:
+            item = await session.call("core/search_item", {"id": 1000, "flags": 1})
+            assert item["item"]["id"] == 1000
+            assert not session.restored
+        assert server.requests["token/login"] == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_session_concurrent_relogin():
+    """ Test that the concurrent calls with the expired session share the single relogin """
+    store = MemorySidStore()
+    async with MockServer(latency=0.01) as server:
+        async with connect(server.token, api_host=server.url, sid_store=store, share_sid=True):
+            pass
+        server.sessions.clear()
+        async with connect(
+            server.token, api_host=server.url, sid_store=store, share_sid=True
+        ) as session:
+            results = await asyncio.gather(
+                *(
+                    session.call("core/search_item", {"id": unit_id, "flags": 1})
+                    for unit_id in (1000, 1001, 1002, 1003)
+                )
+            )
+            assert [item["item"]["id"] for item in results] == [1000, 1001, 1002, 1003]
+            assert server.requests["token/login"] == 2
+            server.sessions.clear()  # the fresh session is expired, it isn't retried
+            with pytest.raises(AuthError):
+                await session.call("core/search_item", {"id": 1000, "flags": 1})
+        assert server.requests["token/login"] == 2
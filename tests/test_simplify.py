@@ -0,0 +1,64 @@
+import pytest
+from aiowialon.simplify import RADIAL, TrackSimplifier, simplify_track
+
+METERS_PER_DEGREE = 111195.0
+
+
+def message(time, north, east, **kwargs):
+    """ Build the data message with the position shifted from (0, 0) in meters """
+    return {
+        "t": time,
+        "tp": "ud",
+        "pos": {"y": north / METERS_PER_DEGREE, "x": east / METERS_PER_DEGREE, "s": 10},
+        "i": 0,
+        "o": 0,
+        "p": {},
+        **kwargs,
+    }
+
+
+def l_shaped_track():
+    """ 100 m to the north, then 100 m to the east with the 1 m jitter """
+    north = [message(t, t * 10, (t % 2) * 1) for t in range(11)]
+    east = [message(11 + t, 100, 10 + t * 10) for t in range(10)]
+    return north + east
+
+
+def test_douglas_peucker():
+    """ Test that only the corner points are kept """
+    kept = simplify_track(l_shaped_track(), tolerance=5)
+    assert [item["t"] for item in kept] == [0, 10, 20]
+
+
+def test_douglas_peucker_chunked():
+    """ Test that the chunk processing keeps the chunk ends only in addition """
+    track = l_shaped_track()
+    simplifier = TrackSimplifier(tolerance=5)
+    kept = simplifier.feed(track[:7]) + simplifier.feed(track[7:]) + simplifier.finish()
+    assert [item["t"] for item in kept] == [0, 6, 10, 20]
+
+
+def test_radial():
+    """ Test the radial decimation with the time gap """
+    track = [message(t, t, 0) for t in range(100)]
+    kept = simplify_track(track, tolerance=29.9, method=RADIAL)
+    assert [item["t"] for item in kept] == [0, 30, 60, 90, 99]
+    kept = simplify_track(track, tolerance=29.9, method=RADIAL, max_gap=20)
+    assert [item["t"] for item in kept] == [0, 20, 40, 60, 80, 99]
+
+
+@pytest.mark.parametrize("method", ["douglas_peucker", RADIAL])
+def test_keep_important_messages(method):
+    """ Test that the events and parameter changes are kept """
+    track = l_shaped_track()
+    track[3]["i"] = 1
+    track[4]["i"] = 1
+    track[15]["p"] = {"fuel": 10}
+    track[16]["p"] = {"fuel": 10}
+    track.insert(5, {"t": 4.5, "tp": "evt", "pos": None})
+    kept = simplify_track(track, tolerance=500, method=method)
+    assert [item["t"] for item in kept] == [0, 20]
+    kept = simplify_track(
+        track, tolerance=500, method=method, keep_events=True, keep_parameters=["fuel"]
+    )
+    assert [item["t"] for item in kept] == [0, 3, 4.5, 5, 15, 17, 20]
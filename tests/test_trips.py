@@ -0,0 +1,85 @@
+import pickle
+import numpy as np
+from aiowialon.trips import PARKING, STOP, TRIP, TripDetector, detect_trips, distances
+from aiowialon.utils import distance
+
+METERS_PER_DEGREE = 111195.0
+
+
+def track():
+    """ Parking 10 min, trip 10 min, stop 2 min, short halt 20 s, trip 5 min, parking 10 min """
+    speed = np.concatenate(
+        [np.zeros(600), np.full(600, 36), np.zeros(120), np.full(300, 36), np.zeros(20)]
+    )
+    speed = np.concatenate([speed, np.full(300, 36), np.zeros(600)])
+    latitude = np.cumsum(speed / 3.6) / METERS_PER_DEGREE
+    return {
+        "time": np.arange(len(speed), dtype=float) + 1600000000,
+        "latitude": latitude,
+        "longitude": np.zeros(len(speed)),
+        "speed": speed,
+    }
+
+
+def test_distances():
+    """ Test that the distances are the same as utils.distance returns """
+    latitude, longitude = np.array([55.7, 55.8, 56.0]), np.array([37.6, 37.5, 37.9])
+    expected = [distance(55.7, 37.6, 55.8, 37.5), distance(55.8, 37.5, 56.0, 37.9)]
+    assert np.allclose(distances(latitude, longitude), expected)
+
+
+def test_detect_trips():
+    """ Test the segmentation of the whole track """
+    segments = detect_trips(track())
+    assert [segment.kind for segment in segments] == [PARKING, TRIP, STOP, TRIP, PARKING]
+    assert segments[1].duration() == 600
+    assert abs(segments[1].distance - 6000) < 20
+    assert segments[3].duration() == 620
+    assert segments[3].max_speed == 36
+
+
+def test_detect_trips_incrementally():
+    """ Test that the chunked detection returns the same segments """
+    data = track()
+    detector = TripDetector()
+    segments = []
+    for start in range(0, len(data["time"]), 97):
+        chunk = {key: value[start : start + 97] for key, value in data.items()}
+        segments.extend(detector.feed(chunk))
+    segments.extend(detector.finish())
+    expected = detect_trips(data)
+    assert [segment.kind for segment in segments] == [segment.kind for segment in expected]
+    for segment, expected_segment in zip(segments, expected):
+        assert segment.begin == expected_segment.begin and segment.end == expected_segment.end
+        assert abs(segment.distance - expected_segment.distance) < 1e-6
+
+
+def test_detect_trips_stream():
+    """ Test that the long trip streamed by chunks keeps the detector state bounded """
+    speed = np.full(86400, 36.0)
+    data = {
+        "time": np.arange(len(speed), dtype=float),
+        "latitude": np.cumsum(speed / 3.6) / METERS_PER_DEGREE,
+        "longitude": np.zeros(len(speed)),
+        "speed": speed,
+    }
+    detector = TripDetector()
+    sizes = []
+    for start in range(0, len(speed), 600):
+        assert not detector.feed({key: value[start : start + 600] for key, value in data.items()})
+        sizes.append(len(pickle.dumps(detector)))
+    assert max(sizes) - min(sizes) < 16
+    segments = detector.finish()
+    assert [segment.kind for segment in segments] == [TRIP]
+    assert segments[0].duration() == 86399
+    assert abs(segments[0].distance - 863990) < 500
+
+
+def test_detect_trips_from_messages():
+    """ Test the message dictionaries conversion """
+    messages = [
+        {"t": 0, "pos": {"y": 0, "x": 0, "s": 0}},
+        {"t": 100, "pos": None},
+        {"t": 400, "pos": {"y": 0, "x": 0, "s": 0}},
+    ]
+    assert [segment.kind for segment in detect_trips(messages)] == [PARKING]
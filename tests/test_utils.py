@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from aiowialon.utils import chunks, distance, gather_limited
+
+
+def test_distance():
+    """ Check the distance of one degree of the meridian """
+    assert distance(0, 0, 1, 0) == pytest.approx(111195, abs=1)
+    assert distance(55.75, 37.62, 55.75, 37.62) == 0
+
+
+def test_chunks():
+    """ Check the iterable splitting """
+    assert list(chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunks([], 2)) == []
+    with pytest.raises(ValueError):
+        list(chunks([1], 0))
+
+
+@pytest.mark.asyncio
+async def test_gather_limited():
+    """ Check that no more than `limit` awaitables run at the same time """
+    running = 0
+    max_running = 0
+
+    async def job(value):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return value
+
+    assert await gather_limited((job(i) for i in range(10)), 3) == list(range(10))
+    assert max_running == 3
@@ -0,0 +1,65 @@
+import io
+import json
+import pytest
+from aiowialon.bin.wialon_query import ACCESS_TOKEN_VAR, batch_task
+from aiowialon.mock_server import MockServer
+
+REQUESTS = [
+    {"svc": "core/search_item", "params": {"id": 1000, "flags": 1}},
+    {"params": {"id": 1000}},
+    "not a request",
+    {"svc": "unknown/method"},
+    {"svc": "test/fail"},
+    {"svc": "core/search_item", "params": {"id": 1001, "flags": 1}},
+]
+
+
+def fail(*_):
+    raise RuntimeError("Unexpected server failure")
+
+
+async def run_batch(server: MockServer, tmp_path, core_batch: int) -> list:
+    path = tmp_path / "requests.jsonl"
+    lines = [json.dumps(item) for item in REQUESTS]
+    path.write_text("\n".join(lines[:3] + ["{malformed", ""] + lines[3:]) + "\n")
+    output = io.StringIO()
+    with open(path) as infile:
+        await batch_task(
+            infile, concurrency=2, core_batch=core_batch, output=output, api_host=server.url
+        )
+    return sorted(
+        (json.loads(line) for line in output.getvalue().splitlines()),
+        key=lambda line: line["index"],
+    )
+
+
+@pytest.mark.asyncio
+async def test_batch_mode(monkeypatch, tmp_path):
+    """ Test that the malformed and failed requests don't stop the others """
+    async with MockServer(units=2) as server:
+        monkeypatch.setenv(ACCESS_TOKEN_VAR, server.token)
+        server.handlers["test/fail"] = fail
+        results = await run_batch(server, tmp_path, core_batch=0)
+    assert [line["index"] for line in results] == list(range(7))
+    assert results[0]["result"]["item"]["id"] == 1000
+    assert results[6]["result"]["item"]["id"] == 1001
+    for index in (1, 2, 3):
+        assert results[index]["error"]["code"] is None
+    assert "line 4" in results[3]["error"]["reason"]
+    assert results[4]["error"]["code"] == 2
+    assert results[5]["error"]["code"] is None and results[5]["svc"] == "test/fail"
+
+
+@pytest.mark.asyncio
+async def test_core_batch_mode(monkeypatch, tmp_path):
+    """ Test that the failed core/batch call is reported for its requests only """
+    async with MockServer(units=2) as server:
+        monkeypatch.setenv(ACCESS_TOKEN_VAR, server.token)
+        server.handlers["test/fail"] = fail
+        results = await run_batch(server, tmp_path, core_batch=2)
+    assert [line["index"] for line in results] == list(range(7))
+    assert results[0]["result"]["item"]["id"] == 1000
+    assert results[3]["error"]["code"] is None
+    assert results[4]["error"]["code"] == 2
+    # test/fail and the last request are packed to the same failed core/batch call
+    assert results[5]["error"]["code"] is None and results[6]["error"]["code"] is None